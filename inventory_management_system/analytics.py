@@ -0,0 +1,192 @@
+import numpy as np
+import pandas as pd
+from sales_history import SALES_HISTORY_DAYS, normalize_history
+
+# Ventanas (en días) de los totales y promedios móviles
+SHORT_WINDOW = 7
+LONG_WINDOW = SALES_HISTORY_DAYS
+
+
+class SalesAnalytics:
+    """
+    Métricas de ventas de todo el catálogo en arreglos NumPy alineados con las posiciones del catálogo:
+    ventas por día (N x días, del más viejo al actual), stock por sucursal (N x sucursales)
+    y los totales de 7 y 30 días de cada producto
+    Se arma una vez y después se actualiza con cada venta, cambio de stock, alta, baja o cambio de día
+    Las ventas se registran por producto y no por sucursal: la cobertura de cada sucursal
+    se calcula con la velocidad de venta total del producto
+    """
+
+    def __init__(self):
+        self.ids = []
+        self.names = []
+        self.categories = []
+        self.sales = np.zeros((0, SALES_HISTORY_DAYS), dtype=np.int64)
+        self.stock = np.zeros((0, 1), dtype=np.float64)
+        self.short_totals = np.zeros(0, dtype=np.int64)
+        self.long_totals = np.zeros(0, dtype=np.int64)
+
+    def build(self, products, branches=1):
+        # branches es el ancho mínimo del stock: los productos guardados antes de agregar una sucursal tienen menos
+        if hasattr(products, "sales_order"):
+            # Catálogo por columnas: se copian los arreglos directamente
+            size = len(products)
+            self.ids = list(products.ids)
+            self.names = list(products.names)
+            self.categories = list(products.categories)
+            self.sales = products.sales[:size][:, products.sales_order()]
+            self.stock = products.stock[:size].astype(np.float64)
+            self.widen(branches)
+        else:
+            self.ids = [product["product_id"] for product in products]
+            self.names = [product.get("name") for product in products]
+            self.categories = [product.get("category") for product in products]
+            self.sales = np.array([normalize_history(product.get("sales_history")) for product in products],
+                                  dtype=np.int64).reshape(-1, SALES_HISTORY_DAYS)
+            self.stock = self.stock_matrix([product.get("stock_quantity") for product in products], branches)
+        self.recompute()
+        return self
+
+    def stock_matrix(self, stock_lists, branches=1):
+        width = max([len(stock_quantity or []) for stock_quantity in stock_lists] + [branches])
+        stock = np.zeros((len(stock_lists), width), dtype=np.float64)
+        for row, stock_quantity in enumerate(stock_lists):
+            if stock_quantity:
+                stock[row, :len(stock_quantity)] = stock_quantity
+        return stock
+
+    def recompute(self):
+        self.short_totals = self.sales[:, -SHORT_WINDOW:].sum(axis=1)
+        self.long_totals = self.sales.sum(axis=1)
+
+    # Actualizaciones
+
+    def add_sale(self, row, quantity):
+        self.sales[row, -1] += quantity
+        self.short_totals[row] += quantity
+        self.long_totals[row] += quantity
+
+    def set_sales(self, row, sales_history):
+        self.sales[row] = normalize_history(sales_history)
+        self.short_totals[row] = self.sales[row, -SHORT_WINDOW:].sum()
+        self.long_totals[row] = self.sales[row].sum()
+
+    def set_stock(self, row, stock_quantity):
+        stock_quantity = stock_quantity or []
+        self.widen(len(stock_quantity))
+        self.stock[row] = 0
+        self.stock[row, :len(stock_quantity)] = stock_quantity
+
+    def widen(self, branches):
+        # Agrega columnas de stock en 0 hasta tener branches sucursales
+        if branches > self.stock.shape[1]:
+            extra = np.zeros((len(self.stock), branches - self.stock.shape[1]), dtype=self.stock.dtype)
+            self.stock = np.hstack([self.stock, extra])
+
+    def set_labels(self, row, product):
+        self.names[row] = product.get("name")
+        self.categories[row] = product.get("category")
+
+    def extend(self, products):
+        # Agrega filas al final (altas de productos), en una sola copia de los arreglos
+        products = list(products)
+        if not products:
+            return
+        added = SalesAnalytics().build(products, self.stock.shape[1])
+        self.ids += added.ids
+        self.names += added.names
+        self.categories += added.categories
+        self.sales = np.vstack([self.sales, added.sales])
+        width = max(self.stock.shape[1], added.stock.shape[1])
+        self.stock = np.vstack([
+            np.pad(self.stock, ((0, 0), (0, width - self.stock.shape[1]))),
+            np.pad(added.stock, ((0, 0), (0, width - added.stock.shape[1]))),
+        ])
+        self.short_totals = np.concatenate([self.short_totals, added.short_totals])
+        self.long_totals = np.concatenate([self.long_totals, added.long_totals])
+
+    def delete(self, row):
+        for column in (self.ids, self.names, self.categories):
+            del column[row]
+        self.sales = np.delete(self.sales, row, axis=0)
+        self.stock = np.delete(self.stock, row, axis=0)
+        self.short_totals = np.delete(self.short_totals, row)
+        self.long_totals = np.delete(self.long_totals, row)
+
+    def roll(self, days):
+        # Cambio de día: corre la ventana de todos los productos y recalcula los totales
+        if days <= 0:
+            return
+        if days >= self.sales.shape[1]:
+            self.sales[:] = 0
+        else:
+            self.sales[:, :-days] = self.sales[:, days:].copy()
+            self.sales[:, -days:] = 0
+        self.recompute()
+
+    # Consultas
+
+    def branch_stock(self, branch_id):
+        if branch_id >= self.stock.shape[1]:
+            return np.zeros(len(self.stock))
+        return self.stock[:, branch_id]
+
+    def velocity(self):
+        # Unidades por día según la última semana
+        return self.short_totals / SHORT_WINDOW
+
+    def days_of_cover(self, branch_id):
+        # Días que dura el stock de la sucursal al ritmo actual (inf si el producto no se vende)
+        velocity = self.velocity()
+        stock = self.branch_stock(branch_id)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(velocity > 0, stock / velocity, np.inf)
+
+    def rolling_totals(self, window=SHORT_WINDOW):
+        """
+        Totales móviles de window días de cada producto: N x (días - window + 1)
+        La columna k suma los días k .. k + window - 1 de la ventana
+        """
+        cumulative = np.concatenate([np.zeros((len(self.sales), 1), dtype=np.int64), self.sales.cumsum(axis=1)], axis=1)
+        return cumulative[:, window:] - cumulative[:, :-window]
+
+    def daily_totals(self):
+        # Ventas de todo el catálogo por día
+        return self.sales.sum(axis=0)
+
+    def frame(self, branch_id, rows=None):
+        # Métricas por producto para una sucursal; rows limita la tabla a esas posiciones
+        if rows is None:
+            rows = np.arange(len(self.ids))
+        rows = np.asarray(rows, dtype=np.int64)
+        short_totals = self.short_totals[rows]
+        long_totals = self.long_totals[rows]
+        return pd.DataFrame({
+            "product_id": [self.ids[row] for row in rows],
+            "name": [self.names[row] for row in rows],
+            "category": [self.categories[row] for row in rows],
+            "stock": self.branch_stock(branch_id)[rows],
+            f"total_{SHORT_WINDOW}": short_totals,
+            f"total_{LONG_WINDOW}": long_totals,
+            f"avg_{SHORT_WINDOW}": short_totals / SHORT_WINDOW,
+            f"avg_{LONG_WINDOW}": long_totals / LONG_WINDOW,
+            "velocity": self.velocity()[rows],
+            "days_of_cover": self.days_of_cover(branch_id)[rows],
+        })
+
+    def category_frame(self, branch_id):
+        # Métricas sumadas por categoría; la cobertura usa el stock y la velocidad de toda la categoría
+        codes, categories = pd.factorize(pd.Series(self.categories, dtype=object), sort=True, use_na_sentinel=False)
+        count = len(categories)
+        frame = pd.DataFrame({
+            "category": categories,
+            "products": np.bincount(codes, minlength=count),
+            "stock": np.bincount(codes, weights=self.branch_stock(branch_id), minlength=count),
+            f"total_{SHORT_WINDOW}": np.bincount(codes, weights=self.short_totals, minlength=count).astype(np.int64),
+            f"total_{LONG_WINDOW}": np.bincount(codes, weights=self.long_totals, minlength=count).astype(np.int64),
+            "velocity": np.bincount(codes, weights=self.velocity(), minlength=count),
+        })
+        frame[f"avg_{LONG_WINDOW}"] = frame[f"total_{LONG_WINDOW}"] / LONG_WINDOW
+        with np.errstate(divide="ignore", invalid="ignore"):
+            frame["days_of_cover"] = np.where(frame["velocity"] > 0, frame["stock"] / frame["velocity"], np.inf)
+        return frame
@@ -0,0 +1,44 @@
+import json
+import os
+import time
+from concurrency import file_lock
+
+
+class AuditLog:
+    """
+    Registro de movimientos de stock (ventas, reposiciones, transferencias) en un archivo JSONL
+    Solo se agregan líneas; cada movimiento se escribe con su fecha y un solo fsync,
+    una entrada por producto con la versión que quedó guardada
+    """
+
+    def __init__(self, audit_file="data/audit.jsonl"):
+        self.audit_file = audit_file
+
+    def append(self, entry):
+        return self.append_many([entry])[0]
+
+    def append_many(self, entries):
+        # Varias entradas de un mismo movimiento: misma fecha y una sola escritura
+        now = time.time()
+        entries = [{"time": now, **entry} for entry in entries]
+        data = "".join(json.dumps(entry, separators=(",", ":")) + "\n" for entry in entries).encode("utf-8")
+        with file_lock(self.audit_file):
+            with open(self.audit_file, "ab") as file:
+                file.write(data)
+                file.flush()
+                os.fsync(file.fileno())
+        return entries
+
+    def read(self, op=None):
+        # Movimientos guardados (solo los de un tipo si se pasa op); ignora una última línea incompleta
+        if not os.path.exists(self.audit_file):
+            return
+        with file_lock(self.audit_file, shared=True):
+            with open(self.audit_file, "r", encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if op is None or entry.get("op") == op:
+                        yield entry
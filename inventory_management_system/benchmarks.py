@@ -0,0 +1,276 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import yaml
+from sales_history import SALES_HISTORY_DAYS, SECONDS_PER_DAY
+from product import Product
+from role_permission import RolePermission
+from yamlmanager import YamlManager
+
+CATEGORIES = ["Bebidas", "Masas", "Empanadas", "Utencilios", "Limpieza", "Electrónica", "Almacén", "Lácteos"]
+WORDS = ["tapa", "masa", "pascualina", "criolla", "horno", "freír", "café", "té", "yerba", "azúcar", "harina", "queso"]
+
+
+def synthetic_products(count, branches=3, seed=0):
+    # Catálogo de prueba con nombres de 2-3 palabras, stock por sucursal e historial de 30 días
+    rnd = random.Random(seed)
+    return [
+        {
+            "product_id": str(idx + 1),
+            "name": " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(2, 3))).capitalize() + f" {idx}",
+            "category": rnd.choice(CATEGORIES),
+            "price": round(rnd.uniform(10, 5000), 2),
+            "stock_quantity": [rnd.randint(0, 200) for _ in range(branches)],
+            "sales_history": [rnd.randint(0, 30) for _ in range(SALES_HISTORY_DAYS)],
+            "version": 1,
+        }
+        for idx in range(count)
+    ]
+
+
+def synthetic_config(users, seed=0):
+    # config.yaml de prueba; las contraseñas ya hasheadas (el costo de bcrypt se mide aparte)
+    rnd = random.Random(seed)
+    hashed = "$2b$12$" + "x" * 53
+    return {
+        "cookie": {"expiry_days": 7, "key": "benchmark_key", "name": "benchmark_cookie"},
+        "credentials": {"usernames": {
+            f"user{idx}": {
+                "email": f"user{idx}@example.com",
+                "name": f"Usuario {idx}",
+                "password": hashed,
+                "role": rnd.choice(["admin", "user"]),
+            }
+            for idx in range(users)
+        }},
+    }
+
+
+def write_dataset(directory, products, branches, users, seed=0):
+    with open(os.path.join(directory, "products.json"), "w") as file:
+        json.dump(synthetic_products(products, branches, seed), file)
+    with open(os.path.join(directory, "last_sale_history.json"), "w") as file:
+        json.dump({"date": int(time.time())}, file)
+    with open(os.path.join(directory, "roles.json"), "w") as file:
+        json.dump([{"role_id": str(idx + 1), "name": f"rol {idx}", "permission_level": "view_product"}
+                   for idx in range(50)], file)
+    with open(os.path.join(directory, "config.yaml"), "w") as file:
+        yaml.safe_dump(synthetic_config(users, seed), file, sort_keys=False)
+
+
+def open_products(directory, columnar=False):
+    return Product(
+        data_file=os.path.join(directory, "products.json"),
+        update_sales_history_file=os.path.join(directory, "last_sale_history.json"),
+        journal_file=os.path.join(directory, "products.journal"),
+        columnar=columnar,
+    )
+
+
+def measure(function, repeat, setup=None):
+    # Tiempos en segundos de repeat ejecuciones; setup (si hay) se ejecuta antes de cada una sin medirse
+    times = []
+    for _ in range(repeat):
+        argument = setup() if setup else None
+        start = time.perf_counter()
+        function(argument) if setup else function()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def data_layer_cases(directory, size, columnar):
+    """
+    Casos de la capa de datos: (nombre, función, setup)
+    Las funciones que modifican datos trabajan sobre la copia del directorio temporal
+    """
+    products = open_products(directory, columnar)
+    rnd = random.Random(1)
+    ids = list(products.positions)
+
+    def batch_update():
+        chosen = rnd.sample(ids, min(100, len(ids)))
+        products.update_products({product_id: {"price": rnd.uniform(10, 5000)} for product_id in chosen})
+
+    def rollover_setup():
+        # Cada corrida corre la ventana un día más
+        return products.last_date_update + SECONDS_PER_DAY
+
+    roles = RolePermission(data_file=os.path.join(directory, "roles.json"))
+    yaml_manager = YamlManager(os.path.join(directory, "config.yaml"))
+    counter = iter(range(10 ** 9))
+
+    return [
+        ("load", lambda: open_products(directory, columnar), None),
+        ("lookup_by_id", lambda: [products.get_product_by_id(rnd.choice(ids)) for _ in range(1000)], None),
+        # La primera búsqueda arma el índice; las siguientes lo reusan
+        ("search_name", lambda: products.get_page(0, 50, filter_field="name", filter_value=rnd.choice(WORDS)), None),
+        ("search_category", lambda: products.get_page(0, 50, filter_field="category", filter_value="bebi"), None),
+        ("sort_page", lambda: products.get_page(rnd.randint(0, 10), 50, sort_key="price", descending=True), None),
+        ("update_single", lambda: products.update_product(rnd.choice(ids), {"price": rnd.uniform(10, 5000)}), None),
+        ("update_batch_100", batch_update, None),
+        ("sale_single", lambda: products.update_products({}, sales={rnd.choice(ids): 1}), None),
+        ("rollover", products.roll_sales_history, rollover_setup),
+        ("frame_page_50", lambda: products.to_frame(products.get_page(0, 50)[0]), None),
+        ("frame_catalog", lambda: products.to_frame(), None),
+        ("roles_load", lambda: RolePermission(data_file=os.path.join(directory, "roles.json")), None),
+        ("role_lookup", lambda: [roles.get_role_by_id(str(idx)) for idx in range(1, 51)], None),
+        ("yaml_list_users", yaml_manager.list_users, None),
+        ("yaml_get_user", lambda: yaml_manager.get_user(f"user{rnd.randint(0, 99)}"), None),
+        ("yaml_update_user", lambda: yaml_manager.update_user("user0", {"name": f"Usuario {next(counter)}"}), None),
+    ]
+
+
+def render_case(directory, app_dir, repeat):
+    """
+    Tiempos de recarga de la página de productos con streamlit.testing (opcional)
+    Copia la app a directory y la corre en otro proceso, así importa los módulos y
+    el config.yaml de la copia y no los de app_dir
+    """
+    data_dir = os.path.join(directory, "data")
+    os.makedirs(data_dir, exist_ok=True)
+    for name in ("products.json", "last_sale_history.json", "roles.json"):
+        shutil.move(os.path.join(directory, name), data_dir)
+    copy_app(directory, app_dir)
+    output = subprocess.run(render_command(repeat), cwd=directory, capture_output=True, text=True, check=True).stdout
+    return parse_render_output(output)
+
+
+def copy_app(directory, app_dir):
+    # Módulos de la app y el logo; los datos (data/ y config.yaml) los pone quien llama
+    for name in os.listdir(app_dir):
+        if name.endswith(".py"):
+            shutil.copy(os.path.join(app_dir, name), directory)
+    os.makedirs(os.path.join(directory, "data"), exist_ok=True)
+    shutil.copy(os.path.join(app_dir, "data", "logo.png"), os.path.join(directory, "data"))
+
+
+def render_command(repeat, page="product_management"):
+    return [sys.executable, "benchmarks.py", "--render-worker", str(repeat), "--render-page", page]
+
+
+def parse_render_output(output):
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def render_worker(repeat, page="product_management"):
+    """
+    Corre dentro de la copia de la app (ver render_case); imprime los tiempos como JSON
+    La sesión entra como el primer usuario del config.yaml de la copia
+    """
+    from streamlit.testing.v1 import AppTest
+
+    # El autenticador guarda los usuarios en minúsculas
+    username = next(iter(YamlManager(os.path.abspath("config.yaml")).list_users())).lower()
+    app = AppTest.from_file(os.path.abspath("main.py"), default_timeout=600)
+    app.session_state["authentication_status"] = True
+    app.session_state["username"] = username
+    app.session_state["name"] = username
+    app.session_state["page"] = page
+
+    def rerun():
+        app.run()
+        if app.exception:
+            raise RuntimeError(app.exception[0].message)
+
+    print(json.dumps(measure(rerun, repeat)))
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes=(1000, 10000, 100000), branches=3, users=100, repeat=5, columnar=False, render=False, only=None):
+    """
+    Corre todos los casos para cada tamaño de catálogo sobre datos sintéticos en un directorio temporal
+    Devuelve el resultado listo para guardar como JSON
+    """
+    app_dir = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    for size in sizes:
+        directory = tempfile.mkdtemp(prefix="inventory-bench-")
+        try:
+            write_dataset(directory, size, branches, users)
+            cases = data_layer_cases(directory, size, columnar)
+            for name, function, setup in cases:
+                if only and name not in only:
+                    continue
+                times = measure(function, repeat, setup)
+                results.append(summary(name, size, times))
+                print(f"{size:>7} {name:<20} mediana {results[-1]['median_ms']:>10.3f} ms")
+            if render and (not only or "render_products" in only):
+                times = render_case(directory, app_dir, repeat)
+                results.append(summary("render_products", size, times))
+                print(f"{size:>7} {'render_products':<20} mediana {results[-1]['median_ms']:>10.3f} ms")
+        finally:
+            shutil.rmtree(directory)
+    return {
+        "commit": git_commit(),
+        "time": int(time.time()),
+        "python": platform.python_version(),
+        "branches": branches,
+        "columnar": columnar,
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def summary(name, size, times):
+    return {
+        "case": name,
+        "size": size,
+        "min_ms": round(min(times) * 1000, 3),
+        "median_ms": round(statistics.median(times) * 1000, 3),
+        "mean_ms": round(statistics.mean(times) * 1000, 3),
+    }
+
+
+def compare(baseline, current):
+    # Cociente de medianas actual / base por caso; > 1 es más lento
+    base = {(result["case"], result["size"]): result["median_ms"] for result in baseline["results"]}
+    for result in current["results"]:
+        key = (result["case"], result["size"])
+        if key in base and base[key] > 0:
+            ratio = result["median_ms"] / base[key]
+            flag = "  <-- más lento" if ratio > 1.2 else ""
+            print(f"{result['size']:>7} {result['case']:<20} {base[key]:>10.3f} -> {result['median_ms']:>10.3f} ms"
+                  f"  x{ratio:.2f}{flag}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks de la capa de datos con catálogos sintéticos")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--branches", type=int, default=3)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--columnar", action="store_true", help="Usa el catálogo por columnas (NumPy)")
+    parser.add_argument("--render", action="store_true", help="Incluye una recarga de la página de productos")
+    parser.add_argument("--only", nargs="+", help="Solo estos casos")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="Resultado anterior (JSON) contra el cual comparar")
+    parser.add_argument("--render-worker", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--render-page", default="product_management", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.render_worker:
+        render_worker(args.render_worker, args.render_page)
+        sys.exit()
+
+    result = run(args.sizes, args.branches, args.users, args.repeat, args.columnar, args.render, args.only)
+    with open(args.output, "w") as file:
+        json.dump(result, file, indent=4)
+    print(f"Resultados guardados en {args.output}")
+    if args.compare:
+        with open(args.compare, "r") as file:
+            compare(json.load(file), result)
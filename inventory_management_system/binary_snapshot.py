@@ -0,0 +1,308 @@
+import argparse
+import json
+import struct
+import sys
+import numpy as np
+from columnar import ColumnarCatalog
+from concurrency import atomic_write
+from sales_history import SALES_HISTORY_DAYS
+
+# Snapshot binario del catálogo de productos:
+#   MAGIC | versión del formato (uint32) | largo del encabezado (uint32) | encabezado JSON
+#   y después cada columna en su offset (alineado a ALIGNMENT bytes)
+# El encabezado dice la cantidad de productos, el offset, tipo y forma de cada columna
+# y la fecha del último corrimiento de ventas incluido (roll_date, si hubo alguno)
+# Las columnas numéricas (precio, versión, stock por sucursal, ventas por día) se leen con np.memmap;
+# los textos (ids, nombres, categorías) van en una tabla JSON chica al final
+# Lo que no entra en las columnas (un stock con decimales, campos de otros módulos)
+# se guarda tal cual en "extra" y pisa a las columnas al leer
+MAGIC = b"INVSNAP\x00"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+# Valor de los largos y versiones cuando el producto no tiene ese campo
+MISSING = -1
+PREFIX = struct.Struct("<8sII")
+
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def is_integer_list(values):
+    return isinstance(values, list) and all(isinstance(value, int) and not isinstance(value, bool) for value in values)
+
+
+def encode(records, roll_date=None):
+    """
+    Arma el contenido del archivo (bytes) a partir de los registros
+    records puede ser una lista de diccionarios o el catálogo por columnas
+    """
+    if isinstance(records, ColumnarCatalog):
+        strings, blocks = catalog_columns(records)
+    else:
+        strings, blocks = record_columns(records)
+    return pack(len(strings["ids"]), strings, blocks, roll_date)
+
+
+def record_columns(records):
+    # Columnas a partir de una lista de diccionarios
+    records = [dict(record) for record in records]
+    size = len(records)
+    ids, names, category_codes, categories, extra = [], [], [], {}, {}
+    # NaN: producto sin precio
+    prices = np.full(size, np.nan, dtype=np.float64)
+    versions = np.full(size, MISSING, dtype=np.int64)
+    stock_lengths = np.full(size, MISSING, dtype=np.int32)
+    sales_lengths = np.full(size, MISSING, dtype=np.int32)
+    branches = max([len(record["stock_quantity"]) for record in records
+                    if is_integer_list(record.get("stock_quantity"))] + [0])
+    days = max([len(record["sales_history"]) for record in records
+                if is_integer_list(record.get("sales_history"))] + [0])
+    stock = np.zeros((size, branches), dtype=np.int64)
+    sales = np.zeros((size, days), dtype=np.int64)
+
+    for row, record in enumerate(records):
+        ids.append(record.pop("product_id"))
+        names.append(record.pop("name", None))
+        category_codes.append(categories.setdefault(record.pop("category", None), len(categories)))
+        if is_number(record.get("price")):
+            prices[row] = record.pop("price")
+        if is_integer_list(record.get("stock_quantity")):
+            stock_quantity = record.pop("stock_quantity")
+            stock[row, :len(stock_quantity)] = stock_quantity
+            stock_lengths[row] = len(stock_quantity)
+        if is_integer_list(record.get("sales_history")):
+            # Alineado a la derecha: la última columna es el día actual
+            sales_history = record.pop("sales_history")
+            if sales_history:
+                sales[row, days - len(sales_history):] = sales_history
+            sales_lengths[row] = len(sales_history)
+        if isinstance(record.get("version"), int) and not isinstance(record.get("version"), bool):
+            versions[row] = record.pop("version")
+        # Lo que quedó (incluido un precio que no es número) se guarda tal cual
+        if record:
+            extra[str(row)] = record
+
+    strings = {"ids": ids, "names": names, "categories": list(categories), "extra": extra}
+    blocks = {
+        "price": prices,
+        "version": versions,
+        "category": np.asarray(category_codes, dtype=np.int32),
+        "stock": stock,
+        "stock_length": stock_lengths,
+        "sales": sales,
+        "sales_length": sales_lengths,
+    }
+    return strings, blocks
+
+
+def catalog_columns(catalog):
+    # Columnas a partir del catálogo por columnas, sin pasar por diccionarios
+    size = catalog.size
+    codes, categories = {}, []
+    for category in catalog.categories:
+        if category not in codes:
+            codes[category] = len(categories)
+            categories.append(category)
+    versions = np.full(size, MISSING, dtype=np.int64)
+    extra = {}
+    for row, fields in enumerate(catalog.extra):
+        if not fields:
+            continue
+        fields = dict(fields)
+        version = fields.get("version")
+        if isinstance(version, int) and not isinstance(version, bool):
+            versions[row] = fields.pop("version")
+        if fields:
+            extra[str(row)] = fields
+    strings = {"ids": list(catalog.ids), "names": list(catalog.names), "categories": categories, "extra": extra}
+    blocks = {
+        "price": catalog.prices[:size],
+        "version": versions,
+        "category": np.asarray([codes[category] for category in catalog.categories], dtype=np.int32),
+        "stock": catalog.stock[:size],
+        "stock_length": np.full(size, catalog.stock.shape[1], dtype=np.int32),
+        "sales": catalog.sales[:size][:, catalog.sales_order()],
+        "sales_length": np.full(size, catalog.sales.shape[1], dtype=np.int32),
+    }
+    return strings, blocks
+
+
+def pack(size, strings, blocks, roll_date=None):
+    strings = json.dumps(strings, separators=(",", ":")).encode("utf-8")
+    # El encabezado se arma dos veces: los offsets dependen de su propio largo
+    offsets = {}
+    header = b""
+    for _ in range(2):
+        position = align(PREFIX.size + len(header))
+        for name, array in blocks.items():
+            offsets[name] = {"offset": position, "dtype": array.dtype.str, "shape": list(array.shape)}
+            position = align(position + array.nbytes)
+        offsets["strings"] = {"offset": position, "length": len(strings)}
+        header = {"rows": size, "columns": offsets}
+        if roll_date is not None:
+            header["roll_date"] = roll_date
+        header = json.dumps(header, separators=(",", ":")).encode("utf-8")
+
+    content = bytearray(PREFIX.pack(MAGIC, FORMAT_VERSION, len(header)) + header)
+    for name, array in blocks.items():
+        content += b"\x00" * (offsets[name]["offset"] - len(content))
+        content += np.ascontiguousarray(array).tobytes()
+    content += b"\x00" * (offsets["strings"]["offset"] - len(content))
+    content += strings
+    return bytes(content)
+
+
+def align(position):
+    return (position + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_snapshot(path, records, roll_date=None):
+    atomic_write(path, encode(records, roll_date))
+
+
+class Snapshot:
+    """
+    Snapshot abierto para leer: valida el encabezado y mapea las columnas numéricas
+    (copy-on-write: cambiar los arreglos no toca el archivo) sin leerlas hasta que se usan
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            magic, version, header_length = PREFIX.unpack(file.read(PREFIX.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} no es un snapshot de productos.")
+            if version != FORMAT_VERSION:
+                raise ValueError(f"{path} tiene la versión {version} del formato; se esperaba {FORMAT_VERSION}.")
+            header = json.loads(file.read(header_length))
+            strings = header["columns"]["strings"]
+            file.seek(strings["offset"])
+            self.strings = json.loads(file.read(strings["length"]))
+        self.rows = header["rows"]
+        self.columns = header["columns"]
+        self.roll_date = header.get("roll_date")
+
+    def column(self, name):
+        column = self.columns[name]
+        if 0 in column["shape"]:
+            return np.zeros(column["shape"], dtype=column["dtype"])
+        return np.memmap(self.path, dtype=column["dtype"], mode="c", offset=column["offset"],
+                         shape=tuple(column["shape"]))
+
+    def records(self):
+        # Lista de diccionarios igual a la del JSON
+        categories = self.strings["categories"]
+        extra = self.strings["extra"]
+        prices = self.column("price").tolist()
+        versions = self.column("version").tolist()
+        codes = self.column("category").tolist()
+        stock = self.column("stock").tolist()
+        stock_lengths = self.column("stock_length").tolist()
+        sales = self.column("sales").tolist()
+        sales_lengths = self.column("sales_length").tolist()
+        days = self.columns["sales"]["shape"][1]
+        records = []
+        for row, (product_id, name) in enumerate(zip(self.strings["ids"], self.strings["names"])):
+            record = {"product_id": product_id, "name": name, "category": categories[codes[row]]}
+            if prices[row] == prices[row]:
+                record["price"] = prices[row]
+            if stock_lengths[row] != MISSING:
+                record["stock_quantity"] = stock[row][:stock_lengths[row]]
+            if sales_lengths[row] != MISSING:
+                record["sales_history"] = sales[row][days - sales_lengths[row]:]
+            if versions[row] != MISSING:
+                record["version"] = versions[row]
+            record.update(extra.get(str(row), {}))
+            records.append(record)
+        return records
+
+    def catalog(self, history_days=SALES_HISTORY_DAYS):
+        """
+        Catálogo por columnas armado directo desde las columnas mapeadas
+        Las ventas y el stock se usan sin copiar: solo se leen las páginas que se tocan
+        """
+        categories = [sys.intern(category) if isinstance(category, str) else category
+                      for category in self.strings["categories"]]
+        codes = self.column("category")
+        versions = self.column("version")
+        extra = [None] * self.rows
+        for row in np.flatnonzero(versions != MISSING).tolist():
+            extra[row] = {"version": int(versions[row])}
+        for row, fields in self.strings["extra"].items():
+            row = int(row)
+            extra[row] = {**(extra[row] or {}), **fields}
+
+        sales = self.column("sales")
+        if sales.shape[1] != history_days:
+            # Otra ventana de ventas: se alinea a la derecha (copia)
+            window = np.zeros((self.rows, history_days), dtype=np.int64)
+            width = min(history_days, sales.shape[1])
+            window[:, history_days - width:] = sales[:, sales.shape[1] - width:]
+            sales = window
+        catalog = ColumnarCatalog.from_columns(
+            ids=list(self.strings["ids"]),
+            names=list(self.strings["names"]),
+            categories=[categories[code] for code in codes.tolist()],
+            extra=extra,
+            prices=np.nan_to_num(self.column("price")),
+            stock=self.column("stock"),
+            sales=sales,
+        )
+        # Los campos guardados en extra pisan a las columnas (por ejemplo un stock con decimales)
+        for row, fields in self.strings["extra"].items():
+            for field in ("price", "stock_quantity", "sales_history"):
+                if field in fields:
+                    catalog.set_field(int(row), field, catalog.extra[int(row)].pop(field))
+        return catalog
+
+
+def json_to_binary(json_file, binary_file, journal_file=None):
+    """
+    Escribe el snapshot binario con los productos del JSON más su bitácora
+    La bitácora queda incluida en los dos snapshots, así que se compacta (se vacía)
+    """
+    from storage import JsonStorage
+
+    source = JsonStorage(json_file, "product_id", journal_file=journal_file)
+    with source.lock():
+        records = source.load()
+        write_snapshot(binary_file, records, source.last_roll_date)
+        if source.journal:
+            source.save(records)
+    return len(records)
+
+
+def binary_to_json(binary_file, json_file, journal_file=None):
+    # Lo inverso: snapshot binario más su bitácora a products.json
+    from storage import BinaryStorage, JsonStorage
+
+    source = BinaryStorage(binary_file, "product_id", journal_file=journal_file)
+    with source.lock():
+        records = source.load()
+        JsonStorage(json_file, "product_id").write_snapshot(records, source.last_roll_date)
+        if source.journal:
+            source.save(records)
+    return len(records)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convierte el catálogo entre JSON y el snapshot binario")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    to_binary = subparsers.add_parser("to-binary", help="products.json (+ bitácora) -> snapshot binario")
+    to_binary.add_argument("--json", default="data/products.json")
+    to_binary.add_argument("--journal", default="data/products.journal")
+    to_binary.add_argument("--binary", default="data/products.snap")
+    to_json = subparsers.add_parser("to-json", help="snapshot binario -> products.json")
+    to_json.add_argument("--binary", default="data/products.snap")
+    to_json.add_argument("--journal", default="data/products.journal")
+    to_json.add_argument("--json", default="data/products.json")
+    args = parser.parse_args()
+
+    if args.command == "to-binary":
+        count = json_to_binary(args.json, args.binary, args.journal)
+        print(f"Convertidos {count} productos a {args.binary}")
+        print(f"Para usarlo: INVENTORY_STORAGE=binary:{args.binary}")
+    else:
+        count = binary_to_json(args.binary, args.json, args.journal)
+        print(f"Convertidos {count} productos a {args.json}")
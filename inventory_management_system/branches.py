@@ -0,0 +1,77 @@
+import json
+import os
+from concurrency import atomic_write, file_lock
+from storage import file_version
+
+# Sucursales iniciales si todavía no existe data/branches.json
+DEFAULT_BRANCHES = ["Sucursal 1", "Sucursal 2", "Sucursal 3"]
+
+
+def branch_stock(stock_quantity, branch_id):
+    # Stock de una sucursal; las sucursales agregadas después de guardar el producto tienen 0
+    if stock_quantity is None or branch_id >= len(stock_quantity):
+        return 0
+    return stock_quantity[branch_id]
+
+
+def with_branch_stock(stock_quantity, branch_id, quantity):
+    # Copia de la lista de stock con la cantidad de una sucursal cambiada (rellena con ceros si falta)
+    stock_quantity = list(stock_quantity or [])
+    if branch_id >= len(stock_quantity):
+        stock_quantity += [0] * (branch_id + 1 - len(stock_quantity))
+    stock_quantity[branch_id] = quantity
+    return stock_quantity
+
+
+class BranchRegistry:
+    """
+    Registro de sucursales: branch_id es la posición del stock en stock_quantity
+    Agregar una sucursal no reescribe los productos, su stock se considera 0 hasta que se cargue
+    """
+
+    def __init__(self, data_file="data/branches.json"):
+        self.data_file = data_file
+        self.load_data()
+
+    def load_data(self):
+        with file_lock(self.data_file, shared=True):
+            if os.path.exists(self.data_file):
+                with open(self.data_file, "r") as file:
+                    self.branches = json.load(file)
+            else:
+                self.branches = [{"branch_id": idx, "name": name} for idx, name in enumerate(DEFAULT_BRANCHES)]
+            self.loaded_version = file_version(self.data_file)
+
+    def reload_if_stale(self):
+        with file_lock(self.data_file, shared=True):
+            if file_version(self.data_file) == self.loaded_version:
+                return False
+            self.load_data()
+            return True
+
+    def save_data(self):
+        with file_lock(self.data_file):
+            atomic_write(self.data_file, json.dumps(self.branches, indent=4))
+            self.loaded_version = file_version(self.data_file)
+
+    def add_branch(self, name):
+        with file_lock(self.data_file):
+            self.reload_if_stale()
+            if name in self.names():
+                raise ValueError(f"La sucursal '{name}' ya existe.")
+            branch = {"branch_id": len(self.branches), "name": name}
+            self.branches.append(branch)
+            self.save_data()
+            return branch
+
+    def names(self):
+        return [branch["name"] for branch in self.branches]
+
+    def get_branch_by_id(self, branch_id):
+        if 0 <= branch_id < len(self.branches):
+            return self.branches[branch_id]
+        return None
+
+    def __len__(self):
+        return len(self.branches)
+
@@ -0,0 +1,215 @@
+import argparse
+import csv
+import io
+import json
+import os
+from branches import BranchRegistry, branch_stock
+from concurrency import ConflictError
+from validation import parse_number, validate_fields
+
+# Columnas fijas del archivo; después vienen una columna de stock por sucursal (con su nombre)
+COLUMNS = ["product_id", "name", "category", "price"]
+# Productos por escritura: cada lote es una línea de la bitácora
+CHUNK_SIZE = 5000
+# Errores que se guardan en el resumen (el resto solo se cuenta)
+MAX_ERRORS = 100
+
+
+def file_format(name):
+    return "xlsx" if str(name).lower().endswith((".xlsx", ".xlsm")) else "csv"
+
+
+def read_rows(source, fmt=None):
+    """
+    Lee las filas de un CSV o XLSX como pares (línea, diccionario), de a una (sin cargar el archivo completo)
+    La línea es la del archivo, así los errores apuntan bien aunque haya filas vacías salteadas
+    source es una ruta o un archivo abierto en binario (por ejemplo el de st.file_uploader)
+    """
+    fmt = fmt or file_format(getattr(source, "name", source))
+    if fmt == "xlsx":
+        yield from read_xlsx_rows(source)
+        return
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "r", newline="", encoding="utf-8-sig") as file:
+            yield from read_csv_rows(file)
+    else:
+        yield from read_csv_rows(io.TextIOWrapper(source, encoding="utf-8-sig", newline=""))
+
+
+def read_csv_rows(file):
+    # DictReader saltea las filas vacías; line_num es la línea donde termina la fila leída
+    reader = csv.DictReader(file)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_xlsx_rows(source):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError("Para importar archivos Excel hay que instalar openpyxl.")
+    # read_only lee la hoja por partes en vez de armarla entera en memoria
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(cell).strip() if cell is not None else "" for cell in next(rows, [])]
+        # La fila 1 es el encabezado; las vacías se saltean pero cuentan para el número de fila
+        for line, row in enumerate(rows, start=2):
+            if any(cell is not None for cell in row):
+                yield line, dict(zip(header, row))
+    finally:
+        workbook.close()
+
+
+def parse_product(row, branch_names):
+    """
+    Convierte una fila del archivo en un producto
+    Devuelve (producto, error); usa las mismas reglas que el formulario de alta
+    """
+    def text(field):
+        value = row.get(field)
+        return str(value).strip() if value is not None else ""
+
+    price, error = parse_number(row.get("price"), "price")
+    if error:
+        return None, error
+    stock_quantity = []
+    for branch_name in branch_names:
+        quantity, error = parse_number(row.get(branch_name), branch_name, integer=True)
+        if error:
+            return None, error
+        stock_quantity.append(quantity or 0)
+
+    product = {
+        "product_id": text("product_id"),
+        "name": text("name"),
+        "category": text("category"),
+        "price": price,
+        "stock_quantity": stock_quantity,
+    }
+    error = validate_fields({
+        "name": product["name"],
+        "category": product["category"],
+        "price": price,
+        "stock_quantity": min(stock_quantity, default=0),
+    })
+    if error:
+        return None, error
+    return product, None
+
+
+def import_products(product_manager, rows, branch_names, chunk_size=CHUNK_SIZE):
+    """
+    Valida y agrega los productos de rows (pares (línea, fila) como los de read_rows),
+    guardando de a chunk_size por escritura
+    Las filas con errores se saltean; devuelve un resumen con los agregados y los errores
+    Las filas sin product_id reciben el siguiente id libre
+    """
+    summary = {"imported": 0, "rejected": 0, "errors": []}
+
+    def reject(line, message):
+        summary["rejected"] += 1
+        if len(summary["errors"]) < MAX_ERRORS:
+            summary["errors"].append({"line": line, "error": message})
+
+    def flush(chunk):
+        while chunk:
+            try:
+                summary["imported"] += len(product_manager.add_products([product for _, product in chunk]))
+                return
+            except ConflictError as e:
+                # Otro usuario agregó alguno de estos ids mientras se importaba; la transacción ya releyó
+                # el catálogo, así que se rechazan las filas con ids existentes y se reintenta con el resto
+                remaining = []
+                for line, product in chunk:
+                    if product_manager.get_product_by_id(product["product_id"]) is None:
+                        remaining.append((line, product))
+                    else:
+                        reject(line, f"El producto '{product['product_id']}' ya existe.")
+                if len(remaining) == len(chunk):
+                    # No se encontró el id en conflicto: se rechaza el lote para no reintentar sin fin
+                    for line, _ in chunk:
+                        reject(line, str(e))
+                    return
+                chunk = remaining
+
+    seen_ids = set()
+    chunk = []
+    for line, row in rows:
+        product, error = parse_product(row, branch_names)
+        if error:
+            reject(line, error)
+            continue
+        product_id = product["product_id"]
+        if product_id:
+            if product_id in seen_ids or product_manager.get_product_by_id(product_id) is not None:
+                reject(line, f"El producto '{product_id}' ya existe.")
+                continue
+            seen_ids.add(product_id)
+        chunk.append((line, product))
+        if len(chunk) >= chunk_size:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+    return summary
+
+
+def export_rows(product_manager, branch_names):
+    # Encabezado y una fila por producto, generadas de a una
+    yield COLUMNS + list(branch_names)
+    # Copia de la lista: otra sesión puede agregar o borrar productos mientras se escribe el archivo
+    with product_manager.lock.read():
+        products = list(product_manager.products)
+    for product in products:
+        stock_quantity = product.get("stock_quantity")
+        yield [product.get(field) for field in COLUMNS] + [
+            branch_stock(stock_quantity, branch_id) for branch_id in range(len(branch_names))
+        ]
+
+
+def export_products(product_manager, target, branch_names, fmt=None):
+    """
+    Escribe el catálogo en target (ruta o archivo binario) como CSV o XLSX
+    Las filas se escriben a medida que se generan
+    """
+    fmt = fmt or file_format(getattr(target, "name", target))
+    rows = export_rows(product_manager, branch_names)
+    if fmt == "xlsx":
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            raise ValueError("Para exportar archivos Excel hay que instalar openpyxl.")
+        # write_only escribe las filas al archivo sin guardar la hoja en memoria
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        for row in rows:
+            sheet.append(row)
+        workbook.save(target)
+        return
+    if isinstance(target, (str, os.PathLike)):
+        with open(target, "w", newline="", encoding="utf-8") as file:
+            csv.writer(file).writerows(rows)
+    else:
+        wrapper = io.TextIOWrapper(target, encoding="utf-8", newline="")
+        csv.writer(wrapper).writerows(rows)
+        # Deja el archivo abierto para quien lo pasó
+        wrapper.flush()
+        wrapper.detach()
+
+
+if __name__ == "__main__":
+    from product import Product
+
+    parser = argparse.ArgumentParser(description="Importa o exporta productos en CSV/XLSX")
+    parser.add_argument("action", choices=["import", "export"])
+    parser.add_argument("file", help="Archivo .csv o .xlsx")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    products = Product()
+    branch_names = BranchRegistry().names()
+    if args.action == "import":
+        print(json.dumps(import_products(products, read_rows(args.file), branch_names, args.chunk_size), indent=4))
+    else:
+        export_products(products, args.file, branch_names)
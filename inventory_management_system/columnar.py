@@ -0,0 +1,267 @@
+import sys
+from collections.abc import MutableMapping, MutableSequence
+import numpy as np
+import pandas as pd
+from sales_history import SALES_HISTORY_DAYS
+
+# Campos con columna propia; el resto se guarda en un diccionario por fila
+COLUMNS = ("product_id", "name", "category", "price", "stock_quantity", "sales_history")
+
+
+class ProductView(MutableMapping):
+    """
+    Vista tipo diccionario de una fila del catálogo por columnas
+    Leer y escribir pasa directo a los arreglos; la vista deja de ser válida si se borran filas antes que ella
+    """
+
+    def __init__(self, catalog, row):
+        self.catalog = catalog
+        self.row = row
+
+    def __getitem__(self, field):
+        return self.catalog.get_field(self.row, field)
+
+    def __setitem__(self, field, value):
+        self.catalog.set_field(self.row, field, value)
+
+    def __delitem__(self, field):
+        self.catalog.delete_field(self.row, field)
+
+    def __iter__(self):
+        return iter(self.catalog.fields(self.row))
+
+    def __len__(self):
+        return len(self.catalog.fields(self.row))
+
+    def __repr__(self):
+        return f"ProductView({dict(self)!r})"
+
+
+class ColumnarCatalog(MutableSequence):
+    """
+    Catálogo de productos guardado por columnas con NumPy:
+    precios (N), stock por sucursal (N x sucursales) y ventas por día (N x días)
+    Las ventas son un buffer circular: sales_head es la columna del día actual,
+    así correr la ventana un día es poner en cero una columna y mover sales_head
+    Las categorías se internan para que los productos de una misma categoría compartan el string
+    Se comporta como una lista de diccionarios (las filas son ProductView)
+    """
+
+    def __init__(self, records=(), branches=1, history_days=SALES_HISTORY_DAYS):
+        records = list(records)
+        self.size = len(records)
+        capacity = max(self.size, 16)
+        self.ids = [None] * self.size
+        self.names = [None] * self.size
+        self.categories = [None] * self.size
+        self.extra = [None] * self.size
+        self.prices = np.zeros(capacity, dtype=np.float64)
+        # branches es el ancho mínimo del stock (Product pasa la cantidad de sucursales registradas)
+        branches = max([branches] + [len(record.get("stock_quantity") or []) for record in records])
+        self.stock = np.zeros((capacity, branches), dtype=np.int64)
+        self.sales = np.zeros((capacity, history_days), dtype=np.int64)
+        self.sales_head = history_days - 1
+        for row, record in enumerate(records):
+            self.write_row(row, record)
+
+    @classmethod
+    def from_columns(cls, ids, names, categories, extra, prices, stock, sales):
+        """
+        Catálogo armado con columnas ya construidas (por ejemplo mapeadas desde un snapshot binario)
+        sales tiene los días del más viejo al actual; los arreglos se usan sin copiar
+        """
+        catalog = cls.__new__(cls)
+        catalog.size = len(ids)
+        catalog.ids = ids
+        catalog.names = names
+        catalog.categories = categories
+        catalog.extra = extra
+        catalog.prices = prices
+        catalog.stock = stock
+        catalog.sales = sales
+        catalog.sales_head = sales.shape[1] - 1
+        return catalog
+
+    # Secuencia
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [ProductView(self, idx) for idx in range(*row.indices(self.size))]
+        return ProductView(self, self.check_row(row))
+
+    def __setitem__(self, row, record):
+        self.write_row(self.check_row(row), record)
+
+    def __delitem__(self, row):
+        row = self.check_row(row)
+        for column in (self.ids, self.names, self.categories, self.extra):
+            del column[row]
+        for array in (self.prices, self.stock, self.sales):
+            array[row:self.size - 1] = array[row + 1:self.size]
+            array[self.size - 1] = 0
+        self.size -= 1
+
+    def insert(self, row, record):
+        if row < 0:
+            row += self.size
+        row = min(max(row, 0), self.size)
+        self.reserve(self.size + 1)
+        for array in (self.prices, self.stock, self.sales):
+            array[row + 1:self.size + 1] = array[row:self.size]
+            array[row] = 0
+        for column in (self.ids, self.names, self.categories, self.extra):
+            column.insert(row, None)
+        self.size += 1
+        self.write_row(row, record)
+
+    def check_row(self, row):
+        if row < 0:
+            row += self.size
+        if not 0 <= row < self.size:
+            raise IndexError("fila fuera de rango")
+        return row
+
+    def reserve(self, size):
+        # Crece los arreglos al doble para que agregar productos sea O(1) amortizado
+        capacity = len(self.prices)
+        if size <= capacity:
+            return
+        capacity = max(size, capacity * 2)
+        self.prices = np.resize(self.prices, capacity)
+        self.stock = np.vstack([self.stock, np.zeros((capacity - len(self.stock), self.stock.shape[1]), dtype=np.int64)])
+        self.sales = np.vstack([self.sales, np.zeros((capacity - len(self.sales), self.sales.shape[1]), dtype=np.int64)])
+
+    # Campos de una fila
+
+    def write_row(self, row, record):
+        self.ids[row] = record["product_id"]
+        self.names[row] = record.get("name")
+        self.categories[row] = self.intern(record.get("category"))
+        self.prices[row] = record.get("price") or 0
+        self.set_stock(row, record.get("stock_quantity") or [])
+        self.set_sales(row, record.get("sales_history"))
+        extra = {field: value for field, value in record.items() if field not in COLUMNS}
+        self.extra[row] = extra or None
+
+    def intern(self, value):
+        return sys.intern(value) if isinstance(value, str) else value
+
+    def set_stock(self, row, stock_quantity):
+        if len(stock_quantity) > self.stock.shape[1]:
+            self.add_branches(len(stock_quantity) - self.stock.shape[1])
+        self.stock[row] = 0
+        self.stock[row, :len(stock_quantity)] = [int(quantity) for quantity in stock_quantity]
+
+    def add_branches(self, count):
+        self.stock = np.hstack([self.stock, np.zeros((len(self.stock), count), dtype=np.int64)])
+
+    def sales_order(self):
+        # Columnas del buffer ordenadas del día más viejo al actual
+        days = self.sales.shape[1]
+        return (self.sales_head + 1 + np.arange(days)) % days
+
+    def set_sales(self, row, sales_history):
+        # Historiales más cortos se alinean a la derecha: el último valor es el día actual
+        days = self.sales.shape[1]
+        sales_history = [int(sold) for sold in (sales_history or [])][-days:]
+        values = np.zeros(days, dtype=np.int64)
+        if sales_history:
+            values[days - len(sales_history):] = sales_history
+        self.sales[row, self.sales_order()] = values
+
+    def add_sale(self, row, quantity):
+        # Suma una venta al día actual
+        self.sales[row, self.sales_head] += quantity
+
+    def roll_sales(self, days):
+        """
+        Corre la ventana de ventas de todo el catálogo: pone en cero las columnas
+        de los días nuevos y mueve sales_head, sin tocar el resto de los datos
+        """
+        if days <= 0:
+            return
+        width = self.sales.shape[1]
+        if days >= width:
+            self.sales[:] = 0
+        else:
+            self.sales[:, (self.sales_head + 1 + np.arange(days)) % width] = 0
+        self.sales_head = (self.sales_head + days) % width
+
+    def get_field(self, row, field):
+        if field == "product_id":
+            return self.ids[row]
+        if field == "name":
+            return self.names[row]
+        if field == "category":
+            return self.categories[row]
+        if field == "price":
+            return float(self.prices[row])
+        if field == "stock_quantity":
+            return self.stock[row].tolist()
+        if field == "sales_history":
+            return self.sales[row, self.sales_order()].tolist()
+        if self.extra[row] and field in self.extra[row]:
+            return self.extra[row][field]
+        raise KeyError(field)
+
+    def set_field(self, row, field, value):
+        if field == "product_id":
+            self.ids[row] = value
+        elif field == "name":
+            self.names[row] = value
+        elif field == "category":
+            self.categories[row] = self.intern(value)
+        elif field == "price":
+            self.prices[row] = value
+        elif field == "stock_quantity":
+            self.set_stock(row, value)
+        elif field == "sales_history":
+            self.set_sales(row, value)
+        else:
+            if self.extra[row] is None:
+                self.extra[row] = {}
+            self.extra[row][field] = value
+
+    def delete_field(self, row, field):
+        if field == "sales_history":
+            self.set_sales(row, None)
+        elif self.extra[row] and field in self.extra[row]:
+            del self.extra[row][field]
+        else:
+            raise KeyError(field)
+
+    def fields(self, row):
+        fields = ["product_id", "name", "category", "price", "stock_quantity", "sales_history"]
+        if self.extra[row]:
+            fields.extend(self.extra[row])
+        return fields
+
+    # Conversión
+
+    def to_records(self):
+        return [dict(ProductView(self, row)) for row in range(self.size)]
+
+    def to_frame(self, rows=None):
+        """
+        DataFrame armado directo desde las columnas (sin copiar diccionario por diccionario)
+        rows limita el resultado a esas posiciones
+        """
+        if rows is None:
+            rows = np.arange(self.size)
+        else:
+            rows = np.asarray(rows, dtype=np.int64)
+        frame = pd.DataFrame({
+            "product_id": [self.ids[row] for row in rows],
+            "name": [self.names[row] for row in rows],
+            "category": [self.categories[row] for row in rows],
+            "price": self.prices[rows],
+            "stock_quantity": list(self.stock[rows]),
+            "sales_history": list(self.sales[rows][:, self.sales_order()]),
+        })
+        extra_fields = sorted({field for row in rows if self.extra[row] for field in self.extra[row]})
+        for field in extra_fields:
+            frame[field] = [self.extra[row].get(field) if self.extra[row] else None for row in rows]
+        return frame
@@ -0,0 +1,142 @@
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from instrumentation import count
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo se bloquea entre hilos del mismo proceso
+    fcntl = None
+
+
+class ConflictError(Exception):
+    """El registro fue modificado por otro usuario desde que se leyó"""
+
+
+class _PathLock:
+    def __init__(self, lock_file):
+        self.lock_file = lock_file
+        self.thread_lock = threading.RLock()
+        self.depth = 0
+        self.file = None
+
+
+_path_locks = {}
+_path_locks_guard = threading.Lock()
+
+
+@contextmanager
+def file_lock(path, shared=False):
+    """
+    Bloqueo consultivo (fcntl.flock) sobre "<path>.lock", entre procesos y entre hilos
+    Es reentrante dentro del mismo hilo: un bloqueo anidado reutiliza el externo
+    """
+    key = os.path.abspath(path)
+    with _path_locks_guard:
+        lock = _path_locks.get(key)
+        if lock is None:
+            lock = _path_locks[key] = _PathLock(key + ".lock")
+
+    with lock.thread_lock:
+        if lock.depth == 0:
+            lock.file = open(lock.lock_file, "a")
+            if fcntl:
+                fcntl.flock(lock.file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        lock.depth += 1
+        try:
+            yield
+        finally:
+            lock.depth -= 1
+            if lock.depth == 0:
+                if fcntl:
+                    fcntl.flock(lock.file, fcntl.LOCK_UN)
+                lock.file.close()
+                lock.file = None
+
+
+class ReadWriteLock:
+    """
+    Bloqueo de lectura/escritura entre hilos del mismo proceso
+    Varios lectores a la vez o un solo escritor; un escritor que espera frena a los lectores nuevos
+    Es reentrante: quien escribe puede volver a leer o escribir y quien lee puede volver a leer,
+    pero pasar de lectura a escritura se bloquearía y lanza RuntimeError
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition(threading.Lock())
+        self.readers = 0
+        self.waiting_writers = 0
+        self.writer = None
+        # Lecturas anidadas del hilo actual
+        self.local = threading.local()
+
+    @contextmanager
+    def read(self):
+        reads = getattr(self.local, "reads", 0)
+        if reads or self.writer == threading.get_ident():
+            # Ya tiene el bloqueo (como lector o como escritor)
+            self.local.reads = reads + 1
+            try:
+                yield
+            finally:
+                self.local.reads = reads
+            return
+        with self.condition:
+            while self.writer is not None or self.waiting_writers:
+                self.condition.wait()
+            self.readers += 1
+        self.local.reads = 1
+        try:
+            yield
+        finally:
+            self.local.reads = 0
+            with self.condition:
+                self.readers -= 1
+                if not self.readers:
+                    self.condition.notify_all()
+
+    @contextmanager
+    def write(self):
+        thread = threading.get_ident()
+        if self.writer == thread:
+            yield
+            return
+        if getattr(self.local, "reads", 0):
+            raise RuntimeError("No se puede escribir con el bloqueo de lectura tomado.")
+        with self.condition:
+            self.waiting_writers += 1
+            try:
+                while self.writer is not None or self.readers:
+                    self.condition.wait()
+            finally:
+                self.waiting_writers -= 1
+            self.writer = thread
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.writer = None
+                self.condition.notify_all()
+
+
+def atomic_write(path, content):
+    """
+    Escribe en un archivo temporal y lo renombra sobre el original,
+    así un lector nunca ve un archivo escrito a medias
+    content puede ser texto o bytes
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix="-" + os.path.basename(path))
+    try:
+        with os.fdopen(fd, "wb" if isinstance(content, bytes) else "w") as file:
+            file.write(content)
+            file.flush()
+            os.fsync(file.fileno())
+            count("saves")
+            count("bytes_written", file.tell())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
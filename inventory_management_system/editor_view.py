@@ -0,0 +1,102 @@
+import threading
+import numpy as np
+import pandas as pd
+
+# Columnas del editor de productos, en el orden en que se muestran
+COLUMNS = ("product_id", "name", "category", "price", "stock_quantity", "sales_history", "version")
+
+
+def empty_columns(size):
+    # Columnas con filas vacías; el stock no va aquí sino en una matriz aparte
+    return {
+        "product_id": np.full(size, None, dtype=object),
+        "name": np.full(size, None, dtype=object),
+        "category": np.full(size, None, dtype=object),
+        "price": np.zeros(size, dtype=np.float64),
+        "sales_history": np.full(size, None, dtype=object),
+        "version": np.zeros(size, dtype=np.int64),
+    }
+
+
+class EditorView:
+    """
+    Columnas del editor de productos (una fila por posición del catálogo), compartidas entre
+    recargas y sesiones; la página es un DataFrame armado con un slice de cada columna
+    El stock no se copia: sale de la matriz de stock de las métricas de ventas (ver SalesAnalytics)
+    Las filas se copian del catálogo recién cuando una página las pide, y un cambio solo
+    marca su fila como vieja: armar la página cuesta lo mismo con 1.000 o 100.000 productos
+    Son arreglos NumPy y no un DataFrame porque cambiar una celda de un DataFrame copia la columna entera
+    """
+
+    def __init__(self):
+        self.products = []
+        self.columns = empty_columns(0)
+        # True: la fila todavía no se copió o cambió desde la última copia
+        self.stale = np.zeros(0, dtype=bool)
+        self.lock = threading.Lock()
+
+    def build(self, products):
+        self.products = products
+        self.columns = empty_columns(len(products))
+        self.stale = np.ones(len(products), dtype=bool)
+        return self
+
+    def mark(self, row):
+        # Fila cambiada; se vuelve a copiar cuando una página la pida
+        with self.lock:
+            if row < len(self.stale):
+                self.stale[row] = True
+
+    def extend(self, count):
+        # Productos agregados al final: las columnas crecen una sola vez por lote y las filas nuevas quedan viejas
+        with self.lock:
+            for column, values in empty_columns(count).items():
+                self.columns[column] = np.concatenate([self.columns[column], values])
+            self.stale = np.concatenate([self.stale, np.ones(count, dtype=bool)])
+
+    def delete(self, row):
+        # Borra la fila; las siguientes se corren una posición como en el catálogo
+        with self.lock:
+            if row < len(self.stale):
+                for column, values in self.columns.items():
+                    self.columns[column] = np.delete(values, row)
+                self.stale = np.delete(self.stale, row)
+
+    def fill(self, rows):
+        # Copia del catálogo las filas pedidas que estén viejas
+        rows = rows[self.stale[rows]]
+        if not len(rows):
+            return
+        records = [self.products[row] for row in rows.tolist()]
+        sales_history = np.empty(len(records), dtype=object)
+        for position, record in enumerate(records):
+            sales_history[position] = record.get("sales_history")
+        values = {
+            "product_id": [record["product_id"] for record in records],
+            "name": [record.get("name") for record in records],
+            "category": [record.get("category") for record in records],
+            "price": [record.get("price") or 0 for record in records],
+            "sales_history": sales_history,
+            "version": [record.get("version", 0) for record in records],
+        }
+        for column, column_values in values.items():
+            self.columns[column][rows] = column_values
+        self.stale[rows] = False
+
+    def page(self, rows, branch_id, stock):
+        """
+        Filas del editor para las posiciones rows, con el stock de la sucursal branch_id
+        stock es la matriz productos x sucursales alineada con las posiciones del catálogo
+        Devuelve (DataFrame, {product_id: stock de todas las sucursales})
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        with self.lock:
+            self.fill(rows)
+            page = {column: values[rows] for column, values in self.columns.items()}
+        stock = stock[rows]
+        # La matriz es float; el stock en unidades enteras se muestra y se guarda como entero
+        if np.array_equal(stock, np.floor(stock)):
+            stock = stock.astype(np.int64)
+        page["stock_quantity"] = stock[:, branch_id] if branch_id < stock.shape[1] else np.zeros(len(rows), dtype=stock.dtype)
+        frame = pd.DataFrame({column: page[column] for column in COLUMNS})
+        return frame, dict(zip(page["product_id"].tolist(), stock.tolist()))
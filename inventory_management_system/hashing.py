@@ -0,0 +1,174 @@
+import hashlib
+import hmac
+import os
+import re
+import secrets
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+import bcrypt
+from instrumentation import timed
+
+# Costo de bcrypt (cada punto duplica el tiempo; 12 son ~250 ms por contraseña)
+BCRYPT_ROUNDS = int(os.environ.get("INVENTORY_BCRYPT_ROUNDS", 12))
+# Procesos para hashear; 0 hashea en el mismo hilo (sin pool)
+HASH_WORKERS = int(os.environ.get("INVENTORY_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+# Segundos que se recuerda un login correcto
+VERIFY_CACHE_TTL = int(os.environ.get("INVENTORY_VERIFY_CACHE_TTL", 300))
+
+BCRYPT_PATTERN = re.compile(r"^\$2[aby]\$\d+\$.{53}$")
+
+
+def is_hash(password):
+    return bool(BCRYPT_PATTERN.match(str(password)))
+
+
+def hash_password(password, rounds=BCRYPT_ROUNDS):
+    # Función de módulo para que los procesos del pool la puedan recibir
+    return bcrypt.hashpw(str(password).encode(), bcrypt.gensalt(rounds)).decode()
+
+
+def check_password(password, hashed_password):
+    return bcrypt.checkpw(str(password).encode(), str(hashed_password).encode())
+
+
+class PasswordHasher:
+    """
+    Servicio de bcrypt con un pool de procesos acotado
+    hash / hash_many reparten el trabajo entre workers procesos y a lo sumo
+    max_pending contraseñas esperan en cola; el resto espera a que se libere lugar
+    background corre un guardado que hashea (alta o cambio de usuario) fuera del rerun
+    verify recuerda los logins correctos por cache_ttl segundos
+    """
+
+    def __init__(self, rounds=BCRYPT_ROUNDS, workers=HASH_WORKERS, max_pending=None, cache_ttl=VERIFY_CACHE_TTL):
+        self.rounds = rounds
+        self.workers = workers
+        self.cache_ttl = cache_ttl
+        self.executor = None
+        self.background_executor = None
+        self.executor_lock = threading.Lock()
+        self.pending = threading.BoundedSemaphore(max_pending or max(workers, 1) * 4)
+        # {clave del login: vencimiento}; la clave es un HMAC con un secreto del proceso,
+        # así en memoria no queda la contraseña ni algo que sirva fuera de este proceso
+        self.verified = {}
+        self.cache_lock = threading.Lock()
+        self.secret = secrets.token_bytes(32)
+
+    def get_executor(self):
+        with self.executor_lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self.executor
+
+    def submit(self, password):
+        # Future con el hash; bloquea solo si ya hay max_pending contraseñas en cola
+        if self.workers <= 0:
+            future = Future()
+            future.set_result(hash_password(password, self.rounds))
+            return future
+        self.pending.acquire()
+        try:
+            future = self.get_executor().submit(hash_password, password, self.rounds)
+        except BaseException:
+            self.pending.release()
+            raise
+        future.add_done_callback(lambda _: self.pending.release())
+        return future
+
+    @timed("hashing.hash")
+    def hash(self, password):
+        return self.submit(password).result()
+
+    def hash_many(self, passwords):
+        """
+        Hashea varias contraseñas en paralelo, en el mismo orden
+        Para importar usuarios en bloque: N contraseñas tardan ~N / workers veces una sola
+        """
+        futures = [self.submit(password) for password in passwords]
+        return [future.result() for future in futures]
+
+    def cache_key(self, password, hashed_password):
+        # Depende del hash guardado: cambiar la contraseña invalida el login recordado
+        return hmac.new(self.secret, f"{hashed_password}\0{password}".encode(), hashlib.sha256).digest()
+
+    @timed("hashing.verify")
+    def verify(self, password, hashed_password):
+        """
+        Verifica una contraseña contra su hash
+        Solo se recuerdan los aciertos; una contraseña incorrecta siempre paga bcrypt
+        """
+        key = self.cache_key(password, hashed_password)
+        now = time.monotonic()
+        with self.cache_lock:
+            expires = self.verified.get(key)
+            if expires is not None:
+                if expires > now:
+                    return True
+                del self.verified[key]
+        if not check_password(password, hashed_password):
+            return False
+        with self.cache_lock:
+            self.verified[key] = now + self.cache_ttl
+            # Limpia los vencidos para que el cache no crezca sin límite
+            if len(self.verified) > 1024:
+                self.verified = {key: expires for key, expires in self.verified.items() if expires > now}
+        return True
+
+    def clear_cache(self):
+        with self.cache_lock:
+            self.verified.clear()
+
+    def background(self, function, *args):
+        """
+        Corre function(*args) en un hilo aparte y devuelve su Future
+        Un solo hilo: los guardados se aplican en el orden en que se pidieron
+        """
+        with self.executor_lock:
+            if self.background_executor is None:
+                self.background_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="user-save")
+            return self.background_executor.submit(function, *args)
+
+    def shutdown(self):
+        # Fuera del lock: un guardado en curso puede necesitar el pool de procesos para terminar
+        with self.executor_lock:
+            executors = [self.background_executor, self.executor]
+            self.background_executor = self.executor = None
+        for executor in executors:
+            if executor is not None:
+                executor.shutdown()
+
+
+default_hasher = None
+default_hasher_lock = threading.Lock()
+
+
+def get_hasher():
+    # Servicio compartido por todo el proceso
+    global default_hasher
+    with default_hasher_lock:
+        if default_hasher is None:
+            default_hasher = PasswordHasher()
+        return default_hasher
+
+
+def use_verify_cache(authentication_model):
+    """
+    Hace que el login del modelo de streamlit-authenticator verifique con get_hasher().verify
+    Solo cambia check_credentials de esa instancia; stauth.Hasher.check_pw sigue igual para el resto del proceso
+    """
+    def check_credentials(username, password):
+        user = authentication_model.credentials['usernames'].get(username)
+        if user is None:
+            return False
+        try:
+            if get_hasher().verify(password, user['password']):
+                return True
+        except (TypeError, ValueError):
+            # Contraseña guardada sin hashear: se rechaza sin contar un intento fallido, como en stauth
+            return None
+        authentication_model._record_failed_login_attempts(username)
+        return False
+
+    authentication_model.check_credentials = check_credentials
+    return authentication_model
@@ -0,0 +1,137 @@
+import json
+import os
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from concurrency import atomic_write, file_lock
+from sales_history import SECONDS_PER_DAY
+from storage import file_version
+
+# Ventas por día de un producto; int32 alcanza y ocupa la mitad que int64
+HISTORY_DTYPE = np.int32
+# Agrupaciones para los gráficos
+FREQUENCIES = {"day": "D", "week": "W", "month": "MS"}
+
+
+def day_date(day):
+    return datetime.fromtimestamp(day * SECONDS_PER_DAY, tz=timezone.utc)
+
+
+def month_key(day):
+    return day_date(day).strftime("%Y-%m")
+
+
+def month_bounds(month):
+    # Primer día y cantidad de días de un mes "YYYY-MM", como números de día
+    year, number = map(int, month.split("-"))
+    first = datetime(year, number, 1, tzinfo=timezone.utc)
+    following = datetime(year + number // 12, number % 12 + 1, 1, tzinfo=timezone.utc)
+    first_day = int(first.timestamp()) // SECONDS_PER_DAY
+    return first_day, int(following.timestamp()) // SECONDS_PER_DAY - first_day
+
+
+class SalesHistoryStore:
+    """
+    Historial de ventas de largo plazo: una partición por mes con una matriz NumPy
+    (productos x días del mes) en YYYY-MM.npy y el id de cada fila en YYYY-MM.ids.json
+    Las particiones se leen con memmap, así una consulta solo lee las filas y días que usa
+    El cambio de día agrega el día que se cierra; la ventana de 30 días sigue en memoria
+    """
+
+    def __init__(self, directory="data/history"):
+        self.directory = directory
+        # {mes: (versión del archivo, ids, {id: fila}, matriz)}
+        self.partitions = {}
+
+    def paths(self, month):
+        return (os.path.join(self.directory, f"{month}.npy"),
+                os.path.join(self.directory, f"{month}.ids.json"))
+
+    def load_partition(self, month):
+        # Partición de solo lectura; se vuelve a abrir solo si el archivo cambió
+        matrix_file, ids_file = self.paths(month)
+        version = (file_version(matrix_file), file_version(ids_file))
+        cached = self.partitions.get(month)
+        if cached is not None and cached[0] == version:
+            return cached[1:]
+        if not os.path.exists(matrix_file):
+            return [], {}, None
+        with open(ids_file, "r") as file:
+            ids = json.load(file)
+        matrix = np.load(matrix_file, mmap_mode="r")
+        rows = {product_id: row for row, product_id in enumerate(ids)}
+        self.partitions[month] = (version, ids, rows, matrix)
+        return ids, rows, matrix
+
+    def append_day(self, day, product_ids, values):
+        """
+        Guarda las ventas de un día cerrado (una por producto)
+        Volver a guardar el mismo día lo reemplaza, así repetir un cambio de día no duplica ventas
+        """
+        month = month_key(day)
+        first_day, days_in_month = month_bounds(month)
+        matrix_file, ids_file = self.paths(month)
+        os.makedirs(self.directory, exist_ok=True)
+        with file_lock(matrix_file):
+            ids, rows, _ = self.load_partition(month)
+            ids = list(ids)
+            new_ids = [product_id for product_id in product_ids if product_id not in rows]
+            if new_ids or not os.path.exists(matrix_file):
+                # Productos nuevos: se reescribe la partición con más filas (pasa pocas veces por mes)
+                old = np.load(matrix_file) if os.path.exists(matrix_file) else np.zeros((0, days_in_month), HISTORY_DTYPE)
+                ids += new_ids
+                temp_file = matrix_file + ".tmp.npy"
+                matrix = np.lib.format.open_memmap(temp_file, mode="w+", dtype=HISTORY_DTYPE,
+                                                   shape=(len(ids), days_in_month))
+                matrix[:len(old)] = old
+                matrix.flush()
+                del matrix
+                os.replace(temp_file, matrix_file)
+                atomic_write(ids_file, json.dumps(ids))
+                rows = {product_id: row for row, product_id in enumerate(ids)}
+            matrix = np.load(matrix_file, mmap_mode="r+")
+            matrix[[rows[product_id] for product_id in product_ids], day - first_day] = values
+            matrix.flush()
+            del matrix
+            self.partitions.pop(month, None)
+
+    def months(self, start_day, end_day):
+        month = month_key(start_day)
+        while True:
+            first_day, days_in_month = month_bounds(month)
+            if first_day > end_day:
+                return
+            yield month, first_day, days_in_month
+            month = month_key(first_day + days_in_month)
+
+    def query(self, product_ids, start_day, end_day):
+        """
+        Ventas diarias de los productos entre start_day y end_day (inclusive)
+        Devuelve una matriz len(product_ids) x días; los días sin datos quedan en 0
+        """
+        result = np.zeros((len(product_ids), end_day - start_day + 1), dtype=np.int64)
+        for month, first_day, days_in_month in self.months(start_day, end_day):
+            _, rows, matrix = self.load_partition(month)
+            if matrix is None:
+                continue
+            found = [(position, rows[product_id]) for position, product_id in enumerate(product_ids) if product_id in rows]
+            if not found:
+                continue
+            positions, matrix_rows = zip(*found)
+            low = max(start_day, first_day)
+            high = min(end_day, first_day + days_in_month - 1)
+            result[list(positions), low - start_day:high - start_day + 1] = \
+                matrix[list(matrix_rows), low - first_day:high - first_day + 1]
+        return result
+
+
+def downsample(values, start_day, frequency="week"):
+    """
+    Serie de ventas por día agrupada por semana o mes (sumas), indexada por fecha
+    Para gráficos de rangos largos sin dibujar un punto por día
+    """
+    index = pd.date_range(day_date(start_day).date(), periods=len(values), freq="D")
+    series = pd.Series(np.asarray(values), index=index)
+    if frequency == "day":
+        return series
+    return series.resample(FREQUENCIES[frequency]).sum()
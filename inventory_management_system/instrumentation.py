@@ -0,0 +1,145 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Con INVENTORY_PROFILE=1 se miden tiempos, llamadas y bytes de cada recarga
+# Apagado, timed() devuelve la función sin envolver y count() retorna de inmediato (sin evaluar su valor)
+ENABLED = os.environ.get("INVENTORY_PROFILE", "") not in ("", "0")
+# Recargas recientes que se guardan para el panel de depuración
+HISTORY_SIZE = 50
+
+logger = logging.getLogger("inventory.perf")
+if ENABLED and not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+class Rerun:
+    """
+    Métricas de una recarga: {nombre: [llamadas, segundos]} para los tiempos
+    y {nombre: valor} para los contadores (bytes leídos/escritos, guardados)
+    """
+
+    def __init__(self, label):
+        self.label = label
+        self.start = time.perf_counter()
+        self.seconds = None
+        self.timers = {}
+        self.counters = {}
+
+    def add_time(self, name, seconds):
+        timer = self.timers.setdefault(name, [0, 0.0])
+        timer[0] += 1
+        timer[1] += seconds
+
+    def add(self, name, value):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self.start
+
+    def to_dict(self):
+        return {
+            "label": self.label,
+            "ms": round((self.seconds or 0) * 1000, 3),
+            "timers": {name: {"calls": calls, "ms": round(seconds * 1000, 3)}
+                       for name, (calls, seconds) in sorted(self.timers.items(), key=lambda item: -item[1][1])},
+            "counters": dict(self.counters),
+        }
+
+
+# Cada sesión de Streamlit corre su script en su propio hilo: la recarga en curso es por hilo
+_current = threading.local()
+recent = deque(maxlen=HISTORY_SIZE)
+
+
+def current():
+    return getattr(_current, "rerun", None)
+
+
+@contextmanager
+def rerun(label):
+    """
+    Junta las métricas de todo lo que corre dentro del bloque (una recarga de la app o
+    un caso de benchmark); al terminar escribe una línea de log JSON y la guarda en recent
+    Devuelve None si la instrumentación está apagada
+    """
+    if not ENABLED:
+        yield None
+        return
+    previous = current()
+    metrics = _current.rerun = Rerun(label)
+    try:
+        yield metrics
+    finally:
+        metrics.finish()
+        _current.rerun = previous
+        summary = metrics.to_dict()
+        recent.append(summary)
+        logger.info(json.dumps(summary, separators=(",", ":")))
+
+
+def timed(name):
+    """
+    Decorador que suma llamadas y tiempo de la función a la recarga en curso
+    Apagado no agrega nada: devuelve la misma función
+    """
+    def decorator(function):
+        if not ENABLED:
+            return function
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            metrics = current()
+            if metrics is None:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                metrics.add_time(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def timed_methods(prefix, label):
+    """
+    Decorador de clase: aplica timed a todos los métodos cuyo nombre empieza con prefix
+    Cada método se registra como "<label>.<nombre del método>"
+    """
+    def decorator(cls):
+        if ENABLED:
+            for attribute, value in list(vars(cls).items()):
+                if attribute.startswith(prefix) and callable(value):
+                    setattr(cls, attribute, timed(f"{label}.{attribute}")(value))
+        return cls
+    return decorator
+
+
+def count(name, value=1):
+    """
+    Suma a un contador de la recarga en curso (bytes, guardados, ...)
+    value puede ser una función sin argumentos: solo se llama si hay una recarga midiéndose,
+    así un valor caro de obtener (como el tamaño de un archivo) no se calcula con la instrumentación apagada
+    """
+    if not ENABLED:
+        return
+    metrics = current()
+    if metrics is not None:
+        metrics.add(name, value() if callable(value) else value)
+
+
+def file_size(path):
+    # Tamaño para los contadores de bytes; se pasa a count como lambda: file_size(path)
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
@@ -1,36 +1,49 @@
 from product import Product
+from branches import BranchRegistry, with_branch_stock
+from concurrency import ConflictError
+from validation import validate_fields
+from bulk_io import export_products, import_products, read_rows
+from analytics import LONG_WINDOW, SHORT_WINDOW
+from history_store import downsample
+import instrumentation
+from instrumentation import timed, timed_methods
+import numpy as np
 from user import User
+from hashing import get_hasher
 from role_permission import RolePermission
 from yamlmanager import YamlManager
 from pathlib import Path
-import time
-from datetime import datetime
+from datetime import date, datetime, timedelta, timezone
+import io
+import threading
 import streamlit as st
 import pandas as pd
 
+@timed_methods("display_", "page")
 class InventorySystem:
-    def __init__(self):
+    def __init__(self, yaml_manager=None):
         self.product_manager = Product()
         self.user_manager = User()
         self.role_permission_manager = RolePermission()
-        self.yaml_manager = YamlManager()
+        self.yaml_manager = yaml_manager or YamlManager()
+        self.branch_registry = BranchRegistry()
+        self.refresh_lock = threading.Lock()
 
-    def validate_fields(self, fields):
+    @timed("page.refresh")
+    def refresh(self):
         """
-        Verifica que los inputs sean correctos para evitar problemas
-        Cada input se pasa como un diccionario con el nombre como llave
-        Devuelve error si la verificacion falla
+        Revisa si otro proceso cambió los archivos y recarga solo lo que cambió
+        Si nada cambió no se lee nada del disco (solo se consulta la fecha de modificación)
         """
-        for field, value in fields.items():
-            # Revisa los strings
-            if value in [None, '']:  # Verifica que el string no esté vacio
-                return f"{field.replace('_', ' ').capitalize()} es requerido."
-            # Additional specific field validations
-            if field == "price" and value <= 0:
-                return "El precio debe ser mayor a 0."
-            if field == "stock_quantity" and value < 0:
-                return "El stock debe ser mayor a 0."
-        return None  # No hay errores
+        with self.refresh_lock:
+            self.product_manager.reload_if_stale()
+            self.user_manager.reload_if_stale()
+            self.role_permission_manager.reload_if_stale()
+            self.branch_registry.reload_if_stale()
+
+    def validate_fields(self, fields):
+        # Las reglas están en validation.py para que la importación masiva use las mismas
+        return validate_fields(fields)
 
     def display_home(self):
         st.markdown(
@@ -42,6 +55,28 @@ class InventorySystem:
             """,
             unsafe_allow_html=True
         )
+        self.display_low_stock_alerts()
+
+    def display_low_stock_alerts(self, limit=10):
+        # Alertas de stock bajo leídas del índice (no recorre el catálogo)
+        st.markdown("**Productos para reponer**")
+        branch_names = self.branch_registry.names()
+        tabs = st.tabs(branch_names)
+        for branch_id, tab in enumerate(tabs):
+            with tab:
+                lowest = self.product_manager.lowest_stock(branch_id, limit=limit)
+                if not lowest:
+                    st.caption("Todos los productos están sobre su punto de pedido.")
+                    continue
+                st.dataframe(pd.DataFrame([
+                    {
+                        "ID": product["product_id"],
+                        "Producto": product["name"],
+                        "Stock": int(quantity),
+                        "Punto de pedido": int(point),
+                    }
+                    for product, quantity, point in lowest
+                ]), hide_index=True)
 
     def display_product_management(self):
         st.markdown(
@@ -74,13 +109,14 @@ class InventorySystem:
             # Muestra selector de sucursal y añadir producto
             branch_column, add_column = st.columns([1, 1])
             with branch_column:
-                branch_options = ["Sucursal 1", "Sucursal 2", "Sucursal 3"]
+                branch_options = self.branch_registry.names()
                 branch_option = st.selectbox("Buscar por", branch_options)
 
                 # Guardar el índice en session_state
                 st.session_state.branch = branch_options.index(branch_option)
                 if 'last_branch' not in st.session_state:
                     st.session_state.last_branch = st.session_state.branch
+                st.caption(f"Stock total en {branch_option}: {self.product_manager.branch_total(st.session_state.branch)}")
 
             with add_column:
                 if st.session_state.get("role", "user") == "admin":
@@ -90,38 +126,63 @@ class InventorySystem:
                         st.rerun()
                     st.markdown("</div>", unsafe_allow_html=True)
 
+                    with st.expander("Añadir sucursal"):
+                        new_branch = st.text_input("Nombre de la sucursal", key="new_branch_name")
+                        if st.button("Guardar sucursal", key="add_branch_button"):
+                            if not new_branch.strip():
+                                st.error("El nombre es requerido.")
+                            else:
+                                try:
+                                    self.branch_registry.add_branch(new_branch.strip())
+                                    st.rerun()
+                                except ValueError as e:
+                                    st.error(str(e))
+
+                    with st.expander("Transferir stock"):
+                        self.display_transfer_form(branch_options)
+
             st.markdown(
                 """ <hr style='margin-top: 8px; margin-bottom: 8px;' /> """,
                 unsafe_allow_html=True
             )
 
-            filtered_data = self.product_manager.products
-
             if filter_button:
-                # Añadir filtrado basado en input del usuario
-                if filter_option == "ID de producto":
-                    filtered_data = [prod for prod in filtered_data if str(filter_value).lower() in str(prod["product_id"]).lower()]
-                elif filter_option == "Nombre de producto":
-                    filtered_data = [prod for prod in filtered_data if str(filter_value).lower() in str(prod["name"]).lower()]
-                elif filter_option == "Categoría":
-                    filtered_data = [prod for prod in filtered_data if str(filter_value).lower() in str(prod["category"]).lower()]
+                # Guarda el filtro para que siga aplicado al cambiar de página
+                filter_fields = {"ID de producto": "product_id", "Nombre de producto": "name", "Categoría": "category"}
+                st.session_state.product_filter = (filter_fields[filter_option], filter_value)
+                st.session_state.product_page = 1
+            filter_field, filter_text = st.session_state.get("product_filter", (None, ""))
+
+            # Orden y tamaño de página
+            sort_column, order_column, size_column = st.columns([2, 1, 1])
+            with sort_column:
+                sort_options = {"ID de producto": "product_id", "Nombre de producto": "name", "Categoría": "category", "Precio": "price"}
+                sort_option = st.selectbox("Ordenar por", list(sort_options))
+            with order_column:
+                descending = st.selectbox("Orden", ["Ascendente", "Descendente"]) == "Descendente"
+            with size_column:
+                page_size = st.selectbox("Productos por página", [25, 50, 100], index=1)
+
+            # Solo se trae la página elegida; el filtro y el orden se aplican en la capa de datos
+            page = st.session_state.get("product_page", 1)
+            filtered_data, total = self.product_manager.get_page(
+                page - 1, page_size, sort_options[sort_option], descending, filter_field, filter_text
+            )
+            page_count = max(1, -(-total // page_size))
+            if page > page_count:
+                page = page_count
+                filtered_data, total = self.product_manager.get_page(
+                    page - 1, page_size, sort_options[sort_option], descending, filter_field, filter_text
+                )
 
             # Muestra los productos encontrados
             if len(filtered_data) == 0:
                 st.write("No se encontró productos.")
             else:
-                # Elige los datos de la sucursal elegida
-                original_df = pd.DataFrame(filtered_data).copy()
-                
-                # Guarda temporalmente los stocks por sucursal
-                original_stock_quantity = [
-                    {"product_id": row["product_id"], "stock_quantity": row["stock_quantity"]}
-                    for _, row in original_df.iterrows()
-                ]
-                original_stock_map = {item["product_id"]: item["stock_quantity"] for item in original_stock_quantity}
-
-                original_df["stock_quantity"] = original_df["stock_quantity"].apply(lambda lista: lista[st.session_state.branch])
-                original_df["add_or_sell"] = ["" for _ in range(len(original_df))]
+                # Filas de la tabla compartida del editor, con el stock de la sucursal elegida
+                # y los stocks de todas las sucursales para guardar los cambios
+                original_df, original_stock_map = self.product_manager.editor_frame(filtered_data, st.session_state.branch)
+                original_df["add_or_sell"] = ""
 
                 # Editor interactivo
                 edited_df = st.data_editor(
@@ -129,6 +190,7 @@ class InventorySystem:
                     column_config={
                         "product_id": None,
                         "last_sales_history": None,
+                        "version": None,
                         "name": "Producto",
                         "category": "Categoría",
                         "price": "Precio",
@@ -142,84 +204,116 @@ class InventorySystem:
                     hide_index=True,
                 )
 
-                # Comparar y actualizar
-                has_changes = False
-                stock_below_zero = False
-
-                # Calcular días transcurridos desde ultima actualizacion
-                current_seconds = int(time.time())
-                seconds_passed = current_seconds - self.product_manager.last_date_update
-                days_passed = int(seconds_passed // 86400) # segundos en un día
-
-                for i, row in edited_df.iterrows():
-                    original_row = original_df.loc[i]
-
-                    # Actualiza todos los sales_history para estar al día
-                    if days_passed >= 1:
-                        new_sales_history = []
-                        product_id = original_row["product_id"]
-                        updated_product = row.to_dict()
-                        updated_product["product_id"] = product_id
-                        updated_product.pop("add_or_sell", None)
-                        updated_product["stock_quantity"] = original_stock_map[product_id]
-
-                        if days_passed >= 30:
-                            new_sales_history = [0] * (30 - 1)
-                        else:
-                            # cortar los días pasados viejos
-                            new_sales_history = updated_product["sales_history"][days_passed:]
-                            # añadir los días pasados nuevos
-                            new_sales_history += [0] * (30 - len(new_sales_history) - 1)
-                        updated_product["sales_history"] = new_sales_history
-                        self.product_manager.update_product(product_id, updated_product)
-                        self.product_manager.update_date(
-                            {
-                                "date": current_seconds
-                            }
-                        )
-                        has_changes = True
-                    
-                    if not row.equals(original_row):
-                        # Cuando hubo un cambio, guarda la fila cambiada
-                        product_id = original_row["product_id"]
-                        updated_product = row.to_dict()
-                        updated_product["product_id"] = product_id
-
-                        # Copia el nuevo stock en la sucursal especifica
-                        # Combinandolo con los stocks de las otras sucursales
-                        updated_stock_map = original_stock_map[product_id]
-                        if updated_product["add_or_sell"] != "":
-                            # Si fue una venta
-                            if int(updated_product["add_or_sell"]) < 0:
-                                updated_product["sales_history"][-1] += abs(int(updated_product["add_or_sell"]))
-                            # Actualiza el stock
-                            new_stock = int(updated_product["stock_quantity"]) + int(updated_product["add_or_sell"])
-                            updated_stock_map[st.session_state.branch] = new_stock
-                            if new_stock < 0:
-                                has_changes = True
-                                stock_below_zero = True
-                                break # Rompe el ciclo antes de que se actualice
-                        updated_product["stock_quantity"] = updated_stock_map
-
-                        # Quitar columnas extras para evitar subirlos a BDD
-                        updated_product.pop("add_or_sell", None)
-
-                        # Añade los cambios
-                        self.product_manager.update_product(product_id, updated_product)
-                        has_changes = True
-
-                if stock_below_zero:
+                # Navegación entre páginas
+                first_row = (page - 1) * page_size + 1
+                info_column, page_column = st.columns([3, 1])
+                with info_column:
+                    st.caption(f"Mostrando {first_row}-{first_row + len(filtered_data) - 1} de {total} productos")
+                with page_column:
+                    st.session_state.product_page = st.number_input(
+                        "Página", min_value=1, max_value=page_count, value=page, step=1
+                    )
+
+                error = self.apply_product_edits(original_df, edited_df, original_stock_map, st.session_state.branch)
+                if error:
                     # Muestra error si se intento vender mas de lo que se tenia
-                    st.session_state.stock_below_zero = True
-                    st.toast('No puedes quedar en stock negativo.', icon='❌')
-                    st.session_state.pop("stock_below_zero", None)
-                if has_changes and not stock_below_zero:
+                    st.toast(error, icon='❌')
+                elif error is not None:
                     st.rerun()
 
+    def display_transfer_form(self, branch_options):
+        # Mueve stock entre sucursales en una sola escritura (queda en el registro de auditoría)
+        with st.form(key="transfer_stock_form"):
+            from_branch = st.selectbox("Desde", branch_options, key="transfer_from")
+            to_branch = st.selectbox("Hacia", branch_options, index=min(1, len(branch_options) - 1), key="transfer_to")
+            product_id = st.text_input("ID de producto", key="transfer_product_id")
+            quantity = st.number_input("Cantidad", min_value=1, step=1, key="transfer_quantity")
+            if st.form_submit_button("Transferir"):
+                try:
+                    self.product_manager.transfer_stock(
+                        branch_options.index(from_branch), branch_options.index(to_branch),
+                        [(product_id.strip(), int(quantity))], user=st.session_state.get("username"),
+                    )
+                except (ValueError, ConflictError) as e:
+                    st.error(str(e))
+                else:
+                    st.rerun()
+
+    @timed("page.apply_product_edits")
+    def apply_product_edits(self, original_df, edited_df, original_stock_map, branch):
+        """
+        Compara el editor con los datos originales, valida todas las filas cambiadas
+        y guarda los cambios en un solo lote
+        Devuelve None si no hubo cambios, "" si se guardaron o el mensaje de error
+        """
+        # Filas cambiadas (comparación vectorizada de las columnas editables)
+        editable_columns = ["name", "category", "price", "add_or_sell"]
+        edited = edited_df[editable_columns].fillna("")
+        original = original_df[editable_columns].fillna("")
+        changed_rows = edited_df[(edited != original).any(axis=1)]
+        if changed_rows.empty:
+            return None
+
+        # Movimiento de stock: positivo añade, negativo es venta
+        add_or_sell = changed_rows["add_or_sell"].fillna("").astype(str).str.strip()
+        movement = pd.to_numeric(add_or_sell.replace("", "0"), errors="coerce")
+        if movement.isna().any():
+            return "La cantidad a añadir o vender debe ser un número."
+        # astype(int) truncaría "2.7" a 2 (y un infinito no es entero)
+        if (movement % 1 != 0).any():
+            return "La cantidad a añadir o vender debe ser un número entero."
+        movement = movement.astype(int)
+        new_stock = changed_rows["stock_quantity"].astype(int) + movement
+        if (new_stock < 0).any():
+            return "No puedes quedar en stock negativo."
+
+        # Versiones leídas, para detectar si otro usuario cambió los productos mientras tanto
+        if "version" in original_df:
+            versions = original_df.loc[changed_rows.index, "version"].fillna(0).astype(int)
+        else:
+            versions = pd.Series(0, index=changed_rows.index)
+
+        updated_products = {}
+        expected_versions = {}
+        sales = {}
+        rows = zip(changed_rows.index, changed_rows.to_dict("records"), movement, new_stock)
+        for index, row, quantity, stock in rows:
+            # Una celda de precio borrada llega como NaN: se valida como vacía
+            validation_error = self.validate_fields({
+                "name": row["name"],
+                "category": row["category"],
+                "price": None if pd.isna(row["price"]) else row["price"],
+            })
+            if validation_error:
+                return validation_error
+
+            product_id = row["product_id"]
+            updated_product = row
+            updated_product.pop("add_or_sell", None)
+            updated_product.pop("version", None)
+            expected_versions[product_id] = int(versions[index])
+
+            # Copia el nuevo stock en la sucursal especifica
+            # Combinandolo con los stocks de las otras sucursales
+            updated_product["stock_quantity"] = with_branch_stock(original_stock_map[product_id], branch, int(stock))
+
+            # Si fue una venta se suma al día actual del historial en la capa de datos
+            updated_product.pop("sales_history", None)
+            if quantity < 0:
+                sales[product_id] = abs(int(quantity))
+
+            updated_products[product_id] = updated_product
+
+        try:
+            self.product_manager.update_products(updated_products, expected_versions, sales)
+        except ConflictError as e:
+            return f"{e} Revisa los datos y vuelve a intentar."
+        return ""
+
     def display_add_product_form(self):
         st.subheader("Añadir nuevo producto")
 
-        # Crear nuevo ID incremental
+        # Próximo ID; el definitivo se reserva al guardar, así dos administradores no reciben el mismo
         product_id = self.product_manager.get_next_product_id()
 
         with st.form(key='add_product_form_unique'):
@@ -230,7 +324,7 @@ class InventorySystem:
             price = st.number_input("Precio de producto", min_value=0.01, step=0.01, placeholder="Ingrese precio de producto")
 
             # Selector de sucursal
-            branch_names = ["Sucursal 1", "Sucursal 2", "Sucursal 3"]
+            branch_names = self.branch_registry.names()
             branch_name = st.selectbox("Sucursal de ingreso de stock", branch_names)
             branch_id = branch_names.index(branch_name)
 
@@ -257,24 +351,26 @@ class InventorySystem:
                 if validation_error:
                     st.error(validation_error)
                 else:
-                    # Construir lista de stock por sucursal (3 sucursales)
-                    stock_quantity = [0, 0, 0]
-                    stock_quantity[branch_id] = stock_quantity_input
+                    # Construir lista de stock por sucursal
+                    stock_quantity = with_branch_stock([0] * len(self.branch_registry), branch_id, stock_quantity_input)
 
                     new_product = {
-                        "product_id": product_id,
                         "name": name,
                         "category": category,
                         "price": price,
                         "stock_quantity": stock_quantity
                     }
 
-                    self.product_manager.add_product(new_product)
-                    st.success(f"Producto '{name}' ha sido añadido correctamente!")
+                    try:
+                        product_id = self.product_manager.add_product(new_product)
+                    except ConflictError as e:
+                        st.error(str(e))
+                    else:
+                        st.success(f"Producto '{name}' ha sido añadido correctamente con el ID {product_id}!")
 
-                    # Redirigir
-                    st.session_state.page = "product_management"
-                    st.rerun()
+                        # Redirigir
+                        st.session_state.page = "product_management"
+                        st.rerun()
             elif cancel_button:
                 st.session_state.page = "product_management"
                 st.rerun()
@@ -345,6 +441,139 @@ class InventorySystem:
                 st.session_state.page = "product_management"
                 st.rerun()
 
+    def display_sales_dashboard(self):
+        st.markdown(
+            """
+            <div style='margin: 0px; padding: 0px;'>
+                <h3 style='margin: 0px; padding: 0px;'>Análisis de ventas</h3>
+                <hr style='margin-top: 16px; margin-bottom: 16px;' />
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
+        # Las métricas se mantienen en el sistema de productos; aquí solo se leen
+        analytics = self.product_manager.get_analytics()
+        branch_names = self.branch_registry.names()
+        branch_name = st.selectbox("Sucursal", branch_names, key="dashboard_branch")
+        branch_id = branch_names.index(branch_name)
+
+        days_of_cover = analytics.days_of_cover(branch_id)
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric(f"Ventas {SHORT_WINDOW} días", f"{int(analytics.short_totals.sum()):,}")
+        col2.metric(f"Ventas {LONG_WINDOW} días", f"{int(analytics.long_totals.sum()):,}")
+        col3.metric("Productos sin ventas", int((analytics.long_totals == 0).sum()))
+        col4.metric(f"Cobertura menor a {SHORT_WINDOW} días", int((days_of_cover < SHORT_WINDOW).sum()))
+
+        st.caption("Ventas diarias del catálogo")
+        st.line_chart(pd.DataFrame({"Ventas": analytics.daily_totals()}))
+
+        column_config = {
+            "product_id": "ID",
+            "name": "Producto",
+            "category": "Categoría",
+            "stock": st.column_config.NumberColumn("Stock", format="%d"),
+            f"total_{SHORT_WINDOW}": f"Ventas {SHORT_WINDOW} días",
+            f"total_{LONG_WINDOW}": f"Ventas {LONG_WINDOW} días",
+            f"avg_{SHORT_WINDOW}": st.column_config.NumberColumn(f"Promedio {SHORT_WINDOW} días", format="%.1f"),
+            f"avg_{LONG_WINDOW}": st.column_config.NumberColumn(f"Promedio {LONG_WINDOW} días", format="%.1f"),
+            "velocity": st.column_config.NumberColumn("Velocidad (u/día)", format="%.1f"),
+            "days_of_cover": st.column_config.NumberColumn("Días de cobertura", format="%.1f"),
+            "products": "Productos",
+        }
+
+        st.markdown("**Por categoría**")
+        st.dataframe(analytics.category_frame(branch_id), hide_index=True, column_config=column_config)
+
+        st.markdown("**Por producto**")
+        sort_options = {
+            "Velocidad": ("velocity", False),
+            f"Ventas {LONG_WINDOW} días": (f"total_{LONG_WINDOW}", False),
+            "Días de cobertura": ("days_of_cover", True),
+        }
+        sort_column, limit_column = st.columns([3, 1])
+        with sort_column:
+            sort_label = st.selectbox("Ordenar por", list(sort_options), key="dashboard_sort")
+        with limit_column:
+            limit = st.selectbox("Mostrar", [50, 200, 1000], key="dashboard_limit")
+        sort_key, ascending = sort_options[sort_label]
+        # Solo se arma la tabla de los productos que se muestran
+        values = {"velocity": analytics.velocity(), f"total_{LONG_WINDOW}": analytics.long_totals,
+                  "days_of_cover": days_of_cover}[sort_key]
+        order = np.argsort(values if ascending else -values, kind="stable")[:limit]
+        st.dataframe(analytics.frame(branch_id, order), hide_index=True, column_config=column_config)
+
+        self.display_product_history()
+
+    def display_product_history(self):
+        # Ventas de un producto en un rango largo: días cerrados del historial + ventana actual
+        st.markdown("**Historial de un producto**")
+        id_column, start_column, end_column, frequency_column = st.columns([2, 2, 2, 2])
+        with id_column:
+            product_id = st.text_input("ID de producto", key="history_product_id")
+        today = datetime.fromtimestamp(self.product_manager.last_date_update, tz=timezone.utc).date()
+        with start_column:
+            start_date = st.date_input("Desde", value=today - timedelta(days=365), key="history_start")
+        with end_column:
+            end_date = st.date_input("Hasta", value=today, key="history_end")
+        with frequency_column:
+            frequency_labels = {"Día": "day", "Semana": "week", "Mes": "month"}
+            frequency = frequency_labels[st.selectbox("Agrupar por", list(frequency_labels), index=1, key="history_frequency")]
+        if not product_id:
+            return
+        if self.product_manager.get_product_by_id(product_id) is None:
+            st.error(f"No existe el producto '{product_id}'.")
+            return
+        if start_date > end_date:
+            st.error("La fecha inicial debe ser anterior a la final.")
+            return
+        start_day = (start_date - date(1970, 1, 1)).days
+        end_day = (end_date - date(1970, 1, 1)).days
+        values = self.product_manager.sales_range([product_id], start_day, end_day)[0]
+        st.line_chart(pd.DataFrame({"Ventas": downsample(values, start_day, frequency)}))
+
+    def display_bulk_io(self):
+        st.markdown(
+            """
+            <div style='margin: 0px; padding: 0px;'>
+                <h3 style='margin: 0px; padding: 0px;'>Importar / exportar productos</h3>
+                <hr style='margin-top: 16px; margin-bottom: 16px;' />
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
+        branch_names = self.branch_registry.names()
+        st.caption("Columnas: product_id (vacío para asignarlo), name, category, price y una columna de stock por sucursal: "
+                   + ", ".join(branch_names))
+
+        uploaded_file = st.file_uploader("Archivo de productos", type=["csv", "xlsx"])
+        if uploaded_file is not None and st.button("Importar", key="import_products_button"):
+            try:
+                with st.spinner("Importando productos..."):
+                    summary = import_products(self.product_manager, read_rows(uploaded_file), branch_names)
+            except ValueError as e:
+                st.error(str(e))
+            else:
+                st.success(f"Se importaron {summary['imported']} productos.")
+                if summary["rejected"]:
+                    st.warning(f"{summary['rejected']} filas con errores no se importaron.")
+                    st.dataframe(pd.DataFrame(summary["errors"]), hide_index=True)
+
+        st.markdown(""" <hr style='margin-top: 8px; margin-bottom: 8px;' /> """, unsafe_allow_html=True)
+
+        # El archivo se arma solo al pedirlo, no en cada recarga de la página
+        fmt = st.selectbox("Formato de exportación", ["csv", "xlsx"])
+        if st.button("Preparar exportación", key="export_products_button"):
+            buffer = io.BytesIO()
+            try:
+                export_products(self.product_manager, buffer, branch_names, fmt=fmt)
+            except ValueError as e:
+                st.error(str(e))
+            else:
+                st.session_state.product_export = (fmt, buffer.getvalue())
+        if st.session_state.get("product_export"):
+            export_format, data = st.session_state.product_export
+            st.download_button("Descargar", data, file_name=f"productos.{export_format}")
+
     def display_user_management(self):
         st.markdown(
             """
@@ -356,6 +585,9 @@ class InventorySystem:
             unsafe_allow_html=True
         )
 
+        self.display_user_save_results()
+        self.display_pending_user_saves()
+
         # Add User button
         if st.session_state.get("role") == "admin":
             st.markdown("<div style='margin-top: 28px;'>", unsafe_allow_html=True)
@@ -413,6 +645,31 @@ class InventorySystem:
                 unsafe_allow_html=True
             )
 
+    def save_user_in_background(self, label, function, *args):
+        # El hash de la contraseña (bcrypt) tarda: el guardado sigue en segundo plano y la lista muestra su estado
+        future = get_hasher().background(function, *args)
+        st.session_state.setdefault("pending_user_saves", []).append((label, future))
+
+    def display_user_save_results(self):
+        for label, error in st.session_state.pop("user_save_results", []):
+            if error is None:
+                st.success(f"{label}: guardado")
+            else:
+                st.error(f"{label}: {error}")
+
+    @st.fragment(run_every=1)
+    def display_pending_user_saves(self):
+        # Se revisa cada segundo; cuando termina un guardado se recarga la página con la lista actualizada
+        pending = st.session_state.get("pending_user_saves", [])
+        finished = [(label, future) for label, future in pending if future.done()]
+        if finished:
+            st.session_state["pending_user_saves"] = [item for item in pending if item not in finished]
+            st.session_state.setdefault("user_save_results", []).extend(
+                (label, future.exception()) for label, future in finished)
+            st.rerun(scope="app")
+        for label, _ in pending:
+            st.info(f"{label}: guardando...")
+
     def display_add_user_form(self):
         st.subheader("Añadir nuevo usuario")
 
@@ -424,18 +681,17 @@ class InventorySystem:
             role = st.selectbox("Rol", ["admin", "user"])
 
             if st.form_submit_button("Guardar"):
-                try:
-                    self.yaml_manager.add_user(username, {
+                if self.yaml_manager.get_user(username):
+                    st.error(f"El usuario '{username}' ya existe")
+                else:
+                    self.save_user_in_background(f"Alta de {username}", self.yaml_manager.add_user, username, {
                         "email": email,
                         "name": name,
-                        "password": password,  # Remember to hash this in production
+                        "password": password,
                         "role": role
                     })
-                    st.success("Usuario creado exitosamente!")
                     st.session_state.page = "user_management"
                     st.rerun()
-                except Exception as e:
-                    st.error(str(e))
 
             if st.form_submit_button("Cancelar"):
                 st.session_state.page = "user_management"
@@ -469,27 +725,26 @@ class InventorySystem:
                                index=0 if user['role'] == "admin" else 1)
 
             if st.form_submit_button("Guardar cambios"):
-                try:
-                    updated_user = {
-                        "email": email,
-                        "name": name,
-                        "role": role
-                    }
+                updated_user = {
+                    "email": email,
+                    "name": name,
+                    "role": role
+                }
 
-                    if password:
-                        updated_user["password"] = password
+                if password:
+                    updated_user["password"] = password
 
+                if new_username != username and self.yaml_manager.get_user(new_username):
+                    st.error(f"El usuario '{new_username}' ya existe")
+                else:
                     if new_username != username:
-                        self.yaml_manager.delete_user(username)
-                        self.yaml_manager.add_user(new_username, {**user, **updated_user})
+                        self.save_user_in_background(f"Cambios de {username}", self.yaml_manager.rename_user,
+                                                     username, new_username, updated_user)
                     else:
-                        self.yaml_manager.update_user(username, updated_user)
-
-                    st.success("Usuario actualizado correctamente!")
+                        self.save_user_in_background(f"Cambios de {username}", self.yaml_manager.update_user,
+                                                     username, updated_user)
                     st.session_state.page = "user_management"
                     st.rerun()
-                except Exception as e:
-                    st.error(f"Error al actualizar usuario: {str(e)}")
 
             if st.form_submit_button("Cancelar"):
                 st.session_state.page = "user_management"
@@ -589,10 +844,11 @@ class InventorySystem:
     def display_add_role_form(self):
         st.subheader("Añadir nuevo rol")
 
+        # Próximo ID; el definitivo se reserva al guardar
         role_id = self.role_permission_manager.get_next_role_id()
 
         with st.form(key='add_role_form'):
-            role_id = st.text_input("ID de rol (auto)", value=role_id, disabled=True)
+            st.text_input("ID de rol (auto)", value=role_id, disabled=True)
             name = st.text_input("Nombre de rol")
             permission_level = st.text_input("Nivel de permiso")
             submit_button = st.form_submit_button(label='Añadir rol')
@@ -600,15 +856,18 @@ class InventorySystem:
 
             if submit_button:
                 new_role = {
-                    "role_id": role_id,
                     "name": name,
                     "permission_level": permission_level
                 }
-                self.role_permission_manager.add_role(new_role)
-                st.success(f"Rol '{name}' añadido correctamente!")
+                try:
+                    self.role_permission_manager.add_role(new_role)
+                except ConflictError as e:
+                    st.error(str(e))
+                else:
+                    st.success(f"Rol '{name}' añadido correctamente!")
 
-                st.session_state.page = "role_permission_management"
-                st.rerun()
+                    st.session_state.page = "role_permission_management"
+                    st.rerun()
             elif cancel_button:
                 st.session_state.page = "role_permission_management"
                 st.rerun()
@@ -652,3 +911,22 @@ class InventorySystem:
                 st.success(f"Rol '{role['name']}' eliminado correctamente!")
                 st.session_state.page = "role_permission_management"
                 st.rerun()
+
+    def display_debug_panel(self, metrics):
+        # Panel de rendimiento (solo administradores, con INVENTORY_PROFILE=1): métricas de la recarga actual
+        with st.sidebar.expander("Rendimiento"):
+            st.caption(f"Recarga de '{metrics.label}': {metrics.seconds * 1000:.1f} ms")
+            counters = metrics.counters
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Guardados", counters.get("saves", 0))
+            col2.metric("KB leídos", f"{counters.get('bytes_read', 0) / 1024:.1f}")
+            col3.metric("KB escritos", f"{counters.get('bytes_written', 0) / 1024:.1f}")
+            st.dataframe(pd.DataFrame([
+                {"Llamada": name, "Veces": calls, "ms": round(seconds * 1000, 2)}
+                for name, (calls, seconds) in sorted(metrics.timers.items(), key=lambda item: -item[1][1])
+            ]), hide_index=True)
+            st.caption("Últimas recargas (todas las sesiones)")
+            st.dataframe(pd.DataFrame([
+                {"Página": rerun["label"], "ms": rerun["ms"], "Guardados": rerun["counters"].get("saves", 0)}
+                for rerun in reversed(instrumentation.recent)
+            ]), hide_index=True)
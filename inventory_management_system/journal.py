@@ -0,0 +1,161 @@
+import json
+import os
+from instrumentation import count
+from sales_history import roll_records
+
+
+def put_change(record, key):
+    # Cambio que guarda el registro completo (copiado, el registro puede ser una vista)
+    return {"op": "put", "id": record[key], "data": dict(record)}
+
+
+def delete_change(record_id):
+    # Cambio que elimina un registro por su llave
+    return {"op": "del", "id": record_id}
+
+
+def roll_change(days, date):
+    # Cambio que corre sales_history de todos los registros (una línea, no una por producto)
+    return {"op": "roll", "days": days, "date": date}
+
+
+class Journal:
+    """
+    Bitácora de cambios append-only (un registro JSON compacto por línea)
+    Cada cambio se guarda como "put" (registro completo) o "del" (solo la llave),
+    así reaplicarlo sobre el snapshot es idempotente
+    Un "roll" corre las ventas y no lo es: lleva su fecha y no se reaplica si el snapshot
+    ya incluye un corrimiento de esa fecha (snapshot_roll_date)
+    Quien la use debe tener tomado el bloqueo del snapshot al leer y escribir
+    """
+
+    def __init__(self, journal_file, key="product_id"):
+        self.journal_file = journal_file
+        self.key = key
+        self.entries = 0
+        # Bytes válidos ya leídos; None hasta la primera lectura
+        self.offset = None
+        # Fecha del último corrimiento de ventas guardado en la bitácora
+        self.last_roll_date = None
+        # Fecha del último corrimiento que ya incluye el snapshot sobre el que se aplica la bitácora
+        self.snapshot_roll_date = None
+
+    def append(self, changes):
+        # Escribe todo el lote en una sola línea con un solo fsync,
+        # así un corte a mitad de escritura descarta el lote completo
+        if not changes:
+            return
+        if len(changes) == 1:
+            line = json.dumps(changes[0], separators=(",", ":"))
+        else:
+            line = json.dumps({"op": "batch", "changes": changes}, separators=(",", ":"))
+        data = (line + "\n").encode("utf-8")
+        if self.offset is None:
+            # Sin lectura previa no se sabe dónde termina la última línea completa
+            self.offset = self.read()[1]
+        with open(self.journal_file, "ab") as file:
+            # Descarta una línea incompleta que haya dejado un proceso interrumpido
+            if file.tell() != self.offset:
+                file.truncate(self.offset)
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        count("saves")
+        count("bytes_written", len(data))
+        self.offset += len(data)
+        self.entries += len(changes)
+        for change in changes:
+            if change["op"] == "roll":
+                self.last_roll_date = change["date"]
+
+    def read(self, offset=0):
+        """
+        Lee los cambios guardados desde offset, ignorando una última línea incompleta
+        Devuelve (cambios, offset hasta donde se leyó)
+        """
+        if not os.path.exists(self.journal_file):
+            return [], 0
+        changes = []
+        start = offset
+        with open(self.journal_file, "rb") as file:
+            file.seek(offset)
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    change = json.loads(line)
+                except ValueError:
+                    break
+                offset += len(line)
+                if change["op"] == "batch":
+                    changes.extend(change["changes"])
+                else:
+                    changes.append(change)
+            count("bytes_read", offset - start)
+        return changes, offset
+
+    def replay(self, records, offset=0):
+        """
+        Aplica los cambios de la bitácora (desde offset) sobre la secuencia del snapshot
+        La secuencia se modifica en su lugar (lista o catálogo por columnas)
+        """
+        changes, self.offset = self.read(offset)
+        self.entries = len(changes) if offset == 0 else self.entries + len(changes)
+        if offset == 0:
+            self.last_roll_date = None
+        return self.apply(records, changes)
+
+    def catch_up(self, records, positions=None):
+        """
+        Aplica solo las líneas escritas desde la última lectura (por otros procesos)
+        positions ({llave: posición}, se modifica) evita recorrer los registros para armarlo
+        Devuelve (registros, cambios aplicados)
+        """
+        changes, self.offset = self.read(self.offset)
+        self.entries += len(changes)
+        return self.apply(records, changes, positions), changes
+
+    def apply(self, records, changes, positions=None):
+        if not changes:
+            return records
+
+        if positions is None:
+            positions = {record[self.key]: idx for idx, record in enumerate(records)}
+        deleted = set()
+        for change in changes:
+            if change["op"] == "roll":
+                # Si se cortó después de escribir el snapshot y antes de vaciar la bitácora,
+                # el snapshot ya tiene este corrimiento: repetirlo perdería un día de ventas
+                if self.snapshot_roll_date is None or change["date"] > self.snapshot_roll_date:
+                    roll_records(records, change["days"])
+                self.last_roll_date = change["date"]
+                continue
+            idx = positions.get(change["id"])
+            if change["op"] == "put":
+                if idx is None:
+                    positions[change["id"]] = len(records)
+                    records.append(change["data"])
+                else:
+                    records[idx] = change["data"]
+            elif change["op"] == "del" and idx is not None:
+                deleted.add(idx)
+                del positions[change["id"]]
+        # Borra al final y de atrás hacia adelante para no mover las posiciones pendientes
+        for idx in sorted(deleted, reverse=True):
+            del records[idx]
+        return records
+
+    def size(self):
+        try:
+            return os.path.getsize(self.journal_file)
+        except FileNotFoundError:
+            return 0
+
+    def clear(self):
+        # Se llama después de escribir un snapshot completo
+        with open(self.journal_file, "w") as file:
+            file.flush()
+            os.fsync(file.fileno())
+        self.entries = 0
+        self.offset = 0
+        self.last_roll_date = None
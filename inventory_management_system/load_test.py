@@ -0,0 +1,220 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from benchmarks import WORDS, copy_app, parse_render_output, render_command, write_dataset
+from branches import BranchRegistry, branch_stock
+from concurrency import ConflictError
+from pos import PointOfSale
+from product import Product
+
+# Proporción de cada operación de una sesión de caja
+MIX = {"search": 0.6, "sale": 0.3, "restock": 0.1}
+
+
+def prepare(directory, source="data", products=None, branches=3):
+    """
+    Arma en directory una copia de la app con sus datos (data/ y config.yaml)
+    Con products usa un catálogo sintético de ese tamaño en lugar de copiar source
+    """
+    data_dir = os.path.join(directory, "data")
+    os.makedirs(data_dir)
+    if products:
+        write_dataset(data_dir, products, branches, users=10)
+        os.replace(os.path.join(data_dir, "config.yaml"), os.path.join(directory, "config.yaml"))
+        with open(os.path.join(data_dir, "branches.json"), "w") as file:
+            json.dump([{"branch_id": idx, "name": f"Sucursal {idx + 1}"} for idx in range(branches)], file)
+    else:
+        for name in ("products.json", "last_sale_history.json", "branches.json", "roles.json"):
+            shutil.copy(os.path.join(source, name), data_dir)
+        shutil.copy(os.path.join(os.path.dirname(source.rstrip("/")) or ".", "config.yaml"), directory)
+    # Fecha de hoy, así el cambio de día no ocurre durante la prueba
+    with open(os.path.join(data_dir, "last_sale_history.json"), "w") as file:
+        json.dump({"date": int(time.time())}, file)
+    copy_app(directory, os.path.dirname(os.path.abspath(__file__)))
+
+
+def cashier(point_of_sale, hot_ids, names, operations, seed):
+    """
+    Una sesión de caja: operations operaciones al azar según MIX
+    Devuelve latencias por operación, movimientos aplicados y rechazos
+    """
+    rnd = random.Random(seed)
+    products = point_of_sale.product_manager
+    branches = len(point_of_sale.branch_registry)
+    latencies = {operation: [] for operation in MIX}
+    # {(product_id, branch_id): cantidad} aplicada y {product_id: unidades} vendidas
+    moved = {}
+    sold = {}
+    rejected = {"stock": 0, "conflict": 0}
+    errors = []
+    for _ in range(operations):
+        operation = rnd.choices(list(MIX), weights=list(MIX.values()))[0]
+        branch_id = rnd.randrange(branches)
+        lines = [(product_id, rnd.randint(1, 3)) for product_id in rnd.sample(hot_ids, rnd.randint(1, 3))]
+        start = time.perf_counter()
+        try:
+            if operation == "search":
+                products.get_page(0, 50, filter_field="name", filter_value=rnd.choice(names))
+            elif operation == "sale":
+                point_of_sale.record_sale(branch_id, lines)
+            else:
+                point_of_sale.restock(branch_id, lines)
+        except ValueError:
+            rejected["stock"] += 1
+            continue
+        except ConflictError:
+            rejected["conflict"] += 1
+            continue
+        except Exception as e:
+            errors.append(f"{operation}: {type(e).__name__}: {e}")
+            continue
+        finally:
+            latencies[operation].append(time.perf_counter() - start)
+        if operation == "search":
+            continue
+        sign = -1 if operation == "sale" else 1
+        for product_id, quantity in lines:
+            moved[(product_id, branch_id)] = moved.get((product_id, branch_id), 0) + sign * quantity
+            if operation == "sale":
+                sold[product_id] = sold.get(product_id, 0) + quantity
+    return latencies, moved, sold, rejected, errors
+
+
+def server_process(directory, sessions, operations, hot_ids, seed):
+    """
+    Un proceso de la app: un catálogo compartido por sessions hilos, como las sesiones de
+    Streamlit que comparten el sistema de inventario (st.cache_resource)
+    """
+    os.chdir(directory)
+    point_of_sale = PointOfSale(Product(), BranchRegistry())
+    names = WORDS + [point_of_sale.product_manager.get_product_by_id(product_id)["name"].split()[0]
+                     for product_id in hot_ids]
+    with ThreadPoolExecutor(sessions) as executor:
+        futures = [executor.submit(cashier, point_of_sale, hot_ids, names, operations, seed * 1000 + session)
+                   for session in range(sessions)]
+        return [future.result() for future in futures]
+
+
+def run(processes=2, sessions=8, operations=200, hot=20, apptest=0, reruns=5, source="data", products=None,
+        branches=3):
+    """
+    Lanza processes procesos con sessions cajas cada uno sobre una copia de los datos
+    (y, con apptest, sesiones de la app con streamlit.testing al mismo tiempo)
+    Devuelve el resumen: operaciones por segundo, latencias p50/p99 y actualizaciones perdidas
+    """
+    directory = tempfile.mkdtemp(prefix="inventory-load-")
+    previous = os.getcwd()
+    try:
+        prepare(directory, source, products, branches)
+        os.chdir(directory)
+        # Se abre una vez antes de empezar para que los procesos no hagan el cambio de día a la vez
+        catalog = Product()
+        rnd = random.Random(0)
+        hot_ids = rnd.sample(list(catalog.positions), min(hot, len(catalog.positions)))
+        # Stock inicial alto para que la mayoría de las ventas se acepten
+        registry = BranchRegistry()
+        for branch_id in range(len(registry)):
+            PointOfSale(catalog, registry).restock(branch_id, [(product_id, 10 ** 6) for product_id in hot_ids])
+        initial = {product_id: catalog.get_product_by_id(product_id) for product_id in hot_ids}
+        initial_stock = {product_id: list(product["stock_quantity"]) for product_id, product in initial.items()}
+        initial_sales = {product_id: product["sales_history"][-1] for product_id, product in initial.items()}
+
+        start = time.perf_counter()
+        app_sessions = [subprocess.Popen(render_command(reruns), cwd=directory, stdout=subprocess.PIPE,
+                                         stderr=subprocess.DEVNULL, text=True)
+                        for _ in range(apptest)]
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.starmap(server_process, [(directory, sessions, operations, hot_ids, seed)
+                                                    for seed in range(processes)])
+        # El rendimiento es solo de las cajas; las sesiones de la app se esperan aparte
+        elapsed = time.perf_counter() - start
+        render_latencies = []
+        render_failures = 0
+        for app_session in app_sessions:
+            output, _ = app_session.communicate()
+            if app_session.returncode == 0:
+                render_latencies += parse_render_output(output)
+            else:
+                render_failures += 1
+
+        latencies = {operation: [] for operation in MIX}
+        moved, sold = {}, {}
+        rejected = {"stock": 0, "conflict": 0}
+        errors = []
+        for session in (session for process in results for session in process):
+            session_latencies, session_moved, session_sold, session_rejected, session_errors = session
+            for operation, values in session_latencies.items():
+                latencies[operation] += values
+            for key, quantity in session_moved.items():
+                moved[key] = moved.get(key, 0) + quantity
+            for product_id, quantity in session_sold.items():
+                sold[product_id] = sold.get(product_id, 0) + quantity
+            for reason, number in session_rejected.items():
+                rejected[reason] += number
+            errors += session_errors
+
+        # Lo aceptado tiene que estar en el archivo: stock inicial + movimientos y ventas del día
+        final = Product()
+        lost_updates = 0
+        for product_id in hot_ids:
+            product = final.get_product_by_id(product_id)
+            for branch_id in range(len(registry)):
+                expected = branch_stock(initial_stock[product_id], branch_id) + moved.get((product_id, branch_id), 0)
+                lost_updates += abs(branch_stock(product["stock_quantity"], branch_id) - expected)
+            lost_updates += abs(product["sales_history"][-1] - initial_sales[product_id] - sold.get(product_id, 0))
+
+        total = sum(len(values) for values in latencies.values())
+        summary = {
+            "processes": processes,
+            "sessions": processes * sessions,
+            "operations": total,
+            "seconds": round(elapsed, 3),
+            "operations_per_second": round(total / elapsed, 1),
+            "latency_ms": {operation: percentiles(values) for operation, values in latencies.items()},
+            "rejected": rejected,
+            "errors": len(errors),
+            "lost_updates": int(lost_updates),
+        }
+        if apptest:
+            summary["apptest"] = {"sessions": apptest, "failed": render_failures, "reruns": len(render_latencies),
+                                  "latency_ms": percentiles(render_latencies)}
+        if errors:
+            summary["first_errors"] = errors[:5]
+        return summary
+    finally:
+        os.chdir(previous)
+        shutil.rmtree(directory)
+
+
+def percentiles(values):
+    if not values:
+        return {"p50": None, "p99": None}
+    p50, p99 = np.percentile(np.asarray(values) * 1000, [50, 99])
+    return {"p50": round(float(p50), 3), "p99": round(float(p99), 3)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prueba de carga con muchas cajas a la vez (sin red)")
+    parser.add_argument("--processes", type=int, default=2, help="Procesos de la app")
+    parser.add_argument("--sessions", type=int, default=8, help="Sesiones (hilos) por proceso")
+    parser.add_argument("--operations", type=int, default=200, help="Operaciones por sesión")
+    parser.add_argument("--hot", type=int, default=20, help="Productos sobre los que operan todas las sesiones")
+    parser.add_argument("--apptest", type=int, default=0, help="Sesiones de la app con streamlit.testing")
+    parser.add_argument("--reruns", type=int, default=5, help="Recargas por sesión de la app")
+    parser.add_argument("--products", type=int, help="Catálogo sintético de este tamaño en lugar de data/")
+    parser.add_argument("--branches", type=int, default=3, help="Sucursales del catálogo sintético")
+    args = parser.parse_args()
+
+    summary = run(args.processes, args.sessions, args.operations, args.hot, args.apptest, args.reruns,
+                  products=args.products, branches=args.branches)
+    print(json.dumps(summary, indent=4))
+    if summary["lost_updates"] != 0:
+        raise SystemExit("Se perdieron actualizaciones")
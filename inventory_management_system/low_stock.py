@@ -0,0 +1,99 @@
+import heapq
+import os
+import threading
+import numpy as np
+from analytics import LONG_WINDOW, SHORT_WINDOW
+
+# Días que tarda en llegar la reposición; el punto de pedido cubre las ventas de esos días
+REORDER_LEAD_DAYS = int(os.environ.get("INVENTORY_REORDER_LEAD_DAYS", 7))
+
+
+def reorder_points(short_totals, long_totals, lead_days=REORDER_LEAD_DAYS):
+    """
+    Punto de pedido de cada producto: ventas esperadas durante lead_days
+    Usa el mayor promedio diario entre la última semana y el último mes, para no quedarse corto
+    """
+    velocity = np.maximum(np.asarray(short_totals) / SHORT_WINDOW, np.asarray(long_totals) / LONG_WINDOW)
+    return np.ceil(velocity * lead_days)
+
+
+class LowStockIndex:
+    """
+    Productos con poco stock por sucursal, ordenados por margen (stock - punto de pedido)
+    Cada sucursal es un heap; al cambiar un producto se agrega una entrada nueva
+    y la vieja queda descartada hasta que llega a la cima (borrado perezoso)
+    El índice se comparte entre sesiones: lowest saca y vuelve a poner entradas, así que
+    las lecturas y los cambios pasan por un mismo lock
+    """
+
+    def __init__(self):
+        self.heaps = {}
+        # {(branch_id, product_id): (margen, stock, punto de pedido)} vigentes
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def build(self, analytics):
+        # Carga en bloque desde las métricas de ventas: un heapify por sucursal
+        points = reorder_points(analytics.short_totals, analytics.long_totals)
+        for branch_id in range(analytics.stock.shape[1]):
+            stock = analytics.stock[:, branch_id]
+            margins = stock - points
+            heap = []
+            for product_id, margin, quantity, point in zip(analytics.ids, margins.tolist(), stock.tolist(), points.tolist()):
+                self.entries[(branch_id, product_id)] = (margin, quantity, point)
+                heap.append((margin, product_id))
+            heapq.heapify(heap)
+            self.heaps[branch_id] = heap
+        return self
+
+    def update(self, product_id, stock_quantity, short_total, long_total):
+        # Recalcula el margen del producto en todas las sucursales (después de una venta o un cambio de stock)
+        point = float(reorder_points(short_total, long_total))
+        with self.lock:
+            for branch_id in range(max(len(stock_quantity), len(self.heaps))):
+                quantity = float(stock_quantity[branch_id]) if branch_id < len(stock_quantity) else 0.0
+                margin = quantity - point
+                if self.entries.get((branch_id, product_id), (None,))[0] != margin:
+                    heapq.heappush(self.heaps.setdefault(branch_id, []), (margin, product_id))
+                self.entries[(branch_id, product_id)] = (margin, quantity, point)
+
+    def remove(self, product_id):
+        with self.lock:
+            for branch_id in self.heaps:
+                self.entries.pop((branch_id, product_id), None)
+
+    def is_current(self, branch_id, entry):
+        margin, product_id = entry
+        current = self.entries.get((branch_id, product_id))
+        return current is not None and current[0] == margin
+
+    def lowest(self, branch_id, limit=10, only_below=True):
+        """
+        Hasta limit productos de la sucursal con menor margen: [(product_id, stock, punto de pedido)]
+        Con only_below solo los que están en o por debajo del punto de pedido
+        Solo recorre las primeras entradas del heap, no toda la sucursal
+        """
+        with self.lock:
+            heap = self.heaps.get(branch_id, [])
+            found = []
+            while heap and len(found) < limit:
+                entry = heapq.heappop(heap)
+                # Las entradas viejas (o repetidas, si el margen volvió a un valor anterior) se descartan
+                if not self.is_current(branch_id, entry) or entry in found:
+                    continue
+                if only_below and entry[0] > 0:
+                    heapq.heappush(heap, entry)
+                    break
+                found.append(entry)
+            for entry in found:
+                heapq.heappush(heap, entry)
+            self.compact(branch_id)
+            return [(product_id, *self.entries[(branch_id, product_id)][1:]) for _, product_id in found]
+
+    def compact(self, branch_id):
+        # Si las entradas descartadas superan a las vigentes, se rearma el heap (con el lock tomado)
+        heap = self.heaps.get(branch_id, [])
+        if len(heap) > 64 and len(heap) > 2 * len(self.entries) / max(len(self.heaps), 1):
+            heap = list({entry for entry in heap if self.is_current(branch_id, entry)})
+            heapq.heapify(heap)
+            self.heaps[branch_id] = heap
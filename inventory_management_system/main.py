@@ -1,25 +1,35 @@
+import copy
 import streamlit as st
 import streamlit_authenticator as stauth
-import yaml
 from inventory_system import InventorySystem
 from user import User
-from yaml.loader import SafeLoader
+from hashing import use_verify_cache
+import instrumentation
+from yamlmanager import YamlManager
 
-with open('config.yaml') as file:
-    config = yaml.load(file, Loader=SafeLoader)
+@st.cache_resource
+def get_yaml_manager():
+    # Arranque una sola vez por proceso: hashea las contraseñas en texto plano y guarda solo si cambió algo
+    yaml_manager = YamlManager()
+    yaml_manager.hash_plaintext_passwords()
+    return yaml_manager
 
-# Pre-hashing all plain text passwords once
-stauth.Hasher.hash_passwords(config['credentials'])
+# Configuración compartida; solo se vuelve a leer si config.yaml cambió
+config = get_yaml_manager().load_config()
 
-with open('config.yaml', 'w') as file:
-    yaml.dump(config, file, default_flow_style=False, allow_unicode=True)
+# El autenticador modifica las credenciales (pasa los usuarios a minúsculas y agrega campos de sesión),
+# por eso recibe una copia y no la configuración compartida
+credentials = copy.deepcopy(config['credentials'])
 
 authenticator = stauth.Authenticate(
-    config['credentials'],
+    credentials,
     config['cookie']['name'],
     config['cookie']['key'],
-    config['cookie']['expiry_days']
+    config['cookie']['expiry_days'],
+    auto_hash=False
 )
+# El login verifica con el servicio de hashing, que recuerda los logins correctos por un tiempo
+use_verify_cache(authenticator.authentication_controller.authentication_model)
 
 def login_screen():
     try:
@@ -36,7 +46,7 @@ def login_screen():
             st.session_state.clear()
             st.rerun()
         st.success(f"Bienvenido, {st.session_state.get('name')}!")
-        role = config["credentials"]["usernames"][st.session_state.get('username')]["role"]
+        role = credentials["usernames"][st.session_state.get('username')]["role"]
         st.session_state["role"] = role
         st.session_state["logged_in"] = True
         display_sidebar(role)
@@ -60,6 +70,12 @@ def display_sidebar(role):
         if st.sidebar.button("Manejar productos"):
             st.session_state.page = "product_management"
 
+        if st.sidebar.button("Análisis de ventas"):
+            st.session_state.page = "sales_dashboard"
+
+        if st.sidebar.button("Importar / exportar"):
+            st.session_state.page = "bulk_io"
+
         if st.sidebar.button("Manejar usuarios"):
             st.session_state.page = "user_management"
 
@@ -69,6 +85,9 @@ def display_sidebar(role):
         if st.sidebar.button("Ver productos"):
             st.session_state.page = "product_management"
 
+        if st.sidebar.button("Análisis de ventas"):
+            st.session_state.page = "sales_dashboard"
+
     logout_button = authenticator.logout("Cerrar sesión", "sidebar")
     if logout_button:
         st.session_state.clear()
@@ -77,6 +96,11 @@ def display_sidebar(role):
 
 
 
+@st.cache_resource
+def get_inventory_system():
+    # Una sola instancia compartida por todas las sesiones del proceso
+    return InventorySystem(yaml_manager=get_yaml_manager())
+
 def display_modules():
     if not st.session_state.get("logged_in"):
         st.warning("Debe iniciar sesión primero.")
@@ -84,8 +108,9 @@ def display_modules():
     if 'page' not in st.session_state:
         st.session_state.page = "home"
 
-    # Iniciar sistema de inventario
-    inventory_system = InventorySystem()
+    # Sistema de inventario compartido, recargado solo si los archivos cambiaron
+    inventory_system = get_inventory_system()
+    inventory_system.refresh()
 
     if st.session_state.page == "home":
         inventory_system.display_home()
@@ -97,6 +122,10 @@ def display_modules():
         inventory_system.display_update_product_form()
     elif st.session_state.page == "product_management":
         inventory_system.display_product_management()
+    elif st.session_state.page == "sales_dashboard":
+        inventory_system.display_sales_dashboard()
+    elif st.session_state.page == "bulk_io" and st.session_state.get("role") == "admin":
+        inventory_system.display_bulk_io()
     elif st.session_state.page == "add_user":
         inventory_system.display_add_user_form()
     elif st.session_state.page == "edit_user":
@@ -111,7 +140,11 @@ def display_modules():
         inventory_system.display_update_role_form()
 
 def main():
-    login_screen()
+    # Con INVENTORY_PROFILE=1 se miden los tiempos de la recarga y los administradores ven el panel
+    with instrumentation.rerun(st.session_state.get("page", "home")) as metrics:
+        login_screen()
+    if metrics is not None and st.session_state.get("logged_in") and st.session_state.get("role") == "admin":
+        get_inventory_system().display_debug_panel(metrics)
 
 if __name__ == "__main__":
     main()
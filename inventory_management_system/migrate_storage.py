@@ -0,0 +1,35 @@
+import argparse
+from storage import JsonStorage, SqliteProductStorage, SqliteRoleStorage
+
+
+def migrate_json_to_sqlite(db_file="data/inventory.db", products_file="data/products.json",
+                           products_journal="data/products.journal", roles_file="data/roles.json"):
+    """
+    Copia productos (snapshot + bitácora) y roles de los JSON a SQLite
+    Devuelve la cantidad de productos y roles migrados
+    """
+    products = JsonStorage(products_file, "product_id", journal_file=products_journal).load()
+    roles = JsonStorage(roles_file, "role_id").load()
+
+    product_storage = SqliteProductStorage(db_file)
+    product_storage.save(products)
+    product_storage.close()
+
+    role_storage = SqliteRoleStorage(db_file)
+    role_storage.save(roles)
+    role_storage.close()
+
+    return len(products), len(roles)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migra los datos JSON del inventario a SQLite")
+    parser.add_argument("--db", default="data/inventory.db")
+    parser.add_argument("--products", default="data/products.json")
+    parser.add_argument("--products-journal", default="data/products.journal")
+    parser.add_argument("--roles", default="data/roles.json")
+    args = parser.parse_args()
+
+    product_count, role_count = migrate_json_to_sqlite(args.db, args.products, args.products_journal, args.roles)
+    print(f"Migrados {product_count} productos y {role_count} roles a {args.db}")
+    print(f"Para usarla: INVENTORY_STORAGE=sqlite:{args.db}")
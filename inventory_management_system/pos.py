@@ -0,0 +1,165 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from branches import BranchRegistry
+from concurrency import ConflictError
+from product import Product
+
+
+class PointOfSale:
+    """
+    Operaciones de caja sobre el catálogo, sin depender de la interfaz:
+    ventas, reposiciones y transferencias entre sucursales
+    Cada operación valida todas sus líneas y se guarda en una sola escritura; si una línea
+    no es válida (producto inexistente, cantidad no positiva, stock insuficiente) no se aplica ninguna
+    Las líneas son pares (product_id, cantidad)
+    """
+
+    def __init__(self, product_manager=None, branch_registry=None):
+        self.product_manager = product_manager or Product()
+        self.branch_registry = branch_registry or BranchRegistry()
+
+    def check_branch(self, branch_id):
+        if self.branch_registry.get_branch_by_id(branch_id) is None:
+            raise ValueError(f"La sucursal {branch_id} no existe.")
+
+    def check_lines(self, lines):
+        lines = [(str(product_id), quantity) for product_id, quantity in lines]
+        if not lines:
+            raise ValueError("La operación no tiene líneas.")
+        for product_id, quantity in lines:
+            if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity <= 0:
+                raise ValueError(f"La cantidad del producto '{product_id}' debe ser un entero mayor a 0.")
+        return lines
+
+    def record_sale(self, branch_id, lines):
+        # Descuenta el stock de la sucursal y suma las ventas al día actual
+        self.check_branch(branch_id)
+        lines = self.check_lines(lines)
+        sales = {}
+        for product_id, quantity in lines:
+            sales[product_id] = sales.get(product_id, 0) + quantity
+        return self.product_manager.adjust_stock(
+            [(product_id, branch_id, -quantity) for product_id, quantity in lines], sales=sales,
+            audit={"op": "sale", "branch": branch_id, "lines": lines},
+        )
+
+    def restock(self, branch_id, lines):
+        self.check_branch(branch_id)
+        lines = self.check_lines(lines)
+        return self.product_manager.adjust_stock(
+            [(product_id, branch_id, quantity) for product_id, quantity in lines],
+            audit={"op": "restock", "branch": branch_id, "lines": lines},
+        )
+
+    def transfer(self, from_branch, to_branch, lines):
+        # Mueve stock de una sucursal a otra; las dos sucursales cambian en la misma escritura
+        self.check_branch(from_branch)
+        self.check_branch(to_branch)
+        return self.product_manager.transfer_stock(from_branch, to_branch, self.check_lines(lines))
+
+
+def make_handler(point_of_sale):
+    """
+    Endpoint HTTP local (JSON):
+    POST /sale     {"branch": 0, "lines": [["1", 2], ...]}
+    POST /restock  {"branch": 0, "lines": [...]}
+    POST /transfer {"from": 0, "to": 1, "lines": [...]}
+    Responde {"stock": {product_id: stock_quantity}} o {"error": mensaje}
+    """
+    operations = {
+        "/sale": lambda body: point_of_sale.record_sale(body["branch"], body["lines"]),
+        "/restock": lambda body: point_of_sale.restock(body["branch"], body["lines"]),
+        "/transfer": lambda body: point_of_sale.transfer(body["from"], body["to"], body["lines"]),
+    }
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            operation = operations.get(self.path)
+            if operation is None:
+                return self.reply(404, {"error": "Operación desconocida."})
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                stock = operation(body)
+            except (KeyError, TypeError, json.JSONDecodeError):
+                return self.reply(400, {"error": "Pedido inválido."})
+            except (ValueError, ConflictError) as e:
+                return self.reply(409, {"error": str(e)})
+            self.reply(200, {"stock": stock})
+
+        def reply(self, status, payload):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(host="127.0.0.1", port=8765, point_of_sale=None):
+    server = ThreadingHTTPServer((host, port), make_handler(point_of_sale or PointOfSale()))
+    print(f"Caja escuchando en http://{host}:{port}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+def benchmark(sales=2000, lines=3, source="data"):
+    """
+    Ventas por segundo sobre una copia de los datos (no toca data/)
+    Cada venta tiene lines líneas con cantidad 1 en la sucursal 0
+    """
+    directory = tempfile.mkdtemp(prefix="inventory-pos-")
+    try:
+        for name in ("products.json", "last_sale_history.json", "branches.json"):
+            shutil.copy(os.path.join(source, name), directory)
+        products = Product(
+            data_file=os.path.join(directory, "products.json"),
+            update_sales_history_file=os.path.join(directory, "last_sale_history.json"),
+            journal_file=os.path.join(directory, "products.journal"),
+            audit_file=os.path.join(directory, "audit.jsonl"),
+        )
+        point_of_sale = PointOfSale(products, BranchRegistry(os.path.join(directory, "branches.json")))
+        product_ids = list(products.positions)[:max(lines, 1)]
+        # Stock suficiente para todas las ventas
+        point_of_sale.restock(0, [(product_id, sales * lines) for product_id in product_ids])
+
+        start = time.perf_counter()
+        for sale in range(sales):
+            point_of_sale.record_sale(0, [(product_ids[(sale + line) % len(product_ids)], 1) for line in range(lines)])
+        elapsed = time.perf_counter() - start
+        return {
+            "sales": sales,
+            "lines_per_sale": lines,
+            "seconds": round(elapsed, 3),
+            "sales_per_second": round(sales / elapsed, 1),
+        }
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Caja: endpoint HTTP local y prueba de rendimiento")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    serve_parser = subparsers.add_parser("serve", help="Atiende ventas por HTTP")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    bench_parser = subparsers.add_parser("bench", help="Mide ventas por segundo sobre una copia de los datos")
+    bench_parser.add_argument("--sales", type=int, default=2000)
+    bench_parser.add_argument("--lines", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.host, args.port)
+    else:
+        print(json.dumps(benchmark(args.sales, args.lines), indent=4))
@@ -1,76 +1,679 @@
 import json
+import os
+import time
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from concurrency import ConflictError, ReadWriteLock, atomic_write
+from journal import put_change, delete_change, roll_change
+from sales_history import SALES_HISTORY_DAYS, day_number, normalize_history, roll_records
+from search_index import SearchIndex
+from analytics import SalesAnalytics
+from low_stock import LowStockIndex
+from editor_view import EditorView
+from history_store import SalesHistoryStore
+from branches import BranchRegistry, branch_stock, with_branch_stock
+from sequences import IdSequence, max_numeric_id
+from audit import AuditLog
+from instrumentation import timed
+from storage import BinaryStorage, JsonStorage, SqliteProductStorage, file_version, storage_backend
 
 class Product:
-    def __init__(self, data_file="data/products.json", update_sales_history_file="data/last_sale_history.json"):
+    def __init__(self, data_file="data/products.json", update_sales_history_file="data/last_sale_history.json",
+                 journal_file="data/products.journal", compact_every=500, storage=None, columnar=None,
+                 sequence_file=None, history_dir=None, audit_file=None, branches_file=None):
         self.data_file = data_file
+        # Sucursales: la cantidad define el ancho del stock en los índices (los productos pueden tener menos)
+        self.branch_registry = BranchRegistry(branches_file or os.path.join(os.path.dirname(data_file), "branches.json"))
+        # Movimientos de stock (transferencias, ventas y reposiciones por la caja)
+        self.audit_log = AuditLog(audit_file or os.path.join(os.path.dirname(data_file), "audit.jsonl"))
+        # Ventas de los días que salen de la ventana de 30 días (ver history_store.py)
+        self.history_store = SalesHistoryStore(history_dir or os.path.join(os.path.dirname(data_file), "history"))
+        # Ids nuevos sin recorrer el catálogo; el archivo de secuencias va junto a los datos
+        self.id_sequence = IdSequence(sequence_file or os.path.join(os.path.dirname(data_file), "sequences.json"), "product")
+        # Con columnar el catálogo se guarda en arreglos NumPy (ver columnar.py)
+        if columnar is None:
+            columnar = os.environ.get("INVENTORY_COLUMNAR", "") == "1"
+        self.columnar = columnar
         self.update_sales_history_file = update_sales_history_file
+        if storage is None:
+            kind, db_file = storage_backend()
+            if kind == "sqlite":
+                storage = SqliteProductStorage(db_file)
+            elif kind == "binary":
+                # Snapshot binario (db_file es su ruta) con la misma bitácora
+                storage = BinaryStorage(db_file, "product_id", journal_file=journal_file,
+                                        compact_every=compact_every, columnar=columnar)
+            else:
+                # Cada cambio se agrega a la bitácora; el snapshot completo solo se reescribe al compactar
+                storage = JsonStorage(data_file, "product_id", journal_file=journal_file, compact_every=compact_every)
+        self.storage = storage
+        # Una instancia se comparte entre las sesiones del proceso: las lecturas (páginas, búsquedas)
+        # corren a la vez y las escrituras y recargas, que cambian la lista y los índices en su lugar, de a una
+        self.lock = ReadWriteLock()
         self.load_data()
 
+    @timed("product.load_data")
     def load_data(self):
-        with open(self.data_file, "r") as file:
-            self.products = json.load(file)
+        with self.lock.write(), self.storage.lock(shared=True):
+            self.products = self.as_catalog(self.storage.load())
+            self.reindex()
+            self.search_index = None
+            self.analytics = None
+            self.low_stock = None
+            self.editor_view = None
+            self.load_date()
+            self.loaded_version = self.data_version()
+
+    def as_catalog(self, records):
+        # Con columnar, los registros leídos como lista se pasan al catálogo por columnas
+        if not self.columnar:
+            return records
+        from columnar import ColumnarCatalog
+        if isinstance(records, ColumnarCatalog):
+            return records
+        return ColumnarCatalog(records, branches=self.branch_count(), history_days=SALES_HISTORY_DAYS)
+
+    def branch_count(self):
+        # Cantidad de sucursales, releyendo el registro si otra sesión o proceso agregó una
+        self.branch_registry.reload_if_stale()
+        return len(self.branch_registry)
+
+    def load_date(self):
         with open(self.update_sales_history_file, "r") as file:    
             self.last_update = json.load(file)
             self.last_date_update = self.last_update["date"]
+        # Si el corrimiento quedó en la bitácora pero no llegó a guardarse la fecha
+        if self.storage.last_roll_date and self.storage.last_roll_date > self.last_date_update:
+            self.last_date_update = self.storage.last_roll_date
+
+    def data_version(self):
+        return (self.storage.version(), file_version(self.update_sales_history_file))
+
+    @timed("product.reload_if_stale")
+    def reload_if_stale(self):
+        """
+        Recarga solo si los archivos cambiaron desde la última lectura o escritura propia
+        y corre el historial de ventas si cambió el día
+        Devuelve True si recargó
+        """
+        reloaded = self.reload_changes()
+        # El cambio de día se hace en la capa de datos, no depende de qué página se abra
+        self.roll_sales_history()
+        return reloaded
+
+    def reload_changes(self):
+        # Sin cambios no se toma el bloqueo de escritura (se revisa de nuevo con el bloqueo tomado)
+        if self.data_version() == self.loaded_version:
+            return False
+        with self.lock.write(), self.storage.lock(shared=True):
+            if self.data_version() == self.loaded_version:
+                return False
+            old_positions = self.positions
+            records, changes = self.storage.refresh(self.products, dict(old_positions))
+            self.products = self.as_catalog(records)
+            # Si solo cambiaron productos existentes las posiciones siguen iguales
+            if (changes is None or len(self.products) != len(old_positions)
+                    or any(change["op"] == "del" for change in changes)):
+                self.reindex()
+            if changes is not None:
+                # Solo hubo líneas nuevas en la bitácora: se aplican a los índices ya armados
+                self.index_changes(old_positions, changes)
+            else:
+                # Se releyó todo: se reconstruyen en el próximo uso
+                self.search_index = None
+                self.analytics = None
+                self.low_stock = None
+                self.editor_view = None
+            self.load_date()
+            self.loaded_version = self.data_version()
+            return True
+
+    @contextmanager
+    def transaction(self):
+        # Bloquea los archivos y se pone al día con otros procesos (y con el cambio de día) antes de validar y escribir
+        with self.lock.write(), self.storage.lock():
+            self.reload_changes()
+            self.roll_day(int(time.time()))
+            yield
+
+    def reindex(self):
+        # Índice product_id -> posición en la lista
+        if self.columnar:
+            product_ids = self.products.ids
+        else:
+            product_ids = [prod["product_id"] for prod in self.products]
+        self.positions = {product_id: idx for idx, product_id in enumerate(product_ids)}
+        self.id_sequence.observe(max_numeric_id(product_ids))
+        # Órdenes guardados para get_page {(campo, descendente): (posiciones, puestos, valores)}
+        self.sort_cache = {}
+
+    def get_search_index(self):
+        # El índice se arma en la primera búsqueda y luego se mantiene con cada cambio
+        if self.search_index is None:
+            self.search_index = SearchIndex().build(self.products)
+        return self.search_index
+
+    def get_analytics(self):
+        # Métricas de ventas; se arman en el primer uso y luego se actualizan con cada cambio
+        branches = self.branch_count()
+        if self.analytics is None:
+            self.analytics = SalesAnalytics().build(self.products, branches)
+        elif self.analytics.stock.shape[1] < branches:
+            # Sucursal agregada después de armar las métricas: su columna arranca en 0
+            # y el índice de stock bajo se rearma para que tenga su heap
+            self.analytics.widen(branches)
+            self.low_stock = None
+        return self.analytics
+
+    def get_low_stock_index(self):
+        # Productos bajo el punto de pedido por sucursal; se arma desde las métricas de ventas
+        analytics = self.get_analytics()
+        if self.low_stock is None:
+            self.low_stock = LowStockIndex().build(analytics)
+        return self.low_stock
+
+    def get_editor_view(self):
+        # Tabla del editor de productos; se arma en el primer uso y luego se actualiza fila por fila
+        if self.editor_view is None:
+            self.editor_view = EditorView().build(self.products)
+        return self.editor_view
+
+    def mark_edited(self, idx):
+        if self.editor_view is not None:
+            self.editor_view.mark(idx)
+
+    def index_low_stock(self, idx):
+        # Después de una venta o un cambio de stock (las métricas ya están al día)
+        if self.low_stock is not None:
+            analytics = self.analytics
+            self.low_stock.update(analytics.ids[idx], analytics.stock[idx].tolist(),
+                                  analytics.short_totals[idx], analytics.long_totals[idx])
 
+    def index_product(self, product):
+        if self.search_index is not None:
+            self.search_index.add(product)
+        if self.analytics is not None:
+            self.analytics.set_labels(self.positions[product["product_id"]], product)
+
+    def index_stock(self, product):
+        if self.analytics is not None:
+            self.analytics.set_stock(self.positions[product["product_id"]], product.get("stock_quantity"))
+            self.index_low_stock(self.positions[product["product_id"]])
+
+    def index_new(self, products):
+        # Altas (ya agregadas al final de self.products y a positions)
+        if not products:
+            return
+        self.sort_cache = {}
+        if self.analytics is not None:
+            self.analytics.extend(products)
+        if self.editor_view is not None:
+            self.editor_view.extend(len(products))
+        for product in products:
+            self.index_product(product)
+            self.index_stock(product)
+
+    def index_record(self, product):
+        # Producto reemplazado completo (por ejemplo por un cambio leído de la bitácora)
+        idx = self.positions[product["product_id"]]
+        if self.analytics is not None:
+            self.analytics.set_sales(idx, product.get("sales_history"))
+        self.index_product(product)
+        self.index_stock(product)
+        self.index_sort(idx, product)
+        self.mark_edited(idx)
+
+    def unindex(self, idx, product_id):
+        # Baja del producto que estaba en la posición idx
+        if self.search_index is not None:
+            self.search_index.remove(product_id)
+        if self.analytics is not None:
+            self.analytics.delete(idx)
+        if self.low_stock is not None:
+            self.low_stock.remove(product_id)
+        if self.editor_view is not None:
+            self.editor_view.delete(idx)
+
+    def index_changes(self, old_positions, changes):
+        """
+        Pone al día los índices armados con los cambios de otros procesos (líneas nuevas de la bitácora)
+        old_positions son las posiciones antes de aplicarlos; al reaplicar la bitácora las filas
+        borradas se quitan, las que quedan conservan su orden y las altas van al final
+        """
+        if any(change["op"] == "roll" for change in changes):
+            # El cambio de día toca las ventas de todo el catálogo: se rearman en el próximo uso
+            self.analytics = None
+            self.low_stock = None
+            self.editor_view = None
+        deleted = {old_positions[change["id"]]: change["id"] for change in changes
+                   if change["op"] == "del" and change["id"] in old_positions}
+        for idx in sorted(deleted, reverse=True):
+            self.unindex(idx, deleted[idx])
+        self.index_new(self.products[len(old_positions) - len(deleted):])
+        for product_id in {change["id"] for change in changes if change["op"] == "put"}:
+            idx = old_positions.get(product_id)
+            if idx is not None and idx not in deleted:
+                self.index_record(self.get_product_by_id(product_id))
+
+    def branch_total(self, branch_id):
+        # Stock total de una sucursal, sumado de la matriz de stock de las métricas
+        with self.lock.read():
+            total = float(self.get_analytics().branch_stock(branch_id).sum())
+        return int(total) if total.is_integer() else total
+
+    def lowest_stock(self, branch_id, limit=10):
+        # Productos más cerca (o debajo) de su punto de pedido: [(producto, stock, punto de pedido)]
+        with self.lock.read():
+            return [(self.get_product_by_id(product_id), quantity, point)
+                    for product_id, quantity, point in self.get_low_stock_index().lowest(branch_id, limit=limit)]
+
+    @timed("product.editor_frame")
+    def editor_frame(self, products, branch_id):
+        """
+        Página del editor: DataFrame de products con el stock de la sucursal branch_id
+        y {product_id: stock de todas las sucursales}, tomados de la tabla ya armada
+        Los productos que otra sesión borró desde que se leyó la página se omiten
+        """
+        with self.lock.read():
+            rows = [self.positions[prod["product_id"]] for prod in products if prod["product_id"] in self.positions]
+            return self.get_editor_view().page(rows, branch_id, self.get_analytics().stock)
+
+    @timed("product.to_frame")
+    def to_frame(self, products=None):
+        """
+        DataFrame de los productos (todos si products es None) para el editor
+        Con el catálogo por columnas se arma directo desde los arreglos
+        """
+        with self.lock.read():
+            if products is None:
+                products = self.products
+            if not self.columnar:
+                return pd.DataFrame(list(products))
+            if products is self.products:
+                return self.products.to_frame()
+            return self.products.to_frame([self.positions[prod["product_id"]] for prod in products])
+
+    @timed("product.save_data")
     def save_data(self):
-        with open(self.data_file, "w") as file:
-            json.dump(self.products, file, indent=4)
+        with self.lock.write(), self.storage.lock():
+            self.storage.save(self.products)
+            self.loaded_version = self.data_version()
+
+    @timed("product.commit")
+    def commit(self, changes):
+        self.storage.commit(changes, self.products)
+        # Los cambios propios ya están en memoria, no invalidan la copia cargada
+        self.loaded_version = self.data_version()
+
+    def check_versions(self, expected_versions):
+        """
+        Compara las versiones leídas {product_id: versión} con las actuales
+        Lanza ConflictError si otro usuario modificó alguno de los productos
+        """
+        for product_id, expected_version in expected_versions.items():
+            product = self.get_product_by_id(product_id)
+            if product is None or product.get("version", 0) != expected_version:
+                raise ConflictError(f"El producto '{product_id}' fue modificado por otro usuario.")
+
+    def put(self, product, updated_product):
+        # Aplica cambios a un producto y aumenta su versión
+        product.update({field: value for field, value in updated_product.items() if field != "version"})
+        product["version"] = product.get("version", 0) + 1
+        if "name" in updated_product or "category" in updated_product:
+            self.index_product(product)
+        if "stock_quantity" in updated_product:
+            self.index_stock(product)
+        if "sales_history" in updated_product and self.analytics is not None:
+            self.analytics.set_sales(self.positions[product["product_id"]], product.get("sales_history"))
+            self.index_low_stock(self.positions[product["product_id"]])
+        if any(field in updated_product for field in ("name", "category", "price")):
+            self.index_sort(self.positions[product["product_id"]], product)
+        # Toda escritura pasa por aquí (cambia la versión): la fila del editor se vuelve a copiar
+        self.mark_edited(self.positions[product["product_id"]])
+        return put_change(product, "product_id")
 
     def add_product(self, product):
-        self.products.append(product)
-        self.save_data()
-
-    def update_product(self, product_id, updated_product):
-        for idx, prod in enumerate(self.products):
-            if prod["product_id"] == product_id:
-                self.products[idx].update(updated_product)
-                self.save_data()
-                return True
-        return False
-    
+        # Sin product_id se le asigna el siguiente de la secuencia; devuelve el id
+        with self.transaction():
+            if not product.get("product_id"):
+                product["product_id"] = self.id_sequence.allocate()[0]
+            if product["product_id"] in self.positions:
+                raise ConflictError(f"El producto '{product['product_id']}' ya existe.")
+            product["sales_history"] = normalize_history(product.get("sales_history"))
+            product["version"] = 1
+            self.positions[product["product_id"]] = len(self.products)
+            self.products.append(product)
+            self.index_new([product])
+            self.id_sequence.observe(product["product_id"])
+            self.commit([put_change(product, "product_id")])
+            return product["product_id"]
+
+    def add_products(self, products):
+        """
+        Agrega varios productos con una sola escritura (un lote en la bitácora)
+        Los productos sin product_id reciben ids consecutivos; devuelve los ids asignados
+        Si algún id ya existe no se agrega ninguno
+        """
+        with self.transaction():
+            missing_ids = [product for product in products if not product.get("product_id")]
+            for product in products:
+                if product.get("product_id"):
+                    self.id_sequence.observe(product["product_id"])
+            for product, product_id in zip(missing_ids, self.id_sequence.allocate(len(missing_ids)) if missing_ids else []):
+                product["product_id"] = product_id
+            product_ids = [product["product_id"] for product in products]
+            for product_id in product_ids:
+                if product_id in self.positions:
+                    raise ConflictError(f"El producto '{product_id}' ya existe.")
+            if len(set(product_ids)) != len(product_ids):
+                raise ConflictError("Hay productos con el mismo id en el lote.")
+            changes = []
+            for product in products:
+                product["sales_history"] = normalize_history(product.get("sales_history"))
+                product["version"] = 1
+                self.positions[product["product_id"]] = len(self.products)
+                self.products.append(product)
+                changes.append(put_change(product, "product_id"))
+            self.index_new(products)
+            self.commit(changes)
+            return product_ids
+
+    def update_product(self, product_id, updated_product, expected_version=None):
+        with self.transaction():
+            idx = self.positions.get(product_id)
+            if idx is None:
+                return False
+            if expected_version is not None:
+                self.check_versions({product_id: expected_version})
+            self.commit([self.put(self.products[idx], updated_product)])
+            return True
+
+    def update_products(self, updated_products, expected_versions=None, sales=None):
+        """
+        Aplica varios cambios {product_id: cambios} como un solo lote
+        Si algún producto no existe no se aplica ninguno
+        Con expected_versions ({product_id: versión}) falla completo ante un conflicto
+        sales ({product_id: cantidad}) suma ventas al día actual del historial
+        """
+        sales = sales or {}
+        with self.transaction():
+            if any(product_id not in self.positions for product_id in list(updated_products) + list(sales)):
+                return False
+            if expected_versions:
+                self.check_versions(expected_versions)
+
+            changes = []
+            for product_id in dict.fromkeys(list(updated_products) + list(sales)):
+                idx = self.positions[product_id]
+                if sales.get(product_id):
+                    self.add_sale(idx, sales[product_id])
+                changes.append(self.put(self.products[idx], updated_products.get(product_id, {})))
+            self.commit(changes)
+            return True
+
+    def adjust_stock(self, adjustments, sales=None, audit=None):
+        """
+        Suma cantidades al stock de varias sucursales en una sola escritura
+        adjustments es una lista de (product_id, branch_id, cantidad); negativo descuenta
+        sales ({product_id: cantidad}) suma ventas al día actual en el mismo lote
+        audit es el movimiento ({"op": ..., "lines": [(product_id, cantidad)], ...}) que se agrega
+        al registro de auditoría después de guardar, una entrada por línea
+        Valida todas las líneas antes de aplicar: si un producto no existe o alguna sucursal
+        quedaría con stock negativo lanza ValueError y no cambia nada
+        Devuelve {product_id: stock_quantity} de los productos cambiados
+        """
+        sales = sales or {}
+        with self.transaction():
+            new_stock = {}
+            for product_id, branch_id, quantity in adjustments:
+                if product_id not in new_stock:
+                    product = self.get_product_by_id(product_id)
+                    if product is None:
+                        raise ValueError(f"El producto '{product_id}' no existe.")
+                    new_stock[product_id] = list(product.get("stock_quantity") or [])
+                new_stock[product_id] = with_branch_stock(
+                    new_stock[product_id], branch_id, branch_stock(new_stock[product_id], branch_id) + quantity
+                )
+            for product_id, stock_quantity in new_stock.items():
+                for branch_id, quantity in enumerate(stock_quantity):
+                    if quantity < 0:
+                        raise ValueError(f"No hay stock suficiente del producto '{product_id}' en la sucursal {branch_id}.")
+            for product_id in sales:
+                if product_id not in self.positions:
+                    raise ValueError(f"El producto '{product_id}' no existe.")
+
+            changes = []
+            for product_id in dict.fromkeys(list(new_stock) + list(sales)):
+                idx = self.positions[product_id]
+                if sales.get(product_id):
+                    self.add_sale(idx, sales[product_id])
+                updated_product = {"stock_quantity": new_stock[product_id]} if product_id in new_stock else {}
+                changes.append(self.put(self.products[idx], updated_product))
+            self.commit(changes)
+            if audit is not None:
+                # Una entrada por línea con la versión resultante; dentro del bloqueo,
+                # así el orden del registro es el orden de las escrituras
+                movement = {field: value for field, value in audit.items() if field != "lines"}
+                self.audit_log.append_many([
+                    {**movement, "product_id": product_id, "quantity": quantity,
+                     "version": self.get_product_by_id(product_id).get("version")}
+                    for product_id, quantity in audit["lines"]
+                ])
+            return new_stock
+
+    def transfer_stock(self, from_branch, to_branch, lines, user=None):
+        """
+        Transfiere stock entre dos sucursales: lines es una lista de (product_id, cantidad)
+        Todas las líneas se validan y se guardan juntas (las dos sucursales en la misma escritura)
+        y el movimiento queda en el registro de auditoría
+        """
+        if from_branch == to_branch:
+            raise ValueError("La sucursal de origen y la de destino son la misma.")
+        lines = [(str(product_id), quantity) for product_id, quantity in lines]
+        adjustments = []
+        for product_id, quantity in lines:
+            if quantity <= 0:
+                raise ValueError(f"La cantidad del producto '{product_id}' debe ser mayor a 0.")
+            adjustments.append((product_id, from_branch, -quantity))
+            adjustments.append((product_id, to_branch, quantity))
+        return self.adjust_stock(adjustments, audit={
+            "op": "transfer", "from": from_branch, "to": to_branch, "lines": lines, "user": user,
+        })
+
+    def add_sale(self, idx, quantity):
+        # Suma la venta al día actual (última posición de la ventana)
+        if self.analytics is not None:
+            self.analytics.add_sale(idx, quantity)
+            self.index_low_stock(idx)
+        if self.columnar:
+            self.products.add_sale(idx, quantity)
+            return
+        product = self.products[idx]
+        sales_history = normalize_history(product.get("sales_history"))
+        sales_history[-1] += quantity
+        product["sales_history"] = sales_history
+
+    def roll_sales_history(self, current_seconds=None):
+        """
+        Corre la ventana de sales_history de todos los productos
+        según los días pasados desde la última actualización
+        Se guarda como un solo cambio "roll" y no como una escritura por producto
+        Se llama en cada recarga y en cada escritura; si no cambió el día no toma el bloqueo
+        Devuelve la cantidad de días que se corrieron
+        """
+        if current_seconds is None:
+            current_seconds = int(time.time())
+        if day_number(current_seconds) <= day_number(self.last_date_update):
+            return 0
+
+        with self.lock.write(), self.storage.lock():
+            self.reload_changes()
+            return self.roll_day(current_seconds)
+
+    def roll_day(self, current_seconds):
+        # Con el bloqueo tomado; se vuelve a revisar: otro proceso pudo haberlo corrido mientras se esperaba
+        days_passed = day_number(current_seconds) - day_number(self.last_date_update)
+        if days_passed < 1:
+            return 0
+
+        # El día actual se cierra: se guarda antes de correr la ventana
+        self.archive_day(day_number(self.last_date_update))
+        roll_records(self.products, days_passed)
+        if self.analytics is not None:
+            self.analytics.roll(days_passed)
+        # Cambian los puntos de pedido y las ventas de todo el catálogo: se rearman en el próximo uso
+        self.low_stock = None
+        self.editor_view = None
+        self.commit([roll_change(days_passed, current_seconds)])
+        self.update_date({"date": current_seconds})
+        return days_passed
+
+    def current_day_sales(self):
+        # (ids, ventas del día actual) de todo el catálogo
+        if self.columnar:
+            size = len(self.products)
+            return list(self.products.ids), self.products.sales[:size, self.products.sales_head]
+        return ([prod["product_id"] for prod in self.products],
+                [normalize_history(prod.get("sales_history"))[-1] for prod in self.products])
+
+    def archive_day(self, day):
+        product_ids, values = self.current_day_sales()
+        if product_ids:
+            self.history_store.append_day(day, product_ids, values)
+
+    def sales_range(self, product_ids, start_day, end_day):
+        """
+        Ventas diarias de los productos entre start_day y end_day (números de día, inclusive)
+        Los días de la ventana actual salen de memoria y los anteriores del historial de largo plazo
+        """
+        with self.lock.read():
+            result = self.history_store.query(product_ids, start_day, end_day)
+            today = day_number(self.last_date_update)
+            window_start = today - SALES_HISTORY_DAYS + 1
+            low, high = max(start_day, window_start), min(end_day, today)
+            if low <= high:
+                for position, product_id in enumerate(product_ids):
+                    product = self.get_product_by_id(product_id)
+                    if product is not None:
+                        sales_history = normalize_history(product.get("sales_history"))
+                        result[position, low - start_day:high - start_day + 1] = \
+                            sales_history[low - window_start:high - window_start + 1]
+            return result
+
     def update_date(self, date):
-        with open(self.update_sales_history_file, "w") as file:
-            json.dump(date, file, indent=4)
+        with self.lock.write(), self.storage.lock():
+            atomic_write(self.update_sales_history_file, json.dumps(date, indent=4))
+            self.last_update = date
+            self.last_date_update = date["date"]
+            self.loaded_version = self.data_version()
 
     def delete_product(self, product_id):
-        # Filtra los productos con el mismo product_id
-        updated_products = [prod for prod in self.products if prod["product_id"] != product_id]
+        with self.transaction():
+            idx = self.positions.get(product_id)
 
-        # Si el tamaño de lista cambia, actualiza y guarda los datos
-        if len(updated_products) != len(self.products):
-            self.products = updated_products
-            self.save_data()
-            return True
+            # Si el producto existe, lo quita y guarda los datos
+            if idx is not None:
+                del self.products[idx]
+                self.reindex()
+                self.unindex(idx, product_id)
+                self.commit([delete_change(product_id)])
+                return True
+            else:
+                # Si ningun producto se encuentra con esa ID
+                return True
+
+    def search_products(self, query, field="name"):
+        """
+        Productos cuyo campo (name o category) contiene la consulta, sin importar acentos ni mayúsculas
+        Con field="product_id" busca por prefijo del ID
+        Devuelve los productos en el orden del catálogo
+        """
+        with self.lock.read():
+            product_ids = self.get_search_index().search(field, query)
+            return [self.products[idx] for idx in sorted(self.positions[product_id] for product_id in product_ids)]
+
+    def get_page(self, page=0, page_size=50, sort_key=None, descending=False, filter_field=None, filter_value=""):
+        """
+        Una página (desde 0) de productos filtrados y ordenados
+        Devuelve (productos de la página, total de productos que cumplen el filtro)
+        """
+        filtered = filter_field and str(filter_value).strip()
+        with self.lock.read():
+            if filtered:
+                product_ids = self.get_search_index().search(filter_field, filter_value)
+                positions = np.array(sorted(self.positions[product_id] for product_id in product_ids), dtype=np.int64)
+            else:
+                positions = np.arange(len(self.products))
+
+            if sort_key:
+                order, rank = self.sort_order(sort_key, descending)
+                # El orden del catálogo completo ya está guardado; un filtro solo ordena sus resultados por puesto
+                positions = positions[np.argsort(rank[positions], kind="stable")] if filtered else order
+
+            start = page * page_size
+            return [self.products[idx] for idx in positions[start:start + page_size].tolist()], len(positions)
+
+    def sort_order(self, sort_key, descending):
+        """
+        Posiciones del catálogo ordenadas por sort_key y el puesto de cada posición en ese orden
+        Se ordena una vez y se guarda hasta un alta, una baja o un cambio del campo en algún producto
+        """
+        cached = self.sort_cache.get((sort_key, descending))
+        if cached is None:
+            values = self.sort_values(sort_key)
+            order = np.array(sorted(range(len(values)), key=values.__getitem__, reverse=descending), dtype=np.int64)
+            rank = np.empty(len(order), dtype=np.int64)
+            rank[order] = np.arange(len(order))
+            cached = self.sort_cache[(sort_key, descending)] = (order, rank, values)
+        return cached[:2]
+
+    def index_sort(self, idx, product):
+        # Descarta los órdenes guardados en los que cambió el valor de este producto
+        for key, (_, _, values) in list(self.sort_cache.items()):
+            if self.sort_value(key[0], product.get(key[0])) != values[idx]:
+                self.sort_cache.pop(key, None)
+
+    def sort_value(self, sort_key, value):
+        # Los IDs numéricos se ordenan como números
+        if sort_key == "price":
+            return value or 0
+        if sort_key == "product_id":
+            return (0, int(value), "") if str(value).isdigit() else (1, 0, str(value))
+        return str(value or "").lower()
+
+    def sort_values(self, sort_key):
+        # Valores para ordenar, por posición; los IDs numéricos se ordenan como números
+        if self.columnar and sort_key == "price":
+            values = self.products.prices[:len(self.products)].tolist()
+        elif self.columnar and sort_key in ("product_id", "name", "category"):
+            values = {"product_id": self.products.ids, "name": self.products.names,
+                      "category": self.products.categories}[sort_key]
         else:
-            # Si ningun producto se encuentra con esa ID
-            return True
+            values = [prod.get(sort_key) for prod in self.products]
+        return [self.sort_value(sort_key, value) for value in values]
 
-    def search_products(self, query):
-        return [prod for prod in self.products if query.lower() in prod["name"].lower()]
+    def filter_products(self, low_stock_threshold=None, branch_id=0):
+        """
+        Productos con poco stock en una sucursal, de menor a mayor margen
+        Sin low_stock_threshold usa el punto de pedido de cada producto (índice de stock bajo);
+        con low_stock_threshold devuelve los que tienen stock <= low_stock_threshold
+        """
+        with self.lock.read():
+            if low_stock_threshold is None:
+                lowest = self.get_low_stock_index().lowest(branch_id, limit=len(self.products))
+                return [self.get_product_by_id(product_id) for product_id, _, _ in lowest]
+            stock = self.get_analytics().branch_stock(branch_id)
+            rows = np.flatnonzero(stock <= low_stock_threshold)
+            return [self.products[idx] for idx in rows[np.argsort(stock[rows], kind="stable")]]
 
-    def filter_products(self, low_stock_threshold):
-        return [prod for prod in self.products if prod["stock_quantity"] <= low_stock_threshold]
-    
     def get_product_by_id(self, product_id):
-        
-        for prod in self.products:
-            if prod["product_id"] == product_id:
-                return prod
-        return None
+        with self.lock.read():
+            idx = self.positions.get(product_id)
+            if idx is None:
+                return None
+            return self.products[idx]
     
     def get_next_product_id(self):
-        # Obtener el mayor ID numérico directamente
-        ids = []
-        for prod in self.products:
-            try:
-                ids.append(int(prod["product_id"]))
-            except (ValueError, TypeError):
-                continue
-
-        if not ids:
-            return "1"
-        
-        next_product_id = max(ids) + 1
-
-        return str(next_product_id)
+        # Próximo id de la secuencia (solo para mostrar; se reserva al agregar el producto)
+        return self.id_sequence.peek()
@@ -1,56 +1,101 @@
-import json
+from contextlib import contextmanager
+from concurrency import ConflictError
+from journal import put_change, delete_change
+import os
+from sequences import IdSequence, max_numeric_id
+from storage import JsonStorage, SqliteRoleStorage, storage_backend
 
 class RolePermission:
-    def __init__(self, data_file="data/roles.json"):
+    def __init__(self, data_file="data/roles.json", storage=None, sequence_file=None):
         self.data_file = data_file
+        self.id_sequence = IdSequence(sequence_file or os.path.join(os.path.dirname(data_file), "sequences.json"), "role")
+        if storage is None:
+            kind, db_file = storage_backend()
+            if kind == "sqlite":
+                storage = SqliteRoleStorage(db_file)
+            else:
+                storage = JsonStorage(data_file, "role_id")
+        self.storage = storage
         self.load_data()
 
     def load_data(self):
-        with open(self.data_file, "r") as file:
-            self.roles = json.load(file)
+        with self.storage.lock(shared=True):
+            self.roles = self.storage.load()
+            self.reindex()
+            self.loaded_version = self.storage.version()
+
+    def reload_if_stale(self):
+        # Recarga solo si los datos cambiaron desde la última lectura o escritura propia
+        with self.storage.lock(shared=True):
+            if self.storage.version() == self.loaded_version:
+                return False
+            self.load_data()
+            return True
+
+    @contextmanager
+    def transaction(self):
+        # Bloquea el archivo y se pone al día con otros procesos antes de escribir
+        with self.storage.lock():
+            self.reload_if_stale()
+            yield
+
+    def commit(self, changes):
+        self.storage.commit(changes, self.roles)
+        self.loaded_version = self.storage.version()
+
+    def reindex(self):
+        # Índice role_id -> posición en la lista; roles.json tiene ids int y string, se indexan como string
+        self.positions = {str(role["role_id"]): idx for idx, role in enumerate(self.roles)}
+        self.id_sequence.observe(max_numeric_id(self.positions))
 
     def save_data(self):
-        with open(self.data_file, "w") as file:
-            json.dump(self.roles, file, indent=4)
+        with self.storage.lock():
+            self.storage.save(self.roles)
+            self.loaded_version = self.storage.version()
 
     def add_role(self, role):
-        self.roles.append(role)
-        self.save_data()
+        # Sin role_id se le asigna el siguiente de la secuencia; devuelve el id
+        with self.transaction():
+            if not role.get("role_id"):
+                role["role_id"] = self.id_sequence.allocate()[0]
+            if str(role["role_id"]) in self.positions:
+                raise ConflictError(f"El rol '{role['role_id']}' ya existe.")
+            role["version"] = 1
+            self.positions[str(role["role_id"])] = len(self.roles)
+            self.roles.append(role)
+            self.id_sequence.observe(role["role_id"])
+            self.commit([put_change(role, "role_id")])
+            return role["role_id"]
 
-    def update_role(self, role_name, updated_role):
-        for idx, role in enumerate(self.roles):
-            if role["name"] == role_name:
-                self.roles[idx].update(updated_role)
-                self.save_data()
-                return True
-        return False
+    def update_role(self, role_name, updated_role, expected_version=None):
+        with self.transaction():
+            for idx, role in enumerate(self.roles):
+                if role["name"] == role_name:
+                    if expected_version is not None and role.get("version", 0) != expected_version:
+                        raise ConflictError(f"El rol '{role_name}' fue modificado por otro usuario.")
+                    role.update({field: value for field, value in updated_role.items() if field != "version"})
+                    role["version"] = role.get("version", 0) + 1
+                    self.reindex()
+                    self.commit([put_change(role, "role_id")])
+                    return True
+            return False
 
     def delete_role(self, role_name):
-        self.roles = [role for role in self.roles if role["name"] != role_name]
-        self.save_data()
+        with self.transaction():
+            deleted = [role["role_id"] for role in self.roles if role["name"] == role_name]
+            self.roles = [role for role in self.roles if role["name"] != role_name]
+            self.reindex()
+            self.commit([delete_change(role_id) for role_id in deleted])
 
     def search_roles(self, query):
         return [role for role in self.roles if query.lower() in role["name"].lower()]
 
     def get_role_by_id(self, role_id):
-        
-        for role in self.roles:
-            if role["role_id"] == role_id:
-                return role
-        return None
+        idx = self.positions.get(str(role_id))
+        if idx is None:
+            return None
+        return self.roles[idx]
     
     def get_next_role_id(self):
-        # Obtener el mayor ID numérico directamente
-        ids = []
-        for roles in self.roles:
-            try:
-                ids.append(int(roles["role_id"]))
-            except (ValueError, TypeError):
-                continue
-
-        if not ids:
-            return "1"
-        
-        next_role_id = max(ids) + 1
-
-        return str(next_role_id)
\ No newline at end of file
+        # Próximo id de la secuencia (solo para mostrar; se reserva al agregar el rol)
+        return self.id_sequence.peek()
@@ -0,0 +1,33 @@
+# Días que se guardan en sales_history (el último es el día actual)
+SALES_HISTORY_DAYS = 30
+SECONDS_PER_DAY = 86400
+
+
+def day_number(seconds):
+    # Día (UTC) de una fecha en segundos; el cambio de día es a medianoche UTC
+    return int(seconds // SECONDS_PER_DAY)
+
+
+def normalize_history(sales_history):
+    # Deja el historial con exactamente SALES_HISTORY_DAYS días, rellenando con ceros al inicio
+    sales_history = [int(sold) for sold in (sales_history or [])][-SALES_HISTORY_DAYS:]
+    return [0] * (SALES_HISTORY_DAYS - len(sales_history)) + sales_history
+
+
+def roll_history(sales_history, days):
+    # Corre la ventana: descarta los días más viejos y agrega días nuevos en cero
+    if days >= SALES_HISTORY_DAYS:
+        return [0] * SALES_HISTORY_DAYS
+    return normalize_history(sales_history)[days:] + [0] * days
+
+
+def roll_records(records, days):
+    """
+    Corre el historial de todos los registros
+    El catálogo por columnas lo hace en un solo paso (ver ColumnarCatalog.roll_sales)
+    """
+    if hasattr(records, "roll_sales"):
+        records.roll_sales(days)
+        return
+    for record in records:
+        record["sales_history"] = roll_history(record.get("sales_history"), days)
@@ -0,0 +1,116 @@
+import bisect
+import unicodedata
+
+# Largo de los n-gramas; también se indexan los más cortos (1 y 2 letras) para las consultas cortas
+NGRAM = 3
+
+
+def normalize(text):
+    # Minúsculas y sin acentos, para que "cafe" encuentre "Café"
+    text = unicodedata.normalize("NFKD", str(text).lower())
+    return "".join(char for char in text if not unicodedata.combining(char))
+
+
+def ngrams(text):
+    # Todas las subcadenas de 1 a NGRAM letras
+    return {text[idx:idx + size] for size in range(1, NGRAM + 1) for idx in range(len(text) - size + 1)}
+
+
+class FieldIndex:
+    """
+    Índice de un campo de texto: n-gramas (de 1 a NGRAM letras) para buscar subcadenas
+    y el valor normalizado de cada registro para confirmar las consultas largas
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.grams = {}
+
+    def add(self, record_id, value):
+        value = normalize(value)
+        self.values[record_id] = value
+        for gram in ngrams(value):
+            self.grams.setdefault(gram, set()).add(record_id)
+
+    def remove(self, record_id):
+        value = self.values.pop(record_id, None)
+        if value is None:
+            return
+        for gram in ngrams(value):
+            ids = self.grams[gram]
+            ids.discard(record_id)
+            if not ids:
+                del self.grams[gram]
+
+    def search(self, query):
+        """
+        Ids cuyo valor contiene la consulta
+        Una consulta de hasta NGRAM letras es ella misma un n-grama: su lista es el resultado
+        """
+        query = normalize(query).strip()
+        if not query:
+            return set(self.values)
+        if len(query) <= NGRAM:
+            return set(self.grams.get(query, ()))
+
+        candidates = None
+        grams = {query[idx:idx + NGRAM] for idx in range(len(query) - NGRAM + 1)}
+        for gram in sorted(grams, key=lambda gram: len(self.grams.get(gram, ()))):
+            ids = self.grams.get(gram)
+            if not ids:
+                return set()
+            candidates = set(ids) if candidates is None else candidates & ids
+        # Los n-gramas pueden estar en otro orden; se confirma la subcadena
+        return {record_id for record_id in candidates if query in self.values[record_id]}
+
+
+class SearchIndex:
+    """
+    Índice de búsqueda del catálogo: texto en name y category, prefijo en product_id
+    Se actualiza con add/remove en cada alta, cambio o baja de producto
+    """
+
+    def __init__(self, text_fields=("name", "category"), key="product_id"):
+        self.key = key
+        self.fields = {field: FieldIndex() for field in text_fields}
+        self.sorted_ids = []
+
+    def build(self, records):
+        # Carga en bloque: se ordena una sola vez al final en vez de insertar ordenado
+        for record in records:
+            record_id = record[self.key]
+            for field, index in self.fields.items():
+                index.add(record_id, record.get(field, ""))
+            self.sorted_ids.append((normalize(record_id), record_id))
+        self.sorted_ids.sort()
+        return self
+
+    def add(self, record):
+        record_id = record[self.key]
+        self.remove(record_id)
+        for field, index in self.fields.items():
+            index.add(record_id, record.get(field, ""))
+        bisect.insort(self.sorted_ids, (normalize(record_id), record_id))
+
+    def remove(self, record_id):
+        for index in self.fields.values():
+            index.remove(record_id)
+        entry = (normalize(record_id), record_id)
+        idx = bisect.bisect_left(self.sorted_ids, entry)
+        if idx < len(self.sorted_ids) and self.sorted_ids[idx] == entry:
+            del self.sorted_ids[idx]
+
+    def search(self, field, query):
+        # Ids que coinciden con la consulta en el campo (product_id busca por prefijo)
+        if field == self.key:
+            return self.id_prefix(query)
+        return self.fields[field].search(query)
+
+    def id_prefix(self, prefix):
+        prefix = normalize(prefix).strip()
+        ids = set()
+        idx = bisect.bisect_left(self.sorted_ids, (prefix,))
+        while idx < len(self.sorted_ids) and self.sorted_ids[idx][0].startswith(prefix):
+            ids.add(self.sorted_ids[idx][1])
+            idx += 1
+        return ids
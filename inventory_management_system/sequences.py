@@ -0,0 +1,69 @@
+import json
+import os
+from concurrency import atomic_write, file_lock
+from storage import file_version
+
+
+def numeric_id(value):
+    # Valor numérico de un id (los ids se guardan como int o como string); None si no es un número
+    try:
+        return int(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def max_numeric_id(values):
+    return max((number for number in map(numeric_id, values) if number is not None), default=0)
+
+
+class IdSequence:
+    """
+    Secuencia de ids de una entidad guardada en un archivo compartido ({"product": próximo id, ...})
+    Los ids nunca se repiten, aunque se borre el último registro
+    floor es el mayor id que ya existe en los datos: la secuencia se pone al día sola
+    si se agregaron registros sin pasar por ella (por ejemplo al editar el archivo a mano)
+    """
+
+    def __init__(self, sequence_file, name):
+        self.sequence_file = sequence_file
+        self.name = name
+        self.values = {}
+        self.loaded_version = None
+        self.floor = 0
+
+    def read(self):
+        # Lee el archivo solo si cambió desde la última lectura
+        version = file_version(self.sequence_file)
+        if version != self.loaded_version:
+            self.values = {}
+            if os.path.exists(self.sequence_file):
+                with open(self.sequence_file, "r") as file:
+                    self.values = json.load(file)
+            self.loaded_version = version
+        return self.values
+
+    def observe(self, value):
+        # Registra un id existente (cargado o agregado con id propio)
+        number = numeric_id(value)
+        if number is not None and number > self.floor:
+            self.floor = number
+
+    def peek(self):
+        # Próximo id, sin reservarlo (para mostrarlo en un formulario)
+        with file_lock(self.sequence_file, shared=True):
+            return str(max(self.read().get(self.name, 1), self.floor + 1))
+
+    def allocate(self, count=1):
+        """
+        Reserva count ids consecutivos y devuelve la lista
+        El archivo queda bloqueado mientras se reserva, así dos procesos nunca reciben el mismo id
+        """
+        with file_lock(self.sequence_file):
+            values = dict(self.read())
+            first = max(values.get(self.name, 1), self.floor + 1)
+            values[self.name] = first + count
+            atomic_write(self.sequence_file, json.dumps(values, indent=4))
+            self.values = values
+            self.loaded_version = file_version(self.sequence_file)
+        self.floor = first + count - 1
+        return [str(first + offset) for offset in range(count)]
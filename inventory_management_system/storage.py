@@ -0,0 +1,357 @@
+import json
+import os
+import sqlite3
+from concurrency import atomic_write, file_lock
+from instrumentation import count, file_size, timed
+from binary_snapshot import Snapshot, write_snapshot
+from journal import Journal
+from sales_history import SALES_HISTORY_DAYS
+
+
+def file_version(path):
+    # Versión barata de un archivo (sin leerlo): fecha de modificación y tamaño
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class JsonStorage:
+    """
+    Backend por defecto: snapshot JSON más una bitácora opcional de cambios
+    Sin bitácora, cada commit reescribe el snapshot completo
+    """
+
+    def __init__(self, data_file, key, journal_file=None, compact_every=500):
+        self.data_file = data_file
+        self.key = key
+        self.journal = Journal(journal_file, key=key) if journal_file else None
+        self.compact_every = compact_every
+        self.snapshot_version = None
+        # Fecha del último corrimiento de ventas incluido en el snapshot
+        self.roll_date = None
+
+    def lock(self, shared=False):
+        # Un solo bloqueo cubre el snapshot y su bitácora
+        return file_lock(self.data_file, shared=shared)
+
+    @timed("storage.load")
+    def load(self):
+        with self.lock(shared=True):
+            records, self.roll_date = self.read_snapshot()
+            count("bytes_read", lambda: file_size(self.data_file))
+            self.snapshot_version = file_version(self.data_file)
+            if self.journal:
+                self.journal.snapshot_roll_date = self.roll_date
+                records = self.journal.replay(records)
+        return records
+
+    @timed("storage.refresh")
+    def refresh(self, records, positions=None):
+        """
+        Pone al día los registros con lo que escribieron otros procesos
+        Si solo creció la bitácora se leen únicamente las líneas nuevas
+        (positions, una copia de {llave: posición}, evita recorrer los registros)
+        Devuelve (registros, cambios aplicados); los cambios son None si se volvió a leer todo
+        """
+        with self.lock(shared=True):
+            if (self.journal and self.journal.offset is not None
+                    and file_version(self.data_file) == self.snapshot_version
+                    and self.journal.size() >= self.journal.offset):
+                return self.journal.catch_up(records, positions)
+            return self.load(), None
+
+    @timed("storage.save")
+    def save(self, records):
+        # Escribe el snapshot completo y vacía la bitácora (compactación)
+        # La fecha del último corrimiento va dentro del snapshot: si se corta antes de vaciar
+        # la bitácora, al reaplicarla se sabe qué corrimientos ya están incluidos
+        with self.lock():
+            roll_date = self.last_roll_date
+            self.write_snapshot(records, roll_date)
+            self.snapshot_version = file_version(self.data_file)
+            self.roll_date = roll_date
+            if self.journal:
+                self.journal.snapshot_roll_date = roll_date
+                self.journal.clear()
+
+    def read_snapshot(self):
+        # Devuelve (registros, fecha del último corrimiento incluido)
+        # El snapshot es la lista de registros, o {"roll_date", "records"} si ya se corrieron las ventas
+        with open(self.data_file, "r") as file:
+            data = json.load(file)
+        if isinstance(data, dict):
+            return data["records"], data.get("roll_date")
+        return data, None
+
+    def write_snapshot(self, records, roll_date=None):
+        if not isinstance(records, list):
+            records = [dict(record) for record in records]
+        data = records if roll_date is None else {"roll_date": roll_date, "records": records}
+        atomic_write(self.data_file, json.dumps(data, indent=4))
+
+    @property
+    def last_roll_date(self):
+        # El último corrimiento, esté en la bitácora o ya en el snapshot
+        dates = [self.roll_date, self.journal.last_roll_date if self.journal else None]
+        return max([date for date in dates if date is not None], default=None)
+
+    def version(self):
+        journal_version = file_version(self.journal.journal_file) if self.journal else None
+        return (file_version(self.data_file), journal_version)
+
+    @timed("storage.commit")
+    def commit(self, changes, records):
+        # Guarda solo los cambios; compacta cuando la bitácora crece demasiado
+        with self.lock():
+            if not self.journal:
+                self.save(records)
+                return
+            self.journal.append(changes)
+            # Nunca compacta antes de que la bitácora tenga tantos cambios como registros el snapshot:
+            # así una carga masiva no reescribe el catálogo completo en cada lote
+            if self.journal.entries >= max(self.compact_every, len(records)):
+                self.save(records)
+
+
+class BinaryStorage(JsonStorage):
+    """
+    Snapshot en formato binario (ver binary_snapshot.py) con la misma bitácora JSON
+    Con columnar la carga arma el catálogo por columnas directo desde el archivo mapeado
+    en memoria, así solo se leen del disco las páginas que se usan
+    """
+
+    def __init__(self, data_file, key, journal_file=None, compact_every=500, columnar=False):
+        super().__init__(data_file, key, journal_file=journal_file, compact_every=compact_every)
+        self.columnar = columnar
+
+    def read_snapshot(self):
+        snapshot = Snapshot(self.data_file)
+        return (snapshot.catalog() if self.columnar else snapshot.records()), snapshot.roll_date
+
+    def write_snapshot(self, records, roll_date=None):
+        write_snapshot(self.data_file, records, roll_date)
+
+
+class SqliteStorage:
+    """
+    Base de los backends SQLite (modo WAL, un commit por lote de cambios)
+    Las subclases definen el esquema y cómo se guarda/lee cada registro
+    """
+
+    schema = ""
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self.connection = sqlite3.connect(db_file, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        self.connection.executescript(self.schema)
+
+    last_roll_date = None
+
+    @timed("storage.commit")
+    def commit(self, changes, records=None):
+        count("saves")
+        with self.connection:
+            for change in changes:
+                if change["op"] == "put":
+                    self.write_record(change["data"])
+                elif change["op"] == "del":
+                    self.delete_record(change["id"])
+                elif change["op"] == "roll":
+                    self.roll(change["days"])
+
+    def roll(self, days):
+        pass
+
+    def lock(self, shared=False):
+        # SQLite ya bloquea sus escrituras; este bloqueo agrupa leer-validar-escribir
+        return file_lock(self.db_file, shared=shared)
+
+    def refresh(self, records, positions=None):
+        return self.load(), None
+
+    def version(self):
+        # Cambia cuando otra conexión (otro proceso) hace commit
+        return self.connection.execute("PRAGMA data_version").fetchone()[0]
+
+    @timed("storage.save")
+    def save(self, records):
+        # Reemplaza todo el contenido en una sola transacción
+        count("saves")
+        with self.connection:
+            self.clear()
+            for record in records:
+                self.write_record(record)
+
+    def close(self):
+        self.connection.close()
+
+
+class SqliteProductStorage(SqliteStorage):
+    """
+    Productos normalizados: stock por sucursal y ventas por día en tablas aparte
+    Los campos que no tienen columna propia se guardan en "extra" como JSON
+    """
+
+    schema = """
+        CREATE TABLE IF NOT EXISTS products (
+            product_id TEXT PRIMARY KEY,
+            position INTEGER NOT NULL,
+            name TEXT,
+            category TEXT,
+            price REAL,
+            extra TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_products_name ON products(name);
+        CREATE INDEX IF NOT EXISTS idx_products_category ON products(category);
+        CREATE TABLE IF NOT EXISTS product_stock (
+            product_id TEXT NOT NULL REFERENCES products(product_id) ON DELETE CASCADE,
+            branch INTEGER NOT NULL,
+            quantity REAL NOT NULL,
+            PRIMARY KEY (product_id, branch)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_product_stock_branch ON product_stock(branch, product_id);
+        CREATE TABLE IF NOT EXISTS product_sales (
+            product_id TEXT NOT NULL REFERENCES products(product_id) ON DELETE CASCADE,
+            day INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            PRIMARY KEY (product_id, day)
+        ) WITHOUT ROWID;
+    """
+
+    columns = ("product_id", "name", "category", "price", "stock_quantity", "sales_history")
+
+    @timed("storage.load")
+    def load(self):
+        stock = {}
+        for product_id, branch, quantity in self.connection.execute(
+                "SELECT product_id, branch, quantity FROM product_stock ORDER BY product_id, branch"):
+            stock.setdefault(product_id, []).append(quantity)
+        sales = {}
+        for product_id, day, quantity in self.connection.execute(
+                "SELECT product_id, day, quantity FROM product_sales ORDER BY product_id, day"):
+            sales.setdefault(product_id, [0] * SALES_HISTORY_DAYS)[day] = quantity
+
+        records = []
+        for product_id, name, category, price, extra in self.connection.execute(
+                "SELECT product_id, name, category, price, extra FROM products ORDER BY position"):
+            records.append(self.build_record(product_id, name, category, price, extra, stock.get(product_id),
+                                             sales.get(product_id) or [0] * SALES_HISTORY_DAYS))
+        return records
+
+    @timed("storage.get")
+    def get(self, product_id):
+        # Búsqueda por llave primaria, sin cargar el catálogo
+        row = self.connection.execute(
+            "SELECT product_id, name, category, price, extra FROM products WHERE product_id = ?",
+            (str(product_id),)).fetchone()
+        if row is None:
+            return None
+        stock = [quantity for (quantity,) in self.connection.execute(
+            "SELECT quantity FROM product_stock WHERE product_id = ? ORDER BY branch", (row[0],))]
+        sales = [0] * SALES_HISTORY_DAYS
+        for day, quantity in self.connection.execute(
+                "SELECT day, quantity FROM product_sales WHERE product_id = ?", (row[0],)):
+            sales[day] = quantity
+        return self.build_record(*row, stock or None, sales)
+
+    def build_record(self, product_id, name, category, price, extra, stock_quantity, sales_history):
+        record = {"product_id": product_id, "name": name, "category": category, "price": price}
+        if stock_quantity is not None:
+            record["stock_quantity"] = [int(quantity) if float(quantity).is_integer() else quantity
+                                        for quantity in stock_quantity]
+        if sales_history is not None:
+            record["sales_history"] = sales_history
+        if extra:
+            record.update(json.loads(extra))
+        return record
+
+    def write_record(self, record):
+        product_id = str(record["product_id"])
+        extra = {field: value for field, value in record.items() if field not in self.columns}
+        self.connection.execute(
+            "INSERT INTO products (product_id, position, name, category, price, extra) "
+            "VALUES (?, (SELECT COALESCE(MAX(position), -1) + 1 FROM products), ?, ?, ?, ?) "
+            "ON CONFLICT(product_id) DO UPDATE SET name = excluded.name, category = excluded.category, "
+            "price = excluded.price, extra = excluded.extra",
+            (product_id, record.get("name"), record.get("category"), record.get("price"),
+             json.dumps(extra) if extra else None))
+        self.connection.execute("DELETE FROM product_stock WHERE product_id = ?", (product_id,))
+        self.connection.executemany(
+            "INSERT INTO product_stock (product_id, branch, quantity) VALUES (?, ?, ?)",
+            [(product_id, branch, quantity) for branch, quantity in enumerate(record.get("stock_quantity") or [])])
+        # day es la posición en la ventana (SALES_HISTORY_DAYS - 1 = hoy); los días en cero no se guardan
+        sales_history = (record.get("sales_history") or [])[-SALES_HISTORY_DAYS:]
+        first_day = SALES_HISTORY_DAYS - len(sales_history)
+        self.connection.execute("DELETE FROM product_sales WHERE product_id = ?", (product_id,))
+        self.connection.executemany(
+            "INSERT INTO product_sales (product_id, day, quantity) VALUES (?, ?, ?)",
+            [(product_id, first_day + day, quantity) for day, quantity in enumerate(sales_history) if quantity])
+
+    def roll(self, days):
+        # Corre la ventana de todos los productos con dos sentencias
+        self.connection.execute("DELETE FROM product_sales WHERE day < ?", (days,))
+        self.connection.execute("UPDATE product_sales SET day = day - ?", (days,))
+
+    def delete_record(self, product_id):
+        self.connection.execute("DELETE FROM products WHERE product_id = ?", (str(product_id),))
+
+    def clear(self):
+        self.connection.execute("DELETE FROM products")
+
+
+class SqliteRoleStorage(SqliteStorage):
+    """
+    Roles guardados como JSON con su role_id e índice por nombre
+    role_id se indexa como texto porque roles.json mezcla enteros y strings
+    """
+
+    schema = """
+        CREATE TABLE IF NOT EXISTS roles (
+            role_id TEXT PRIMARY KEY,
+            position INTEGER NOT NULL,
+            name TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_roles_name ON roles(name);
+    """
+
+    @timed("storage.load")
+    def load(self):
+        return [json.loads(data) for (data,) in self.connection.execute("SELECT data FROM roles ORDER BY position")]
+
+    def get(self, role_id):
+        row = self.connection.execute("SELECT data FROM roles WHERE role_id = ?", (str(role_id),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def write_record(self, record):
+        self.connection.execute(
+            "INSERT INTO roles (role_id, position, name, data) "
+            "VALUES (?, (SELECT COALESCE(MAX(position), -1) + 1 FROM roles), ?, ?) "
+            "ON CONFLICT(role_id) DO UPDATE SET name = excluded.name, data = excluded.data",
+            (str(record["role_id"]), record.get("name"), json.dumps(record)))
+
+    def delete_record(self, role_id):
+        self.connection.execute("DELETE FROM roles WHERE role_id = ?", (str(role_id),))
+
+    def clear(self):
+        self.connection.execute("DELETE FROM roles")
+
+
+def storage_backend():
+    """
+    Backend elegido con la variable de entorno INVENTORY_STORAGE:
+    "json" (por defecto), "binary:<ruta del snapshot>" o "sqlite:<ruta de la base>"
+    Devuelve (tipo, ruta)
+    """
+    setting = os.environ.get("INVENTORY_STORAGE", "json")
+    kind, _, path = setting.partition(":")
+    if kind == "sqlite":
+        return "sqlite", path or "data/inventory.db"
+    if kind == "binary":
+        return "binary", path or "data/products.snap"
+    return "json", None
@@ -1,5 +1,8 @@
 import yaml
-import streamlit_authenticator as stauth
+from concurrency import atomic_write, file_lock
+from hashing import get_hasher
+from instrumentation import count, file_size, timed
+from storage import file_version
 
 
 class User:
@@ -7,13 +10,26 @@ class User:
         self.config_path = config_path
         self.load_users()
 
+    @timed("yaml.load_users")
     def load_users(self):
-        with open(self.config_path, "r") as f:
-            self.config = yaml.safe_load(f)
+        with file_lock(self.config_path, shared=True):
+            with open(self.config_path, "r") as f:
+                self.config = yaml.safe_load(f)
+            count("bytes_read", lambda: file_size(self.config_path))
+            self.loaded_version = file_version(self.config_path)
+
+    def reload_if_stale(self):
+        # Recarga solo si el archivo cambió desde la última lectura o escritura propia
+        with file_lock(self.config_path, shared=True):
+            if file_version(self.config_path) == self.loaded_version:
+                return False
+            self.load_users()
+            return True
 
     def save_users(self):
-        with open(self.config_path, "w") as f:
-            yaml.dump(self.config, f, default_flow_style=False)
+        with file_lock(self.config_path):
+            atomic_write(self.config_path, yaml.dump(self.config, default_flow_style=False))
+            self.loaded_version = file_version(self.config_path)
 
     @property
     def users(self):
@@ -31,31 +47,40 @@ class User:
 
     def add_user(self, user):
         username = user["user_id"]
-        hashed_password = stauth.Hasher([user["password"]]).generate()[0]
-        self.config["credentials"]["usernames"][username] = {
-            "name": user["username"],
-            "email": user.get("email", ""),
-            "password": hashed_password,
-            "role": user["role"]
-        }
-        self.save_users()
+        hashed_password = get_hasher().hash(user["password"])
+        with file_lock(self.config_path):
+            self.reload_if_stale()
+            self.config["credentials"]["usernames"][username] = {
+                "name": user["username"],
+                "email": user.get("email", ""),
+                "password": hashed_password,
+                "role": user["role"]
+            }
+            self.save_users()
 
     def update_user(self, user_id, updated_user):
-        if user_id in self.config["credentials"]["usernames"]:
-            user_entry = self.config["credentials"]["usernames"][user_id]
-            user_entry["name"] = updated_user["username"]
-            user_entry["role"] = updated_user["role"]
-            if "password" in updated_user and updated_user["password"]:
-                user_entry["password"] = stauth.Hasher([updated_user["password"]]).generate()[0]
-            if "email" in updated_user:
-                user_entry["email"] = updated_user["email"]
-            self.save_users()
-            return True
-        return False
+        hashed_password = None
+        if "password" in updated_user and updated_user["password"]:
+            hashed_password = get_hasher().hash(updated_user["password"])
+        with file_lock(self.config_path):
+            self.reload_if_stale()
+            if user_id in self.config["credentials"]["usernames"]:
+                user_entry = self.config["credentials"]["usernames"][user_id]
+                user_entry["name"] = updated_user["username"]
+                user_entry["role"] = updated_user["role"]
+                if hashed_password:
+                    user_entry["password"] = hashed_password
+                if "email" in updated_user:
+                    user_entry["email"] = updated_user["email"]
+                self.save_users()
+                return True
+            return False
 
     def delete_user(self, user_id):
-        if user_id in self.config["credentials"]["usernames"]:
-            del self.config["credentials"]["usernames"][user_id]
-            self.save_users()
-            return True
-        return False
+        with file_lock(self.config_path):
+            self.reload_if_stale()
+            if user_id in self.config["credentials"]["usernames"]:
+                del self.config["credentials"]["usernames"][user_id]
+                self.save_users()
+                return True
+            return False
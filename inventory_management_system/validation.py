@@ -0,0 +1,47 @@
+# Reglas de validación compartidas por los formularios, la edición de la grilla y la importación masiva
+import math
+import numbers
+
+
+def validate_fields(fields):
+    """
+    Verifica que los inputs sean correctos para evitar problemas
+    Cada input se pasa como un diccionario con el nombre como llave
+    Devuelve el mensaje de error o None si todo está bien
+    """
+    for field, value in fields.items():
+        # Revisa los strings
+        if value in [None, '']:  # Verifica que el string no esté vacio
+            return f"{field.replace('_', ' ').capitalize()} es requerido."
+        # Una celda numérica vacía llega como NaN; infinito no es un precio ni un stock
+        if isinstance(value, numbers.Real) and not math.isfinite(value):
+            if math.isnan(value):
+                return f"{field.replace('_', ' ').capitalize()} es requerido."
+            return f"{field.replace('_', ' ').capitalize()} debe ser un número."
+        # Additional specific field validations
+        if field == "price" and value <= 0:
+            return "El precio debe ser mayor a 0."
+        if field == "stock_quantity" and value < 0:
+            return "El stock debe ser mayor a 0."
+    return None  # No hay errores
+
+
+def parse_number(value, field, integer=False):
+    """
+    Convierte un valor leído de un archivo (texto o número) a float/int
+    Devuelve (valor, error); las celdas vacías quedan como None para que validate_fields avise
+    """
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None, None
+    try:
+        number = float(str(value).strip().replace(",", ".")) if isinstance(value, str) else float(value)
+    except ValueError:
+        return None, f"{field.replace('_', ' ').capitalize()} debe ser un número."
+    # float() también acepta "nan" e "inf"
+    if not math.isfinite(number):
+        return None, f"{field.replace('_', ' ').capitalize()} debe ser un número."
+    if integer:
+        if not number.is_integer():
+            return None, f"{field.replace('_', ' ').capitalize()} debe ser un número entero."
+        return int(number), None
+    return number, None
@@ -1,51 +1,167 @@
 import yaml
 from pathlib import Path
 import streamlit as st
+from concurrency import atomic_write, file_lock
+from hashing import get_hasher, is_hash
+from instrumentation import count, file_size, timed
+from storage import file_version
+
+# Use the libyaml C loader/dumper when PyYAML was built with it (much faster than pure Python)
+try:
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeLoader, SafeDumper
 
 class YamlManager:
     def __init__(self, config_path="config.yaml"):
         self.config_path = Path(__file__).parent / config_path
+        self.config = None
+        self.loaded_version = None
+        self.emails = {}
+
+    def lock(self, shared=False):
+        """Lock the config file against other writers (processes and threads)"""
+        return file_lock(self.config_path, shared=shared)
 
+    @timed("yaml.load_config")
     def load_config(self):
-        """Load the YAML configuration file"""
-        with open(self.config_path, 'r') as file:
-            return yaml.safe_load(file)
+        """
+        Return the parsed configuration, re-reading the file only when its mtime/size changed.
+        The returned dict is the shared cache: change it only through the methods below.
+        """
+        with self.lock(shared=True):
+            version = file_version(self.config_path)
+            if self.config is None or version != self.loaded_version:
+                with open(self.config_path, 'r') as file:
+                    self.config = yaml.load(file, Loader=SafeLoader)
+                count("bytes_read", lambda: file_size(self.config_path))
+                self.loaded_version = version
+                self.reindex()
+            return self.config
 
+    def reindex(self):
+        """Rebuild the email -> username index"""
+        self.emails = {
+            str(user.get("email", "")).lower(): username
+            for username, user in self.config['credentials']['usernames'].items()
+            if user.get("email")
+        }
+
+    @timed("yaml.save_config")
     def save_config(self, data):
-        """Save data back to the YAML file"""
-        with open(self.config_path, 'w') as file:
-            yaml.safe_dump(data, file, sort_keys=False)
+        """Save data back to the YAML file (write-through: the cache becomes the saved data)"""
+        with self.lock():
+            try:
+                atomic_write(self.config_path, yaml.dump(data, Dumper=SafeDumper, sort_keys=False, allow_unicode=True))
+            except Exception:
+                # The cache may hold changes that were not saved; read the file again next time
+                self.config = None
+                raise
+            self.config = data
+            self.loaded_version = file_version(self.config_path)
+            self.reindex()
+
+    def hash_passwords(self, users):
+        """Copy of the user entries with plaintext passwords hashed (in parallel, outside the lock)"""
+        users = {username: dict(user_data) for username, user_data in users.items()}
+        plaintext = [user for user in users.values() if user.get("password") and not is_hash(user["password"])]
+        for user, hashed in zip(plaintext, get_hasher().hash_many(user["password"] for user in plaintext)):
+            user["password"] = hashed
+        return users
 
     def add_user(self, username, user_data):
         """Add a new user to the config"""
-        config = self.load_config()
-        if username in config['credentials']['usernames']:
-            raise ValueError(f"Username '{username}' already exists")
-        config['credentials']['usernames'][username] = user_data
-        self.save_config(config)
+        self.add_users({username: user_data})
+
+    def add_users(self, users):
+        """Add several users with a single save; nothing is added if one of them is invalid"""
+        users = self.hash_passwords(users)
+        with self.lock():
+            config = self.load_config()
+            emails = dict(self.emails)
+            for username, user_data in users.items():
+                if username in config['credentials']['usernames']:
+                    raise ValueError(f"Username '{username}' already exists")
+                email = str(user_data.get("email", "")).lower()
+                if email and email in emails:
+                    raise ValueError(f"Email '{user_data['email']}' is already used by '{emails[email]}'")
+                emails[email] = username
+            config['credentials']['usernames'].update(users)
+            self.save_config(config)
 
     def update_user(self, username, user_data):
         """Update an existing user"""
-        config = self.load_config()
-        if username not in config['credentials']['usernames']:
-            raise ValueError(f"Username '{username}' not found")
-        config['credentials']['usernames'][username].update(user_data)
-        self.save_config(config)
+        user_data = self.hash_passwords({username: user_data})[username]
+        with self.lock():
+            config = self.load_config()
+            if username not in config['credentials']['usernames']:
+                raise ValueError(f"Username '{username}' not found")
+            config['credentials']['usernames'][username].update(user_data)
+            self.save_config(config)
+
+    def rename_user(self, username, new_username, user_data):
+        """Rename a user and apply user_data with a single save; on any error the old entry stays"""
+        user_data = self.hash_passwords({new_username: user_data})[new_username]
+        with self.lock():
+            config = self.load_config()
+            users = config['credentials']['usernames']
+            if username not in users:
+                raise ValueError(f"Username '{username}' not found")
+            if new_username in users:
+                raise ValueError(f"Username '{new_username}' already exists")
+            email = str(user_data.get("email", "")).lower()
+            if email and self.emails.get(email, username) != username:
+                raise ValueError(f"Email '{user_data['email']}' is already used by '{self.emails[email]}'")
+            users[new_username] = {**users.pop(username), **user_data}
+            self.save_config(config)
 
     def delete_user(self, username):
         """Delete a user from the config"""
-        config = self.load_config()
-        if username not in config['credentials']['usernames']:
-            raise ValueError(f"Username '{username}' not found")
-        del config['credentials']['usernames'][username]
-        self.save_config(config)
+        with self.lock():
+            config = self.load_config()
+            if username not in config['credentials']['usernames']:
+                raise ValueError(f"Username '{username}' not found")
+            del config['credentials']['usernames'][username]
+            self.save_config(config)
 
     def get_user(self, username):
         """Get a user's data"""
         config = self.load_config()
         return config['credentials']['usernames'].get(username)
 
+    def hash_plaintext_passwords(self):
+        """Hash only the passwords still stored in plain text; save only if one changed"""
+        config = self.load_config()
+        plaintext = {
+            username: user for username, user in config['credentials']['usernames'].items()
+            if not is_hash(user.get("password", ""))
+        }
+        if not plaintext:
+            return 0
+        passwords = {username: user.get("password") for username, user in plaintext.items()}
+        hashed = self.hash_passwords(plaintext)
+        with self.lock():
+            config = self.load_config()
+            changed = 0
+            for username, user in hashed.items():
+                current = config['credentials']['usernames'].get(username)
+                # Skip users changed by someone else while hashing
+                if current is not None and current.get("password") == passwords[username]:
+                    current["password"] = user["password"]
+                    changed += 1
+            if changed:
+                self.save_config(config)
+            return changed
+
+    def get_user_by_email(self, email):
+        """Get (username, user data) for an email, or None"""
+        config = self.load_config()
+        username = self.emails.get(str(email).lower())
+        if username is None:
+            return None
+        return username, config['credentials']['usernames'][username]
+
     def list_users(self):
-        """List all users"""
+        """List all users (a copy, so it can be iterated while users change)"""
         config = self.load_config()
-        return config['credentials']['usernames']
+        return dict(config['credentials']['usernames'])
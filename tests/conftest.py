@@ -0,0 +1,16 @@
+import os
+import sys
+import pytest
+
+# Los módulos de la app se importan por nombre (from product import Product), como al correr streamlit
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "inventory_management_system")
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+from tests.helpers import sample_products, write_data
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    write_data(tmp_path, sample_products())
+    return str(tmp_path)
@@ -0,0 +1,38 @@
+import json
+import os
+import time
+
+
+def sample_products(count=5, branches=3):
+    return [
+        {
+            "product_id": str(idx + 1),
+            "name": f"Producto {idx + 1}",
+            "category": "Masas" if idx % 2 else "Empanadas",
+            "price": 100.0 + idx,
+            "stock_quantity": [10 * (idx + 1)] * branches,
+            "sales_history": [idx] * 30,
+        }
+        for idx in range(count)
+    ]
+
+
+def write_data(directory, products, date=None):
+    # Archivos que lee Product: catálogo, fecha del último cambio de día y sucursales
+    with open(os.path.join(directory, "products.json"), "w") as file:
+        json.dump(products, file)
+    with open(os.path.join(directory, "last_sale_history.json"), "w") as file:
+        json.dump({"date": int(time.time()) if date is None else date}, file)
+    with open(os.path.join(directory, "branches.json"), "w") as file:
+        json.dump([{"branch_id": idx, "name": f"Sucursal {idx + 1}"} for idx in range(3)], file)
+
+
+def open_products(directory, **kwargs):
+    from product import Product
+
+    return Product(
+        data_file=os.path.join(directory, "products.json"),
+        update_sales_history_file=os.path.join(directory, "last_sale_history.json"),
+        journal_file=os.path.join(directory, "products.journal"),
+        **kwargs,
+    )
@@ -0,0 +1,54 @@
+import time
+import pytest
+from tests.helpers import open_products, sample_products, write_data
+from analytics import SalesAnalytics
+from low_stock import LowStockIndex
+from sales_history import SECONDS_PER_DAY
+
+
+def metrics(analytics):
+    return (list(analytics.ids), list(analytics.names), list(analytics.categories), analytics.sales.tolist(),
+            analytics.stock.tolist(), analytics.short_totals.tolist(), analytics.long_totals.tolist())
+
+
+def lowest(analytics, low_stock):
+    return [sorted(low_stock.lowest(branch_id, limit=len(analytics.ids), only_below=False))
+            for branch_id in range(analytics.stock.shape[1])]
+
+
+def assert_matches_fresh_build(products, directory):
+    # Las métricas actualizadas en su lugar son las mismas que armadas desde cero con lo guardado
+    analytics = products.analytics
+    fresh = SalesAnalytics().build(list(open_products(directory).products), 3)
+    assert metrics(analytics) == metrics(fresh)
+    assert lowest(analytics, products.get_low_stock_index()) == lowest(fresh, LowStockIndex().build(fresh))
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_incremental_updates_match_a_fresh_build(tmp_path, columnar):
+    now = int(time.time())
+    records = sample_products(6)
+    records[2]["sales_history"] = list(range(30))
+    write_data(tmp_path, records, date=now)
+    products = open_products(str(tmp_path), columnar=columnar)
+    analytics = products.get_analytics()
+    products.get_low_stock_index()
+
+    products.adjust_stock([("3", 0, -4), ("5", 2, -50)], sales={"3": 4, "5": 50})
+    assert_matches_fresh_build(products, str(tmp_path))
+
+    products.add_product({"name": "Alta", "category": "Nueva", "price": 5, "stock_quantity": [7],
+                          "sales_history": [1] * 30})
+    products.add_products([{"name": f"Lote {idx}", "category": "Masas", "price": 1, "stock_quantity": [idx, 0, 1]}
+                           for idx in range(3)])
+    assert_matches_fresh_build(products, str(tmp_path))
+
+    products.delete_product("2")
+    products.update_product("4", {"name": "Renombrado", "stock_quantity": [0, 0, 0]})
+    assert_matches_fresh_build(products, str(tmp_path))
+
+    assert products.roll_sales_history(now + 2 * SECONDS_PER_DAY) == 2
+    products.adjust_stock([("3", 1, -1)], sales={"3": 1})
+    assert_matches_fresh_build(products, str(tmp_path))
+    # Todo se aplicó sobre las mismas métricas, sin rearmarlas
+    assert products.analytics is analytics
@@ -0,0 +1,51 @@
+import os
+import pytest
+from tests.helpers import open_products
+from branches import BranchRegistry
+from pos import PointOfSale
+
+
+def stock_and_versions(products):
+    return {product["product_id"]: (list(product["stock_quantity"]), product.get("version"))
+            for product in products.products}
+
+
+def test_transfer_with_a_short_line_changes_nothing(data_dir):
+    products = open_products(data_dir)
+    before = stock_and_versions(products)
+    # El producto 1 tiene 10 por sucursal: la segunda línea no alcanza
+    with pytest.raises(ValueError, match="No hay stock suficiente"):
+        products.transfer_stock(0, 1, [("2", 5), ("1", 11), ("3", 1)], user="ana")
+    assert stock_and_versions(products) == before
+    assert stock_and_versions(open_products(data_dir)) == before
+    assert list(products.audit_log.read()) == []
+    assert not os.path.exists(products.audit_log.audit_file)
+
+
+def test_transfer_writes_one_entry_per_line_with_its_version(data_dir):
+    products = open_products(data_dir)
+    products.update_product("2", {"name": "Cambiado"})
+    products.transfer_stock(0, 2, [("1", 4), ("2", 20)], user="ana")
+    assert products.get_product_by_id("1")["stock_quantity"] == [6, 10, 14]
+    assert products.get_product_by_id("2")["stock_quantity"] == [0, 20, 40]
+
+    entries = list(open_products(data_dir).audit_log.read(op="transfer"))
+    assert [{field: entry[field] for field in ("from", "to", "user", "product_id", "quantity", "version")}
+            for entry in entries] == [
+        {"from": 0, "to": 2, "user": "ana", "product_id": "1", "quantity": 4,
+         "version": products.get_product_by_id("1")["version"]},
+        {"from": 0, "to": 2, "user": "ana", "product_id": "2", "quantity": 20,
+         "version": products.get_product_by_id("2")["version"]},
+    ]
+    assert entries[1]["version"] == entries[0]["version"] + 1
+    assert entries[0]["time"] == entries[1]["time"]
+
+
+def test_sales_are_audited_per_line(data_dir):
+    point_of_sale = PointOfSale(open_products(data_dir), BranchRegistry(os.path.join(data_dir, "branches.json")))
+    point_of_sale.record_sale(1, [("3", 2), ("4", 1)])
+    with pytest.raises(ValueError):
+        point_of_sale.record_sale(1, [("3", 1), ("5", 51)])
+    entries = list(point_of_sale.product_manager.audit_log.read())
+    assert [(entry["op"], entry["branch"], entry["product_id"], entry["quantity"]) for entry in entries] == \
+        [("sale", 1, "3", 2), ("sale", 1, "4", 1)]
@@ -0,0 +1,60 @@
+import json
+import os
+from tests.helpers import open_products, sample_products, write_data
+from binary_snapshot import Snapshot, binary_to_json, json_to_binary, write_snapshot
+from columnar import ColumnarCatalog
+
+
+def mixed_records():
+    # Lo que no entra en las columnas tiene que volver tal cual
+    records = sample_products(6)
+    del records[0]["price"]
+    records[1]["supplier"] = "Molino"
+    records[2]["stock_quantity"] = [1.5, 2, 0]
+    del records[3]["sales_history"]
+    records[4]["version"] = 3
+    records[4]["sales_history"] = [1, 2]
+    records[5]["price"] = "a convenir"
+    records[5]["stock_quantity"] = [7]
+    return records
+
+
+def test_records_round_trip(tmp_path):
+    path = os.path.join(tmp_path, "products.snap")
+    records = mixed_records()
+    write_snapshot(path, records)
+    assert Snapshot(path).records() == records
+
+
+def test_catalog_matches_columnar_load(tmp_path):
+    path = os.path.join(tmp_path, "products.snap")
+    # El catálogo por columnas guarda precios numéricos y stock en unidades enteras
+    records = [record for record in mixed_records() if record["product_id"] not in ("3", "6")]
+    write_snapshot(path, records)
+    catalog = Snapshot(path).catalog()
+    assert catalog.to_records() == ColumnarCatalog(records).to_records()
+    assert catalog[1]["supplier"] == "Molino"
+    assert catalog[3]["version"] == 3
+    assert catalog[3]["sales_history"][-3:] == [0, 1, 2]
+
+    # Se puede volver a escribir desde el catálogo por columnas sin perder los campos extra
+    write_snapshot(path, catalog)
+    assert Snapshot(path).catalog().to_records() == catalog.to_records()
+
+
+def test_json_binary_conversion_includes_journal(tmp_path):
+    directory = str(tmp_path)
+    write_data(directory, mixed_records())
+    products = open_products(directory)
+    products.update_product("2", {"name": "Desde la bitácora"})
+    expected = [dict(product) for product in products.products]
+
+    binary = os.path.join(directory, "products.snap")
+    journal = os.path.join(directory, "products.journal")
+    assert json_to_binary(os.path.join(directory, "products.json"), binary, journal) == len(expected)
+    assert Snapshot(binary).records() == expected
+
+    copy = os.path.join(directory, "copy.json")
+    binary_to_json(binary, copy)
+    with open(copy) as file:
+        assert json.load(file) == expected
@@ -0,0 +1,45 @@
+import os
+import pytest
+from tests.helpers import open_products, sample_products, write_data
+from branches import BranchRegistry
+
+
+def test_add_branch_is_saved_and_seen_by_other_registries(tmp_path):
+    branches_file = os.path.join(tmp_path, "branches.json")
+    registry, other = BranchRegistry(branches_file), BranchRegistry(branches_file)
+    assert registry.add_branch("Centro") == {"branch_id": 3, "name": "Centro"}
+    with pytest.raises(ValueError):
+        other.add_branch("Centro")
+    assert other.add_branch("Norte")["branch_id"] == 4
+    assert BranchRegistry(branches_file).names()[3:] == ["Centro", "Norte"]
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_short_stock_lists_count_as_zero(tmp_path, columnar):
+    records = sample_products(3)
+    records[1]["stock_quantity"] = [5]
+    records[2]["stock_quantity"] = []
+    write_data(tmp_path, records)
+    products = open_products(str(tmp_path), columnar=columnar)
+    assert [products.branch_total(branch_id) for branch_id in range(3)] == [15, 10, 10]
+    assert products.get_analytics().stock.shape[1] == 3
+    assert sorted(product["product_id"] for product in products.filter_products(low_stock_threshold=0, branch_id=2)) \
+        == ["2", "3"]
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_new_branch_reaches_built_indexes(tmp_path, columnar):
+    write_data(tmp_path, sample_products(4))
+    products = open_products(str(tmp_path), columnar=columnar)
+    assert products.lowest_stock(0) == []
+    assert products.branch_total(1) == 100
+
+    # Otra sesión agrega la sucursal: su stock es 0 hasta que se cargue
+    BranchRegistry(os.path.join(tmp_path, "branches.json")).add_branch("Centro")
+    assert products.branch_total(3) == 0
+    assert [(product["product_id"], quantity) for product, quantity, _ in products.lowest_stock(3)] \
+        == [("4", 0), ("3", 0), ("2", 0), ("1", 0)]
+
+    products.adjust_stock([("4", 3, 50)])
+    assert products.branch_total(3) == 50
+    assert [product["product_id"] for product, _, _ in products.lowest_stock(3)] == ["3", "2", "1"]
@@ -0,0 +1,54 @@
+import os
+import pytest
+from tests.helpers import open_products
+from bulk_io import import_products, read_rows
+
+BRANCHES = ["Sucursal 1", "Sucursal 2", "Sucursal 3"]
+HEADER = ["product_id", "name", "category", "price"] + BRANCHES
+
+
+def row(product_id, name, price="10"):
+    return dict(zip(HEADER, [product_id, name, "Masas", price, "1", "2", "3"]))
+
+
+def test_conflicting_ids_are_dropped_and_the_chunk_is_retried(data_dir):
+    products = open_products(data_dir)
+    other = open_products(data_dir)
+
+    def rows():
+        yield from enumerate([row("20", "Veinte"), row("", "Sin id"), row("21", "Veintiuno"), row("22", "Veintidós")],
+                             start=2)
+        # Otra sesión agrega dos de los ids después de que se revisaron pero antes de guardar el lote
+        other.add_products([dict(row("20", "De otro"), price=1.0, stock_quantity=[0, 0, 0]),
+                            dict(row("22", "De otro"), price=1.0, stock_quantity=[0, 0, 0])])
+
+    summary = import_products(products, rows(), BRANCHES)
+    assert summary["imported"] == 2
+    assert summary["errors"] == [{"line": 2, "error": "El producto '20' ya existe."},
+                                 {"line": 5, "error": "El producto '22' ya existe."}]
+    assert products.get_product_by_id("21")["name"] == "Veintiuno"
+    assert products.get_product_by_id("20")["name"] == "De otro"
+    assert products.search_products("Sin id")
+
+
+def test_csv_lines_count_blank_rows(tmp_path, data_dir):
+    path = os.path.join(tmp_path, "productos.csv")
+    lines = [",".join(HEADER), ",".join(row("", "Uno").values()), "", ",".join(row("", "Malo", "x").values()),
+             "", "", ",".join(row("", "Dos", "").values())]
+    with open(path, "w") as file:
+        file.write("\n".join(lines) + "\n")
+    assert [line for line, _ in read_rows(path)] == [2, 4, 7]
+    summary = import_products(open_products(data_dir), read_rows(path), BRANCHES)
+    assert summary["imported"] == 1
+    assert [error["line"] for error in summary["errors"]] == [4, 7]
+
+
+def test_xlsx_lines_count_blank_rows(tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    path = os.path.join(tmp_path, "productos.xlsx")
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    for values in [HEADER, list(row("", "Uno").values()), [], [], list(row("", "Dos").values())]:
+        sheet.append(values)
+    workbook.save(path)
+    assert [(line, values["name"]) for line, values in read_rows(path)] == [(2, "Uno"), (5, "Dos")]
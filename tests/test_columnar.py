@@ -0,0 +1,68 @@
+from tests.helpers import sample_products
+from columnar import ColumnarCatalog
+from sales_history import normalize_history, roll_history
+
+
+def test_round_trip_keeps_records():
+    records = sample_products(4)
+    records[2]["version"] = 3
+    records[3]["supplier"] = "Molino"
+    catalog = ColumnarCatalog(records)
+    assert catalog.to_records() == [dict(record, sales_history=normalize_history(record["sales_history"]))
+                                    for record in records]
+
+
+def test_insert_and_delete_shift_rows():
+    catalog = ColumnarCatalog(sample_products(3))
+    catalog.insert(1, {"product_id": "9", "name": "Nuevo", "price": 5, "stock_quantity": [1, 2, 3]})
+    assert catalog.ids == ["1", "9", "2", "3"]
+    assert catalog[1]["stock_quantity"] == [1, 2, 3]
+    assert catalog[2]["stock_quantity"] == [20, 20, 20]
+
+    del catalog[0]
+    assert catalog.ids == ["9", "2", "3"]
+    assert catalog[0]["name"] == "Nuevo"
+    assert catalog[2]["price"] == 102.0
+    assert len(catalog) == 3
+
+
+def test_append_grows_past_capacity():
+    catalog = ColumnarCatalog()
+    for record in sample_products(40):
+        catalog.append(record)
+    assert len(catalog) == 40
+    assert catalog[39]["stock_quantity"] == [400, 400, 400]
+    assert catalog[39]["sales_history"] == [39] * 30
+
+
+def test_wider_stock_adds_branches():
+    catalog = ColumnarCatalog(sample_products(2))
+    catalog[0]["stock_quantity"] = [1, 2, 3, 4]
+    assert catalog[0]["stock_quantity"] == [1, 2, 3, 4]
+    assert catalog[1]["stock_quantity"] == [20, 20, 20, 0]
+
+
+def test_roll_sales_matches_list_roll():
+    records = sample_products(3)
+    records[1]["sales_history"] = list(range(30))
+    catalog = ColumnarCatalog(records)
+    catalog.add_sale(1, 5)
+    catalog.roll_sales(3)
+    expected = list(range(29)) + [29 + 5]
+    assert catalog[1]["sales_history"] == roll_history(expected, 3)
+
+    catalog.add_sale(1, 2)
+    assert catalog[1]["sales_history"][-1] == 2
+    catalog.roll_sales(40)
+    assert catalog[1]["sales_history"] == [0] * 30
+
+
+def test_extra_fields_and_delete_field():
+    catalog = ColumnarCatalog(sample_products(1))
+    view = catalog[0]
+    view["version"] = 2
+    assert dict(view)["version"] == 2
+    del view["version"]
+    assert "version" not in view
+    del view["sales_history"]
+    assert view["sales_history"] == [0] * 30
@@ -0,0 +1,65 @@
+import json
+import multiprocessing
+import os
+import pytest
+from tests.helpers import open_products
+from concurrency import ConflictError
+
+WRITERS = 4
+SALES = 15
+COMPACT_EVERY = 10
+
+
+def sell(directory, product_id, sales):
+    # Vende de a una unidad con compare-and-swap, reintentando ante conflictos
+    products = open_products(directory, compact_every=COMPACT_EVERY)
+    conflicts = 0
+    for _ in range(sales):
+        while True:
+            products.reload_if_stale()
+            product = products.get_product_by_id(product_id)
+            stock_quantity = list(product["stock_quantity"])
+            stock_quantity[0] -= 1
+            try:
+                products.update_product(product_id, {"stock_quantity": stock_quantity},
+                                        expected_version=product.get("version", 0))
+                break
+            except ConflictError:
+                conflicts += 1
+    return conflicts
+
+
+def read(directory, rounds):
+    # Lee el snapshot y la bitácora muchas veces; un archivo a medias lanzaría una excepción
+    for _ in range(rounds):
+        with open(os.path.join(directory, "products.json"), "r") as file:
+            json.load(file)
+        open_products(directory, compact_every=10 ** 9)
+    return rounds
+
+
+def test_parallel_writers_lose_no_updates(data_dir):
+    products = open_products(data_dir, compact_every=COMPACT_EVERY)
+    initial_stock = WRITERS * SALES
+    products.update_product("1", {"stock_quantity": [initial_stock, 0, 0]})
+
+    with multiprocessing.Pool(WRITERS + 1) as pool:
+        reader = pool.apply_async(read, (data_dir, SALES))
+        results = [pool.apply_async(sell, (data_dir, "1", SALES)) for _ in range(WRITERS)]
+        for result in results:
+            result.get(timeout=60)
+        reader.get(timeout=60)
+
+    final_stock = open_products(data_dir).get_product_by_id("1")["stock_quantity"][0]
+    lost_updates = final_stock - (initial_stock - WRITERS * SALES)
+    assert lost_updates == 0
+
+
+def test_stale_expected_version_conflicts(data_dir):
+    first = open_products(data_dir)
+    second = open_products(data_dir)
+    version = second.get_product_by_id("1").get("version", 0)
+    first.update_product("1", {"stock_quantity": [5, 0, 0]}, expected_version=version)
+    with pytest.raises(ConflictError):
+        second.update_product("1", {"stock_quantity": [7, 0, 0]}, expected_version=version)
+    assert open_products(data_dir).get_product_by_id("1")["stock_quantity"] == [5, 0, 0]
@@ -0,0 +1,84 @@
+import threading
+from types import SimpleNamespace
+import hashing
+from hashing import PasswordHasher, check_password, is_hash, use_verify_cache
+
+
+def test_hash_many_keeps_order():
+    hasher = PasswordHasher(rounds=4, workers=0)
+    hashed = hasher.hash_many(["uno", "dos", "tres"])
+    assert all(is_hash(password) for password in hashed)
+    assert [check_password(password, hash_) for password, hash_ in zip(["uno", "dos", "tres"], hashed)] == [True] * 3
+
+
+def test_background_runs_off_the_caller_thread_in_order():
+    hasher = PasswordHasher(rounds=4, workers=0)
+    release = threading.Event()
+    done = []
+    first = hasher.background(lambda: (release.wait(5), done.append(hasher.hash("uno"))))
+    second = hasher.background(done.append, "después")
+    # El que llama no espera al hash
+    assert not first.done()
+    release.set()
+    second.result(timeout=5)
+    assert check_password("uno", done[0]) and done[1] == "después"
+
+    failed = hasher.background(lambda: 1 / 0)
+    assert isinstance(failed.exception(timeout=5), ZeroDivisionError)
+    hasher.shutdown()
+
+
+def count_checks(monkeypatch):
+    checks = []
+    original = hashing.check_password
+
+    def counted(password, hashed_password):
+        checks.append(password)
+        return original(password, hashed_password)
+
+    monkeypatch.setattr(hashing, "check_password", counted)
+    return checks
+
+
+def test_verify_remembers_successful_logins_until_the_ttl(monkeypatch):
+    hasher = PasswordHasher(rounds=4, workers=0, cache_ttl=60)
+    hashed = hasher.hash("clave")
+    checks = count_checks(monkeypatch)
+    clock = [1000.0]
+    monkeypatch.setattr(hashing.time, "monotonic", lambda: clock[0])
+
+    assert hasher.verify("clave", hashed) and hasher.verify("clave", hashed)
+    assert len(checks) == 1
+    # Los errores no se recuerdan
+    assert not hasher.verify("otra", hashed) and not hasher.verify("otra", hashed)
+    assert len(checks) == 3
+
+    clock[0] += 61
+    assert hasher.verify("clave", hashed)
+    assert len(checks) == 4
+
+
+def test_changing_the_password_drops_the_remembered_login(monkeypatch):
+    hasher = PasswordHasher(rounds=4, workers=0)
+    old, new = hasher.hash("vieja"), hasher.hash("nueva")
+    assert hasher.verify("vieja", old)
+    checks = count_checks(monkeypatch)
+    assert not hasher.verify("vieja", new)
+    assert hasher.verify("nueva", new)
+    assert checks == ["vieja", "nueva"]
+
+
+def test_use_verify_cache_wraps_only_the_given_model(monkeypatch):
+    hasher = PasswordHasher(rounds=4, workers=0)
+    monkeypatch.setattr(hashing, "default_hasher", hasher)
+    failed = []
+    model = SimpleNamespace(credentials={"usernames": {"ana": {"password": hasher.hash("clave")},
+                                                       "beto": {"password": "sin hashear"}}},
+                            _record_failed_login_attempts=failed.append)
+    use_verify_cache(model)
+    checks = count_checks(monkeypatch)
+    assert model.check_credentials("ana", "clave") and model.check_credentials("ana", "clave")
+    assert checks == ["clave"]
+    assert model.check_credentials("ana", "mala") is False and failed == ["ana"]
+    assert model.check_credentials("nadie", "clave") is False
+    assert not model.check_credentials("beto", "sin hashear") and failed == ["ana"]
@@ -0,0 +1,53 @@
+import os
+from datetime import datetime, timezone
+import numpy as np
+from history_store import SalesHistoryStore, downsample
+from sales_history import SECONDS_PER_DAY
+
+
+def day(year, month, number):
+    return int(datetime(year, month, number, tzinfo=timezone.utc).timestamp()) // SECONDS_PER_DAY
+
+
+def test_append_day_across_a_month_boundary(tmp_path):
+    store = SalesHistoryStore(str(tmp_path))
+    store.append_day(day(2026, 1, 31), ["1", "2"], [3, 4])
+    store.append_day(day(2026, 2, 1), ["2", "3"], [5, 6])
+    assert sorted(name for name in os.listdir(tmp_path) if name.endswith(".npy")) == ["2026-01.npy", "2026-02.npy"]
+    assert np.load(os.path.join(tmp_path, "2026-01.npy")).shape == (2, 31)
+    assert np.load(os.path.join(tmp_path, "2026-02.npy")).shape == (2, 28)
+    assert store.query(["1", "2", "3"], day(2026, 1, 31), day(2026, 2, 1)).tolist() == [[3, 0], [4, 5], [0, 6]]
+
+
+def test_rewriting_a_day_replaces_it(tmp_path):
+    store = SalesHistoryStore(str(tmp_path))
+    today = day(2026, 3, 10)
+    store.append_day(today - 1, ["1"], [2])
+    store.append_day(today, ["1", "2"], [7, 1])
+    # El cambio de día se reintentó: el mismo día con otro producto nuevo
+    store.append_day(today, ["1", "2", "3"], [7, 1, 9])
+    assert store.query(["1", "2", "3"], today - 1, today).tolist() == [[2, 7], [0, 1], [0, 9]]
+    # Otra instancia (otro proceso) ve la partición reescrita
+    assert SalesHistoryStore(str(tmp_path)).query(["3"], today, today).tolist() == [[9]]
+
+
+def test_query_spans_partitions_and_missing_days(tmp_path):
+    store = SalesHistoryStore(str(tmp_path))
+    store.append_day(day(2025, 12, 31), ["1"], [1])
+    store.append_day(day(2026, 2, 2), ["1"], [2])
+    result = store.query(["1", "9"], day(2025, 12, 30), day(2026, 2, 2))
+    assert result.shape == (2, 35)
+    assert result[0].tolist() == [0, 1] + [0] * 32 + [2]
+    assert not result[1].any()
+    assert store.query(["1"], day(2024, 1, 1), day(2024, 1, 5)).tolist() == [[0] * 5]
+
+
+def test_downsample_by_week_and_month():
+    # 10 días de a una venta desde el jueves 29 de enero; las semanas cierran el domingo
+    values = [1] * 10
+    start = day(2026, 1, 29)
+    assert downsample(values, start, "day").tolist() == values
+    weekly = downsample(values, start, "week")
+    assert [(str(date.date()), total) for date, total in weekly.items()] == [("2026-02-01", 4), ("2026-02-08", 6)]
+    monthly = downsample(values, start, "month")
+    assert [(str(date.date()), total) for date, total in monthly.items()] == [("2026-01-01", 3), ("2026-02-01", 7)]
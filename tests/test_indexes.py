@@ -0,0 +1,100 @@
+import pytest
+from tests.helpers import open_products, sample_products, write_data
+
+
+def build_indexes(products):
+    products.get_search_index()
+    products.get_analytics()
+    products.get_low_stock_index()
+    products.get_editor_view()
+
+
+def index_state(products):
+    # Lo que muestran los índices, para comparar con un catálogo recién cargado
+    analytics = products.get_analytics()
+    low_stock = products.get_low_stock_index()
+    frame, stock_map = products.editor_frame(list(products.products), 1)
+    return {
+        "search": [[product["product_id"] for product in products.search_products(query, field)]
+                   for query, field in (("producto 1", "name"), ("masas", "category"), ("nuevo", "name"))],
+        "analytics": (list(analytics.ids), analytics.sales.tolist(), analytics.stock.tolist(),
+                      analytics.short_totals.tolist()),
+        "low_stock": [sorted(low_stock.lowest(branch_id, limit=len(products.products), only_below=False))
+                      for branch_id in range(3)],
+        "editor": (frame.to_dict("list"), stock_map),
+        "totals": [products.branch_total(branch_id) for branch_id in range(3)],
+    }
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_other_process_changes_update_built_indexes(tmp_path, columnar):
+    write_data(tmp_path, sample_products(8))
+    writer = open_products(str(tmp_path), columnar=columnar)
+    reader = open_products(str(tmp_path), columnar=columnar)
+    build_indexes(reader)
+    search_index, analytics, editor_view = reader.search_index, reader.analytics, reader.editor_view
+
+    writer.update_product("2", {"name": "Producto nuevo", "price": 50})
+    writer.update_products({}, sales={"3": 7})
+    writer.adjust_stock([("4", 1, -5)])
+    writer.delete_product("1")
+    writer.add_products([{"name": "Alta nueva", "category": "Masas", "price": 10, "stock_quantity": [1, 2, 3]}])
+    writer.delete_product("6")
+    writer.add_product({"product_id": "6", "name": "Vuelve", "category": "Empanadas", "price": 1,
+                        "stock_quantity": [0, 9, 0]})
+
+    assert reader.reload_if_stale()
+    # Los índices se actualizaron en su lugar, no se rearmaron
+    assert reader.search_index is search_index
+    assert reader.analytics is analytics
+    assert reader.editor_view is editor_view
+    assert index_state(reader) == index_state(open_products(str(tmp_path), columnar=columnar))
+
+
+def test_snapshot_rewrite_rebuilds_indexes(tmp_path):
+    write_data(tmp_path, sample_products(4))
+    writer = open_products(str(tmp_path), compact_every=1)
+    reader = open_products(str(tmp_path))
+    build_indexes(reader)
+    writer.save_data()
+    writer.update_product("1", {"name": "Compactado"})
+    assert reader.reload_if_stale()
+    assert reader.search_index is None
+    assert index_state(reader) == index_state(open_products(str(tmp_path)))
+
+
+@pytest.mark.parametrize("query, expected", [("ap", ["1"]), ("p", ["1", "2"]), ("ÓN", ["2"]), ("top", ["1"])])
+def test_short_queries_match_substrings(tmp_path, query, expected):
+    write_data(tmp_path, [
+        {"product_id": "1", "name": "Laptop", "category": "Electrónica", "price": 1, "stock_quantity": [1]},
+        {"product_id": "2", "name": "Empanada de jamón", "category": "Empanadas", "price": 1, "stock_quantity": [1]},
+        {"product_id": "3", "name": "Mouse", "category": "Electrónica", "price": 1, "stock_quantity": [1]},
+    ])
+    products = open_products(str(tmp_path))
+    assert [product["product_id"] for product in products.search_products(query)] == expected
+
+
+def test_bulk_add_extends_editor_view(tmp_path):
+    write_data(tmp_path, sample_products(4))
+    products = open_products(str(tmp_path))
+    build_indexes(products)
+    editor_view = products.editor_view
+    products.add_products([{"name": f"Alta {idx}", "category": "Masas", "price": 1 + idx, "stock_quantity": [idx, 0, 0]}
+                           for idx in range(30)])
+    products.add_product({"name": "Suelta", "category": "Masas", "price": 2, "stock_quantity": [1, 1, 1]})
+    assert products.editor_view is editor_view
+    assert len(editor_view.stale) == len(products.products) == 35
+    assert index_state(products) == index_state(open_products(str(tmp_path)))
+
+
+def test_short_query_postings_follow_edits(tmp_path):
+    write_data(tmp_path, sample_products(3))
+    products = open_products(str(tmp_path))
+    assert [product["product_id"] for product in products.search_products("2")] == ["2"]
+    products.update_product("2", {"name": "Laptop"})
+    products.add_product({"product_id": "9", "name": "Tapa", "category": "Masas", "price": 1, "stock_quantity": [1]})
+    assert products.search_products("2") == []
+    assert [product["product_id"] for product in products.search_products("ap")] == ["2", "9"]
+    products.delete_product("9")
+    assert [product["product_id"] for product in products.search_products("ap")] == ["2"]
+    assert products.get_search_index().fields["name"].search("x") == set()
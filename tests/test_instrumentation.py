@@ -0,0 +1,23 @@
+import instrumentation
+from instrumentation import count, rerun
+
+
+def test_count_only_evaluates_lazy_values_while_measuring(monkeypatch):
+    calls = []
+
+    def size():
+        calls.append(1)
+        return 10
+
+    monkeypatch.setattr(instrumentation, "ENABLED", False)
+    count("bytes_read", size)
+    monkeypatch.setattr(instrumentation, "ENABLED", True)
+    # Encendida pero fuera de una recarga medida tampoco hay a quién sumarle
+    count("bytes_read", size)
+    assert calls == []
+
+    with rerun("prueba") as metrics:
+        count("bytes_read", size)
+        count("bytes_read", 5)
+    assert calls == [1]
+    assert metrics.counters == {"bytes_read": 15}
@@ -0,0 +1,174 @@
+import json
+import os
+import time
+import pytest
+from tests.helpers import open_products, sample_products, write_data
+from binary_snapshot import write_snapshot
+from journal import Journal, delete_change, put_change, roll_change
+from sales_history import SECONDS_PER_DAY, day_number, roll_history, roll_records
+from storage import BinaryStorage, JsonStorage
+
+
+def test_append_and_read(tmp_path):
+    journal = Journal(str(tmp_path / "products.journal"))
+    journal.append([put_change({"product_id": "1", "name": "A"}, "product_id")])
+    journal.append([delete_change("2")])
+    changes, offset = journal.read()
+    assert [change["op"] for change in changes] == ["put", "del"]
+    assert offset == os.path.getsize(journal.journal_file)
+
+
+def test_read_ignores_torn_last_line(tmp_path):
+    journal = Journal(str(tmp_path / "products.journal"))
+    journal.append([put_change({"product_id": "1"}, "product_id")])
+    valid = os.path.getsize(journal.journal_file)
+    with open(journal.journal_file, "ab") as file:
+        file.write(b'{"op":"put","id":"2","da')
+    changes, offset = journal.read()
+    assert [change["id"] for change in changes] == ["1"]
+    assert offset == valid
+
+
+def test_torn_batch_is_dropped_whole(tmp_path):
+    journal = Journal(str(tmp_path / "products.journal"))
+    journal.append([put_change({"product_id": "1"}, "product_id")])
+    line = json.dumps({"op": "batch", "changes": [put_change({"product_id": str(idx)}, "product_id")
+                                                  for idx in range(2, 6)]})
+    with open(journal.journal_file, "a") as file:
+        file.write(line[:len(line) // 2])
+    changes, _ = journal.read()
+    assert [change["id"] for change in changes] == ["1"]
+
+
+def test_append_after_torn_line(tmp_path):
+    # Un proceso cortado dejó media línea; el lote siguiente no se tiene que pegar a ella
+    path = str(tmp_path / "products.journal")
+    Journal(path).append([put_change({"product_id": "1"}, "product_id")])
+    with open(path, "ab") as file:
+        file.write(b'{"op":"put","id":"2"')
+
+    # Sin haber leído la bitácora antes (offset None)
+    journal = Journal(path)
+    journal.append([put_change({"product_id": "3"}, "product_id")])
+    assert [change["id"] for change in Journal(path).read()[0]] == ["1", "3"]
+
+    with open(path, "ab") as file:
+        file.write(b'{"op":"del"')
+    # Y después de leerla
+    journal = Journal(path)
+    journal.read()
+    journal.append([delete_change("1")])
+    assert [change["id"] for change in Journal(path).read()[0]] == ["1", "3", "1"]
+
+
+def test_replay_is_idempotent(tmp_path):
+    journal = Journal(str(tmp_path / "products.journal"))
+    journal.append([put_change({"product_id": "1", "name": "Nuevo"}, "product_id"),
+                    put_change({"product_id": "9", "name": "Alta"}, "product_id"),
+                    delete_change("2")])
+    first = journal.replay(sample_products(3))
+    second = journal.replay(journal.replay(sample_products(3)))
+    assert first == second
+    assert [record["product_id"] for record in first] == ["1", "3", "9"]
+    assert first[0]["name"] == "Nuevo"
+
+
+def test_replay_from_offset_reads_only_new_lines(tmp_path):
+    journal = Journal(str(tmp_path / "products.journal"))
+    journal.append([put_change({"product_id": "1", "name": "Uno"}, "product_id")])
+    records = journal.replay(sample_products(2))
+    other = Journal(journal.journal_file)
+    other.read()
+    other.offset = os.path.getsize(journal.journal_file)
+    other.append([put_change({"product_id": "2", "name": "Dos"}, "product_id")])
+    records = journal.replay(records, journal.offset)
+    assert [record["name"] for record in records] == ["Uno", "Dos"]
+    assert journal.entries == 2
+
+
+def test_replay_roll(tmp_path):
+    journal = Journal(str(tmp_path / "products.journal"))
+    journal.append([roll_change(2, 1234)])
+    records = journal.replay(sample_products(2))
+    assert records[1]["sales_history"] == roll_history([1] * 30, 2)
+    assert journal.last_roll_date == 1234
+
+
+def test_commit_compacts_into_snapshot(tmp_path):
+    data_file = str(tmp_path / "products.json")
+    with open(data_file, "w") as file:
+        json.dump(sample_products(3), file)
+    storage = JsonStorage(data_file, "product_id", journal_file=str(tmp_path / "products.journal"),
+                          compact_every=2)
+    records = storage.load()
+    records[0]["name"] = "Cambiado"
+    storage.commit([put_change(records[0], "product_id")], records)
+    assert storage.journal.entries == 1
+    records[1]["name"] = "Otro"
+    storage.commit([put_change(records[1], "product_id")], records)
+    storage.commit([put_change(records[2], "product_id")], records)
+    # Compactó: el snapshot tiene los cambios y la bitácora quedó vacía
+    assert storage.journal.size() == 0
+    with open(data_file) as file:
+        assert [record["name"] for record in json.load(file)][:2] == ["Cambiado", "Otro"]
+    assert JsonStorage(data_file, "product_id", journal_file=storage.journal.journal_file).load() == records
+
+
+def test_other_process_changes_are_replayed(data_dir):
+    first = open_products(data_dir)
+    second = open_products(data_dir)
+    first.update_product("1", {"name": "Desde otro proceso"})
+    assert second.reload_if_stale()
+    assert second.get_product_by_id("1")["name"] == "Desde otro proceso"
+
+
+def crash_on_clear(monkeypatch):
+    # Se corta después de escribir el snapshot y antes de vaciar la bitácora
+    def clear(journal):
+        raise RuntimeError("corte")
+    monkeypatch.setattr(Journal, "clear", clear)
+
+
+@pytest.mark.parametrize("storage_class", [JsonStorage, BinaryStorage])
+def test_roll_is_not_replayed_over_a_snapshot_that_has_it(tmp_path, monkeypatch, storage_class):
+    data_file = str(tmp_path / "products.snapshot")
+    journal_file = str(tmp_path / "products.journal")
+    records = sample_products(1)
+    records[0]["sales_history"] = [0] * 27 + [29, 30, 5]
+    if storage_class is JsonStorage:
+        with open(data_file, "w") as file:
+            json.dump(records, file)
+    else:
+        write_snapshot(data_file, records)
+    storage = storage_class(data_file, "product_id", journal_file=journal_file, compact_every=1)
+    records = storage.load()
+    roll_records(records, 1)
+    crash_on_clear(monkeypatch)
+    with pytest.raises(RuntimeError):
+        storage.commit([roll_change(1, 5000)], records)
+    monkeypatch.undo()
+    assert Journal(journal_file).read()[0] == [roll_change(1, 5000)]
+
+    reloaded = storage_class(data_file, "product_id", journal_file=journal_file)
+    assert reloaded.load()[0]["sales_history"][-3:] == [30, 5, 0]
+    assert reloaded.last_roll_date == 5000
+    # Un corrimiento posterior sí se aplica
+    reloaded.commit([roll_change(1, 6000)], reloaded.load())
+    assert storage_class(data_file, "product_id", journal_file=journal_file).load()[0]["sales_history"][-3:] == [5, 0, 0]
+
+
+def test_day_roll_survives_a_crash_during_compaction(tmp_path, monkeypatch):
+    records = sample_products(1)
+    records[0]["sales_history"] = list(range(30))
+    write_data(tmp_path, records, date=int(time.time()) - SECONDS_PER_DAY)
+    products = open_products(str(tmp_path), compact_every=1)
+    crash_on_clear(monkeypatch)
+    with pytest.raises(RuntimeError):
+        products.reload_if_stale()
+    monkeypatch.undo()
+
+    # La fecha del último cambio de día no llegó a guardarse; sale del snapshot
+    reopened = open_products(str(tmp_path))
+    assert day_number(reopened.last_date_update) == day_number(time.time())
+    assert reopened.roll_sales_history() == 0
+    assert reopened.get_product_by_id("1")["sales_history"] == list(range(1, 30)) + [0]
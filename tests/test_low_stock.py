@@ -0,0 +1,46 @@
+import sys
+import threading
+from tests.helpers import open_products, sample_products, write_data
+
+THREADS = 8
+CALLS = 150
+
+
+def test_concurrent_lowest_is_consistent(tmp_path):
+    records = sample_products(200)
+    for idx, record in enumerate(records):
+        record["stock_quantity"] = [idx % 50, 100, 100]
+    write_data(tmp_path, records)
+    products = open_products(str(tmp_path))
+    low_stock = products.get_low_stock_index()
+    # Entradas descartadas en el heap, para que lowest tenga que saltearlas y compactar
+    for product_id in range(1, 41):
+        products.adjust_stock([(str(product_id), 0, 1)])
+    expected = low_stock.lowest(0, limit=20, only_below=False)
+
+    wrong = []
+    writer_done = threading.Event()
+
+    def read():
+        for _ in range(CALLS):
+            if low_stock.lowest(0, limit=20, only_below=False) != expected:
+                wrong.append(1)
+
+    def write():
+        # Cambios en otra sucursal: no alteran el resultado de la sucursal 0
+        for product_id in range(100, 200):
+            products.adjust_stock([(str(product_id), 1, -1)])
+        writer_done.set()
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=read) for _ in range(THREADS)] + [threading.Thread(target=write)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert writer_done.is_set()
+    assert not wrong
@@ -0,0 +1,59 @@
+import pytest
+from tests.helpers import open_products, sample_products, write_data
+
+
+def page_ids(products, **kwargs):
+    page, total = products.get_page(0, 100, **kwargs)
+    return [product["product_id"] for product in page], total
+
+
+@pytest.fixture(params=[False, True], ids=["list", "columnar"])
+def products(tmp_path, request):
+    records = sample_products(12)
+    for record, price in zip(records, [5, 3, 9, 3, 1, 7, 2, 8, 3, 6, 4, 10]):
+        record["price"] = price
+    write_data(tmp_path, records)
+    return open_products(str(tmp_path), columnar=request.param)
+
+
+def expected_ids(products, sort_key, descending=False, ids=None):
+    records = [product for product in products.products if ids is None or product["product_id"] in ids]
+    return [product["product_id"] for product in
+            sorted(records, key=lambda product: products.sort_value(sort_key, product.get(sort_key)), reverse=descending)]
+
+
+def test_sorted_pages_are_cached(products):
+    assert page_ids(products, sort_key="price")[0] == expected_ids(products, "price")
+    order = products.sort_cache[("price", False)][0]
+    # Una venta no cambia el orden: el orden guardado se reusa
+    products.update_products({}, sales={"1": 2})
+    page_ids(products, sort_key="price")
+    assert products.sort_cache[("price", False)][0] is order
+
+
+def test_sort_cache_follows_writes(products):
+    page_ids(products, sort_key="price", descending=True)
+    page_ids(products, sort_key="name")
+    products.update_product("5", {"price": 100})
+    assert ("price", True) not in products.sort_cache
+    assert ("name", False) in products.sort_cache
+    assert page_ids(products, sort_key="price", descending=True)[0] == expected_ids(products, "price", True)
+
+    products.add_product({"name": "Aaa", "category": "Masas", "price": 0.5, "stock_quantity": [1, 1, 1]})
+    assert page_ids(products, sort_key="name")[0][0] == "13"
+    products.delete_product("13")
+    assert page_ids(products, sort_key="price")[0] == expected_ids(products, "price")
+
+
+def test_filter_with_sort(products):
+    ids, total = page_ids(products, sort_key="price", descending=True, filter_field="category", filter_value="masas")
+    assert total == 6
+    assert ids == expected_ids(products, "price", True, set(ids))
+    assert set(ids) == {product["product_id"] for product in products.products if product["category"] == "Masas"}
+
+
+def test_other_process_price_change(tmp_path, products):
+    page_ids(products, sort_key="price")
+    open_products(str(tmp_path), columnar=products.columnar).update_product("2", {"price": 0})
+    products.reload_if_stale()
+    assert page_ids(products, sort_key="price")[0][0] == "2"
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from tests.helpers import open_products
+from inventory_system import InventorySystem
+
+
+@pytest.fixture
+def system(data_dir):
+    # Sin __init__: solo hace falta el catálogo (InventorySystem() abre los archivos de data/)
+    system = InventorySystem.__new__(InventorySystem)
+    system.product_manager = open_products(data_dir)
+    return system
+
+
+def editor_frames(system, branch=0):
+    products, _ = system.product_manager.get_page(0, 50)
+    original_df, stock_map = system.product_manager.editor_frame(products, branch)
+    original_df["add_or_sell"] = ""
+    return original_df, original_df.copy(), stock_map
+
+
+def test_sale_from_editor(system):
+    original_df, edited_df, stock_map = editor_frames(system)
+    edited_df.loc[0, "add_or_sell"] = "-2"
+    assert system.apply_product_edits(original_df, edited_df, stock_map, 0) == ""
+    product = system.product_manager.get_product_by_id("1")
+    assert product["stock_quantity"][0] == 8
+    assert product["sales_history"][-1] == 2
+
+
+def test_cleared_price_is_rejected(system):
+    original_df, edited_df, stock_map = editor_frames(system)
+    edited_df.loc[0, "price"] = np.nan
+    assert system.apply_product_edits(original_df, edited_df, stock_map, 0) == "Price es requerido."
+    assert system.product_manager.get_product_by_id("1")["price"] == 100.0
+
+
+@pytest.mark.parametrize("value", ["2.7", "-0.5", "inf"])
+def test_non_integer_movement_is_rejected(system, value):
+    original_df, edited_df, stock_map = editor_frames(system)
+    edited_df.loc[0, "add_or_sell"] = value
+    error = system.apply_product_edits(original_df, edited_df, stock_map, 0)
+    assert error == "La cantidad a añadir o vender debe ser un número entero."
+    assert system.product_manager.get_product_by_id("1")["stock_quantity"][0] == 10
@@ -0,0 +1,61 @@
+import os
+import time
+from tests.helpers import open_products, sample_products, write_data
+from branches import BranchRegistry
+from pos import PointOfSale
+from sales_history import SECONDS_PER_DAY, day_number
+
+
+def yesterday():
+    return int(time.time()) - SECONDS_PER_DAY
+
+
+def test_reload_rolls_the_day(tmp_path):
+    write_data(tmp_path, sample_products(), date=yesterday())
+    products = open_products(str(tmp_path))
+    analytics = products.get_analytics()
+    assert products.get_product_by_id("2")["sales_history"][-1] == 1
+
+    # Ninguna página en particular: la recarga de cada rerun corre la ventana
+    products.reload_if_stale()
+    assert products.get_product_by_id("2")["sales_history"][-2:] == [1, 0]
+    assert analytics.sales[1, -1] == 0
+    assert day_number(products.last_date_update) == day_number(time.time())
+    # El día cerrado queda en el historial de largo plazo
+    today = day_number(time.time())
+    assert products.sales_range(["2"], today - 1, today)[0].tolist() == [1, 0]
+
+    # Otro proceso ve el día ya corrido y no lo vuelve a correr
+    other = open_products(str(tmp_path))
+    assert other.roll_sales_history() == 0
+    assert other.get_product_by_id("2")["sales_history"][-2:] == [1, 0]
+
+
+def test_write_rolls_before_applying(tmp_path):
+    write_data(tmp_path, sample_products(), date=yesterday())
+    products = open_products(str(tmp_path))
+    products.update_products({}, sales={"1": 4})
+    assert products.get_product_by_id("1")["sales_history"][-2:] == [0, 4]
+    assert open_products(str(tmp_path)).get_product_by_id("1")["sales_history"][-2:] == [0, 4]
+
+
+def test_pos_sale_after_midnight_lands_in_the_new_day(tmp_path, monkeypatch):
+    # Una caja que corre sin la interfaz nunca recarga páginas: la venta misma corre el día
+    midnight = day_number(time.time()) * SECONDS_PER_DAY
+    clock = [midnight - 60]
+    monkeypatch.setattr(time, "time", lambda: clock[0])
+    write_data(tmp_path, sample_products(), date=clock[0])
+    point_of_sale = PointOfSale(open_products(str(tmp_path)), BranchRegistry(os.path.join(tmp_path, "branches.json")))
+
+    point_of_sale.record_sale(0, [("1", 3)])
+    assert point_of_sale.product_manager.get_product_by_id("1")["sales_history"][-1] == 3
+    clock[0] = midnight + 60
+    point_of_sale.record_sale(0, [("1", 2)])
+
+    for products in (point_of_sale.product_manager, open_products(str(tmp_path))):
+        assert products.get_product_by_id("1")["sales_history"][-2:] == [3, 2]
+        assert products.get_product_by_id("1")["stock_quantity"][0] == 5
+        assert day_number(products.last_date_update) == day_number(midnight)
+    # El día anterior quedó cerrado en el historial de largo plazo con la venta de antes de medianoche
+    today = day_number(midnight)
+    assert point_of_sale.product_manager.sales_range(["1"], today - 1, today)[0].tolist() == [3, 2]
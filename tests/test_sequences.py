@@ -0,0 +1,53 @@
+import json
+import multiprocessing
+import os
+from tests.helpers import open_products
+from role_permission import RolePermission
+from sequences import IdSequence, max_numeric_id
+
+WORKERS = 4
+BATCHES = 20
+
+
+def allocate(sequence_file, batches):
+    # Cada proceso abre su propia secuencia y reserva lotes de distinto tamaño
+    sequence = IdSequence(sequence_file, "product")
+    ids = []
+    for batch in range(batches):
+        ids += sequence.allocate(1 + batch % 3)
+    return ids
+
+
+def test_processes_never_get_the_same_id(tmp_path):
+    sequence_file = os.path.join(tmp_path, "sequences.json")
+    with multiprocessing.Pool(WORKERS) as pool:
+        results = [pool.apply_async(allocate, (sequence_file, BATCHES)) for _ in range(WORKERS)]
+        ids = [product_id for result in results for product_id in result.get(timeout=60)]
+    assert len(ids) == len(set(ids))
+    assert sorted(map(int, ids)) == list(range(1, len(ids) + 1))
+
+
+def test_deleted_ids_are_not_reused(data_dir):
+    products = open_products(data_dir)
+    assert products.add_product({"name": "Nuevo", "category": "Masas", "price": 1, "stock_quantity": [1, 1, 1]}) == "6"
+    products.delete_product("6")
+    assert products.get_next_product_id() == "7"
+    assert products.add_product({"name": "Otro", "category": "Masas", "price": 1, "stock_quantity": [1, 1, 1]}) == "7"
+    # Otro proceso que carga el catálogo también sigue la secuencia guardada
+    products.delete_product("7")
+    assert open_products(data_dir).add_products([{"name": "Tercero", "category": "Masas", "price": 1,
+                                                 "stock_quantity": [1, 1, 1]}]) == ["8"]
+
+
+def test_floor_comes_from_mixed_role_ids(tmp_path):
+    assert max_numeric_id([1, "2", " 10 ", "admin", None]) == 10
+    roles_file = os.path.join(tmp_path, "roles.json")
+    with open(roles_file, "w") as file:
+        json.dump([{"role_id": 1, "name": "admin"}, {"role_id": "7", "name": "user"},
+                   {"role_id": "caja", "name": "caja"}], file)
+    roles = RolePermission(data_file=roles_file)
+    assert roles.get_next_role_id() == "8"
+    assert roles.add_role({"name": "nuevo"}) == "8"
+    # Un rol agregado a mano con un id mayor sube el piso aunque la secuencia guardada sea menor
+    roles.add_role({"role_id": 20, "name": "manual"})
+    assert roles.add_role({"name": "siguiente"}) == "21"
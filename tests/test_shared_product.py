@@ -0,0 +1,54 @@
+import sys
+import threading
+from tests.helpers import open_products, sample_products, write_data
+
+READERS = 4
+ROUNDS = 150
+
+
+def test_readers_and_writer_share_one_product(tmp_path):
+    # Como en la app: una sola instancia para todas las sesiones del proceso
+    write_data(tmp_path, sample_products(300))
+    products = open_products(str(tmp_path))
+    errors = []
+    done = threading.Event()
+
+    def write():
+        try:
+            for round_ in range(ROUNDS):
+                product_id = products.add_product({"name": f"Alta {round_}", "category": "Masas", "price": 1,
+                                                   "stock_quantity": [round_ % 5, 1, 1]})
+                products.delete_product(str(1 + round_ % 300) if round_ % 2 else product_id)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            done.set()
+
+    def read(reader):
+        while not done.is_set():
+            try:
+                page, _ = products.get_page(reader % 3, 100, sort_key="price" if reader % 2 else "name",
+                                            filter_field="category" if reader == 3 else None, filter_value="masas")
+                products.editor_frame(page, reader % 3)
+                products.search_products("alta")
+                products.filter_products(branch_id=0)
+                products.branch_total(1)
+                products.lowest_stock(0)
+            except Exception as e:
+                errors.append(e)
+                return
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    try:
+        threads = [threading.Thread(target=write)] + [threading.Thread(target=read, args=(reader,))
+                                                      for reader in range(READERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert errors == []
+    assert [product["product_id"] for product in products.products] == \
+        [product["product_id"] for product in open_products(str(tmp_path)).products]
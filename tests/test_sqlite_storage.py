@@ -0,0 +1,101 @@
+import json
+import os
+import pytest
+from tests.helpers import sample_products
+from journal import delete_change, put_change, roll_change
+from migrate_storage import migrate_json_to_sqlite
+from sales_history import SALES_HISTORY_DAYS, roll_history
+from storage import JsonStorage, SqliteProductStorage, SqliteRoleStorage
+
+
+@pytest.fixture
+def products(tmp_path):
+    storage = SqliteProductStorage(os.path.join(tmp_path, "inventory.db"))
+    yield storage
+    storage.close()
+
+
+def sales(product_id, storage):
+    return storage.connection.execute(
+        "SELECT day, quantity FROM product_sales WHERE product_id = ? ORDER BY day", (product_id,)).fetchall()
+
+
+def test_round_trip(products):
+    records = sample_products(4)
+    records[1]["supplier"] = "Molino"
+    records[2]["stock_quantity"] = [1.5, 2, 0]
+    records[3]["sales_history"] = [4, 5]
+    products.save(records)
+    loaded = products.load()
+    records[3]["sales_history"] = [0] * (SALES_HISTORY_DAYS - 2) + [4, 5]
+    assert loaded == records
+    assert products.get("2") == records[1]
+    assert products.get("99") is None
+
+
+def test_roll_moves_and_drops_days(products):
+    records = sample_products(2)
+    records[1]["sales_history"] = list(range(1, SALES_HISTORY_DAYS + 1))
+    products.save(records)
+    products.commit([roll_change(3, 0)])
+    assert products.get("2")["sales_history"] == roll_history(records[1]["sales_history"], 3)
+    # Los días que salieron de la ventana se borran, ninguna fila queda con día negativo
+    assert min(day for day, _ in sales("2", products)) == 0
+    assert len(sales("2", products)) == SALES_HISTORY_DAYS - 3
+
+
+def test_delete_cascades_to_stock_and_sales(products):
+    products.save(sample_products(3))
+    products.commit([delete_change("2")])
+    assert [record["product_id"] for record in products.load()] == ["1", "3"]
+    for table in ("product_stock", "product_sales"):
+        assert products.connection.execute(f"SELECT COUNT(*) FROM {table} WHERE product_id = '2'").fetchone()[0] == 0
+
+
+def test_insertion_order_is_kept(products):
+    products.save(sample_products(3))
+    new = dict(sample_products(1)[0], product_id="10", name="Nuevo")
+    products.commit([put_change(new, "product_id"), delete_change("1")])
+    # Un cambio no mueve el producto; uno que vuelve después de borrarse queda al final
+    products.commit([put_change(dict(sample_products(2)[1], name="Cambiado"), "product_id"),
+                     put_change(sample_products(1)[0], "product_id")])
+    loaded = products.load()
+    assert [record["product_id"] for record in loaded] == ["2", "3", "10", "1"]
+    assert loaded[0]["name"] == "Cambiado"
+
+
+def test_roles_with_mixed_ids(tmp_path):
+    roles = SqliteRoleStorage(os.path.join(tmp_path, "inventory.db"))
+    records = [{"role_id": 1, "name": "admin", "permissions": ["all"]},
+               {"role_id": "2", "name": "user", "permissions": []}]
+    roles.save(records)
+    assert roles.load() == records
+    assert roles.get("1") == records[0] and roles.get(1) == records[0]
+    assert roles.get(2) == records[1]
+    roles.commit([delete_change(1)])
+    assert roles.load() == records[1:]
+    roles.close()
+
+
+def test_migration_includes_journal(tmp_path):
+    directory = str(tmp_path)
+    products_file = os.path.join(directory, "products.json")
+    journal_file = os.path.join(directory, "products.journal")
+    roles_file = os.path.join(directory, "roles.json")
+    with open(products_file, "w") as file:
+        json.dump(sample_products(3), file)
+    with open(roles_file, "w") as file:
+        json.dump([{"role_id": 1, "name": "admin"}, {"role_id": "2", "name": "user"}], file)
+    source = JsonStorage(products_file, "product_id", journal_file=journal_file)
+    source.commit([put_change(dict(sample_products(2)[1], name="Desde la bitácora"), "product_id"),
+                   delete_change("3")], source.load())
+    expected = source.load()
+
+    db_file = os.path.join(directory, "inventory.db")
+    assert migrate_json_to_sqlite(db_file, products_file, journal_file, roles_file) == (2, 2)
+    products, roles = SqliteProductStorage(db_file), SqliteRoleStorage(db_file)
+    assert products.load() == expected
+    assert products.get("2")["name"] == "Desde la bitácora"
+    assert [role["role_id"] for role in roles.load()] == [1, "2"]
+    products.close()
+    roles.close()
@@ -0,0 +1,43 @@
+import math
+import numpy as np
+import pytest
+from tests.helpers import open_products
+from bulk_io import import_products
+from validation import parse_number, validate_fields
+
+
+@pytest.mark.parametrize("value, expected", [
+    (math.nan, "Price es requerido."),
+    (np.float64("nan"), "Price es requerido."),
+    (math.inf, "Price debe ser un número."),
+    (-math.inf, "Price debe ser un número."),
+    (0, "El precio debe ser mayor a 0."),
+    (10.5, None),
+])
+def test_validate_fields_rejects_non_finite_prices(value, expected):
+    assert validate_fields({"name": "Empanada", "price": value}) == expected
+
+
+@pytest.mark.parametrize("value", ["nan", "inf", "-Infinity", math.nan, math.inf])
+def test_parse_number_rejects_non_finite(value):
+    assert parse_number(value, "price") == (None, "Price debe ser un número.")
+
+
+def test_parse_number():
+    assert parse_number(" 12,5 ", "price") == (12.5, None)
+    assert parse_number("3", "stock", integer=True) == (3, None)
+    assert parse_number("2.5", "stock", integer=True) == (None, "Stock debe ser un número entero.")
+    assert parse_number("", "price") == (None, None)
+
+
+def test_import_skips_non_finite_rows(data_dir):
+    products = open_products(data_dir)
+    rows = [
+        {"product_id": "", "name": "Válido", "category": "Masas", "price": "10", "Centro": "5"},
+        {"product_id": "", "name": "Sin precio", "category": "Masas", "price": "nan", "Centro": "5"},
+        {"product_id": "", "name": "Infinito", "category": "Masas", "price": "10", "Centro": "inf"},
+    ]
+    summary = import_products(products, enumerate(rows, start=2), ["Centro"])
+    assert summary["imported"] == 1
+    assert [error["line"] for error in summary["errors"]] == [3, 4]
+    assert products.search_products("Válido")
@@ -0,0 +1,118 @@
+import pytest
+import yaml
+import hashing
+import yamlmanager
+from hashing import PasswordHasher, check_password, hash_password, is_hash
+from yamlmanager import YamlManager
+
+HASHED = hash_password("clave", rounds=4)
+
+
+@pytest.fixture(autouse=True)
+def fast_hasher(monkeypatch):
+    monkeypatch.setattr(hashing, "default_hasher", PasswordHasher(rounds=4, workers=0))
+
+
+@pytest.fixture
+def config_path(tmp_path):
+    path = tmp_path / "config.yaml"
+    write_config(path, {
+        "admin": {"email": "Admin@Example.com", "name": "Admin", "password": HASHED, "role": "admin"},
+        "ana": {"email": "ana@example.com", "name": "Ana", "password": "plana", "role": "user"},
+    })
+    return path
+
+
+def write_config(path, users):
+    with open(path, "w") as file:
+        yaml.dump({"cookie": {"expiry_days": 7, "key": "k", "name": "c"}, "credentials": {"usernames": users}}, file)
+
+
+def count_calls(monkeypatch, owner, name):
+    calls = []
+    original = getattr(owner, name)
+
+    def counted(*args, **kwargs):
+        calls.append(args)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(owner, name, counted)
+    return calls
+
+
+def test_config_is_parsed_again_only_after_an_outside_write(config_path, monkeypatch):
+    manager = YamlManager(str(config_path))
+    loads = count_calls(monkeypatch, yaml, "load")
+    config = manager.load_config()
+    assert manager.load_config() is config
+    assert len(loads) == 1
+
+    # Otro proceso reescribe el archivo: cambia el tamaño y la fecha de modificación
+    users = dict(config["credentials"]["usernames"], beto={"email": "beto@example.com", "name": "Beto",
+                                                          "password": HASHED, "role": "user"})
+    write_config(config_path, users)
+    assert "beto" in manager.load_config()["credentials"]["usernames"]
+    assert manager.get_user_by_email("BETO@example.com")[0] == "beto"
+    assert len(loads) == 2
+
+    # Lo que guarda la misma instancia no se vuelve a leer
+    manager.delete_user("beto")
+    assert "beto" not in manager.load_config()["credentials"]["usernames"]
+    assert len(loads) == 2
+
+
+def test_email_index_follows_changes(config_path):
+    manager, other = YamlManager(str(config_path)), YamlManager(str(config_path))
+    assert manager.get_user_by_email("admin@example.com")[0] == "admin"
+    assert manager.get_user_by_email("nadie@example.com") is None
+
+    manager.update_user("ana", {"email": "ana.nueva@example.com"})
+    assert manager.get_user_by_email("ana@example.com") is None
+    assert other.get_user_by_email("Ana.Nueva@example.com")[0] == "ana"
+
+    with pytest.raises(ValueError, match="already used"):
+        other.add_user("ana2", {"email": "ANA.NUEVA@example.com", "name": "Ana", "password": "x", "role": "user"})
+    # Dos usuarios nuevos con el mismo email en un mismo alta: no se agrega ninguno
+    with pytest.raises(ValueError):
+        other.add_users({"c1": {"email": "c@example.com", "password": "x"}, "c2": {"email": "c@example.com", "password": "x"}})
+    assert set(manager.list_users()) == {"admin", "ana"}
+
+
+def test_bootstrap_hashes_only_plaintext_and_saves_only_on_change(config_path, monkeypatch):
+    manager = YamlManager(str(config_path))
+    saves = count_calls(monkeypatch, manager, "save_config")
+    assert manager.hash_plaintext_passwords() == 1
+    users = YamlManager(str(config_path)).list_users()
+    assert users["admin"]["password"] == HASHED
+    assert is_hash(users["ana"]["password"]) and check_password("plana", users["ana"]["password"])
+    assert len(saves) == 1
+
+    # Otro arranque del proceso: ya no queda nada en texto plano
+    assert manager.hash_plaintext_passwords() == 0
+    assert YamlManager(str(config_path)).hash_plaintext_passwords() == 0
+    assert len(saves) == 1
+
+
+def test_rename_is_one_save_and_keeps_the_user_on_failure(config_path, monkeypatch):
+    manager = YamlManager(str(config_path))
+    with pytest.raises(ValueError, match="already exists"):
+        manager.rename_user("ana", "admin", {"name": "Ana"})
+    with monkeypatch.context() as patch:
+        patch.setattr(yamlmanager, "atomic_write", failing_write)
+        with pytest.raises(OSError):
+            manager.rename_user("ana", "anita", {"password": "nueva"})
+    assert set(YamlManager(str(config_path)).list_users()) == {"admin", "ana"}
+    assert set(manager.list_users()) == {"admin", "ana"}
+
+    saves = count_calls(monkeypatch, manager, "save_config")
+    manager.rename_user("ana", "anita", {"name": "Anita", "password": "nueva"})
+    users = YamlManager(str(config_path)).list_users()
+    assert list(users) == ["admin", "anita"]
+    assert users["anita"]["email"] == "ana@example.com" and users["anita"]["name"] == "Anita"
+    assert check_password("nueva", users["anita"]["password"])
+    assert manager.get_user_by_email("ana@example.com")[0] == "anita"
+    assert len(saves) == 1
+
+
+def failing_write(path, content):
+    raise OSError("disco lleno")